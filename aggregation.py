@@ -0,0 +1,184 @@
+import re
+
+import pandas as pd
+
+from query_cache import literal_end
+
+# Nome da CTE/tabela derivada que envolve a consulta do usuário
+BASE_ALIAS = "agg_base"
+
+_IDENTIFIER = re.compile(r'^[A-Za-z][A-Za-z0-9_$]*$')
+
+
+def _tokens(sql):
+    """Percorre o SQL devolvendo (posição, profundidade de parênteses, palavra) fora de strings e comentários"""
+    depth = 0
+    i = 0
+    length = len(sql)
+    while i < length:
+        ch = sql[i]
+        skipped = literal_end(sql, i)
+        if skipped is not None:
+            i = skipped
+        elif ch == '(':
+            depth += 1
+            yield i, depth, '('
+            i += 1
+        elif ch == ')':
+            yield i, depth, ')'
+            depth -= 1
+            i += 1
+        elif ch == ';':
+            yield i, depth, ';'
+            i += 1
+        elif ch.isalpha() or ch == '_':
+            end = i
+            while end < length and (sql[end].isalnum() or sql[end] in '_$'):
+                end += 1
+            yield i, depth, sql[i:end].upper()
+            i = end
+        else:
+            i += 1
+
+
+def quote_identifier(name):
+    """Cita o nome da coluna quando necessário (dialeto 3)"""
+    if _IDENTIFIER.match(name) and name == name.upper():
+        return name
+    return '"' + name.replace('"', '""') + '"'
+
+
+def split_query(query):
+    """Separa a consulta em (lista de CTEs, SELECT principal)
+
+    Retorna None quando a consulta não pode ser envolvida com segurança: mais de uma
+    instrução, algo diferente de SELECT/WITH ou ORDER BY/ROWS no nível principal.
+    """
+    sql = query.strip()
+    while sql.endswith(';'):
+        sql = sql[:-1].rstrip()
+
+    tokens = list(_tokens(sql))
+    if not tokens or any(token == ';' for _, _, token in tokens):
+        return None
+
+    first = tokens[0][2]
+    if first == 'SELECT':
+        main_start = 0
+        ctes = None
+    elif first == 'WITH':
+        # O SELECT principal é o primeiro SELECT no nível 0 após a lista de CTEs
+        main_start = next((pos for pos, depth, token in tokens[1:] if depth == 0 and token == 'SELECT'), None)
+        if main_start is None:
+            return None
+        ctes = sql[:main_start].rstrip()
+    else:
+        return None
+
+    main = sql[main_start:]
+    top_level = [token for _, depth, token in _tokens(main) if depth == 0]
+    if 'ORDER' in top_level or 'ROWS' in top_level or 'FIRST' in top_level[:2]:
+        return None
+    return ctes, main
+
+
+def wrap_aggregate(query, dimension, measure, agg='SUM', dimension_expr=None, order_by_value=True, limit=None):
+    """Gera o SQL que agrega a consulta do usuário por dimensão no próprio Firebird
+
+    dimension_expr permite agrupar por uma expressão sobre a coluna (ex.: CAST(... AS DATE)).
+    Retorna None quando a consulta não pode ser envolvida.
+    """
+    parts = split_query(query)
+    if parts is None:
+        return None
+    ctes, main = parts
+
+    dimension_sql = dimension_expr or quote_identifier(dimension)
+    measure_sql = quote_identifier(measure)
+    select = (f"SELECT {dimension_sql} AS {quote_identifier(dimension)}, "
+              f"{agg}({measure_sql}) AS {measure_sql} FROM {BASE_ALIAS} "
+              f"GROUP BY 1 ORDER BY {'2 DESC' if order_by_value else '1'}")
+    if limit:
+        select += f" ROWS {int(limit)}"
+    return _wrap(ctes, main, select)
+
+
+def _wrap(ctes, main, select):
+    if ctes:
+        return f"{ctes},\n{BASE_ALIAS} AS (\n{main}\n)\n{select}"
+    return f"WITH {BASE_ALIAS} AS (\n{main}\n)\n{select}"
+
+
+def _search_clause(column):
+    """Filtro de busca por texto (CONTAINING não diferencia maiúsculas) com um parâmetro"""
+    return f" WHERE CAST({quote_identifier(column)} AS VARCHAR(255)) CONTAINING ?" if column else ""
+
+
+def wrap_page(query, order_by=None, descending=False, search_column=None):
+    """Gera o SQL que devolve uma janela de linhas da consulta do usuário (ROWS ? TO ?)
+
+    Os parâmetros da janela (primeira e última linha, a partir de 1) e, com search_column,
+    o texto buscado vêm depois dos parâmetros da consulta: [*params, texto, primeira, última].
+    Como o SQL não muda entre páginas, a instrução preparada é reaproveitada.
+    Retorna None quando a consulta não pode ser envolvida.
+    """
+    parts = split_query(query)
+    if parts is None:
+        return None
+    ctes, main = parts
+
+    select = f"SELECT * FROM {BASE_ALIAS}{_search_clause(search_column)}"
+    if order_by:
+        select += f" ORDER BY {quote_identifier(order_by)}{' DESC' if descending else ''}"
+    select += " ROWS ? TO ?"
+    return _wrap(ctes, main, select)
+
+
+def wrap_count(query, search_column=None):
+    """Gera o SQL que conta as linhas da consulta do usuário (com o filtro de busca opcional)"""
+    parts = split_query(query)
+    if parts is None:
+        return None
+    ctes, main = parts
+    return _wrap(ctes, main, f"SELECT COUNT(*) AS TOTAL FROM {BASE_ALIAS}{_search_clause(search_column)}")
+
+
+def date_expr(column):
+    """Expressão SQL que reduz uma coluna TIMESTAMP/DATE ao dia"""
+    return f"CAST({quote_identifier(column)} AS DATE)"
+
+
+class ServerAggregator:
+    """Executa agregações no Firebird para a última consulta, com o mesmo SQL e parâmetros
+
+    execute é uma função (query, params) -> (df, mensagem), como DatabaseConnection.execute_query.
+    """
+
+    def __init__(self, execute, query, params):
+        self.execute = execute
+        self.query = query
+        self.params = params
+        self.fetched_rows = 0
+
+    def cache_key(self):
+        """Identifica as agregações deste agregador no cache de figuras"""
+        return ('servidor', self.query, tuple(self.params) if self.params else ())
+
+    def aggregate(self, dimension, measure, temporal=False, limit=None):
+        """Retorna o DataFrame agregado ou None para que o chamador agregue no pandas"""
+        sql = wrap_aggregate(
+            self.query, dimension, measure,
+            dimension_expr=date_expr(dimension) if temporal else None,
+            order_by_value=not temporal,
+            limit=limit
+        )
+        if sql is None:
+            return None
+        df, _ = self.execute(sql, self.params)
+        if df is None or len(df.columns) != 2:
+            return None
+        # Sem alterar df: ele pode ser o objeto compartilhado do cache de resultados
+        df = df.set_axis([dimension, measure], axis=1)
+        df = df.assign(**{measure: pd.to_numeric(df[measure], errors='coerce')})
+        self.fetched_rows += len(df)
+        return df
@@ -3,10 +3,32 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import fdb
 import json
 import os
+import time
 from datetime import datetime, date
+import pyarrow as pa
+from firebird_db import DatabaseConnection, DEFAULT_BATCH_SIZE
+from pool import make_dsn
+from query_cache import get_result_cache, execute_with_cache, connection_source, DEFAULT_TTL
+from incremental import IncrementalLoader, build_params, find_date_column
+from snapshots import SnapshotStore, snapshot_id
+from jobs import submit_job, get_job, STATUS_DONE, STATUS_CANCELLED
+from aggregation import ServerAggregator
+from charts import (create_advanced_charts, aggregate_by, histogram_figure, line_figure,
+                    scatter_figure)
+from column_types import optimize_dtypes
+from stats import column_statistics
+from grid_panel import DEFAULT_MAX_ROWS, get_pager, get_server_pager, render_data_grid
+from local_sql_panel import render_local_sql
+from timings import QueryTimings
+from timings_panel import record_charts, record_run, render_timings_panel
+from export_panel import render_arrow_export, render_arrow_import, render_csv_export, render_excel_export
+from filter_panel import render_filter_panel
+from cube import CubeAggregator
+from cube_panel import get_cube, render_cube_explorer, render_kpi_row
+from approx_panel import render_approximate_mode
+from sampling import SampleAggregator
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -49,56 +71,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-class DatabaseConnection:
-    def __init__(self):
-        self.connection = None
-        
-    def connect(self, host, database, user, password, port=3050):
-        """Conecta ao banco de dados Firebird"""
-        try:
-            dsn = f"{host}/{port}:{database}"
-            self.connection = fdb.connect(
-                dsn=dsn,
-                user=user,
-                password=password,
-                charset='NONE'
-            )
-            return True, "Conexão estabelecida com sucesso!"
-        except Exception as e:
-            return False, f"Erro na conexão: {str(e)}"
-    
-    def execute_query(self, query, params=None):
-        """Executa uma consulta SQL e retorna um DataFrame"""
-        if not self.connection:
-            return None, "Não há conexão ativa com o banco de dados"
-        
-        try:
-            cursor = self.connection.cursor()
-            if params:
-                # Agora params é uma tupla/lista para parâmetros posicionais
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            # Obter nomes das colunas
-            columns = [desc[0] for desc in cursor.description]
-            
-            # Obter dados
-            data = cursor.fetchall()
-            cursor.close()
-            
-            # Criar DataFrame
-            df = pd.DataFrame(data, columns=columns)
-            return df, "Consulta executada com sucesso!"
-        except Exception as e:
-            return None, f"Erro na execução da consulta: {str(e)}"
-    
-    def close(self):
-        """Fecha a conexão com o banco de dados"""
-        if self.connection:
-            self.connection.close()
-            self.connection = None
-
 def save_query(name, query):
     """Salva uma consulta SQL em arquivo JSON"""
     queries_file = "saved_queries.json"
@@ -126,64 +98,30 @@ def load_queries():
             return json.load(f)
     return {}
 
-def create_advanced_charts(df):
-    """Cria visualizações avançadas com base nos dados"""
-    charts = []
-    
-    if df.empty:
-        return charts
-    
-    # Detectar colunas numéricas e categóricas
-    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-    categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
-    date_cols = df.select_dtypes(include=['datetime64']).columns.tolist()
+@st.fragment(run_every=1)
+def show_query_job():
+    """Acompanha a consulta em segundo plano e anexa o resultado à sessão quando terminar"""
+    job = get_job(st.session_state.query_job_id)
+    if job is None:
+        del st.session_state.query_job_id
+        return
     
-    # Gráfico 1: Distribuição de valores (se houver colunas numéricas)
-    if numeric_cols:
-        col = numeric_cols[0]
-        fig = px.histogram(df, x=col, title=f"Distribuição de {col}", 
-                          color_discrete_sequence=['#1f77b4'])
-        fig.update_layout(showlegend=False)
-        charts.append(("Distribuição", fig))
+    if not job.done:
+        st.info(f"⏳ Consulta {job.status}... {job.elapsed():.1f}s · {job.rows:,} linhas recebidas. "
+                "Você pode continuar usando os dados anteriores enquanto isso.")
+        st.button("⛔ Cancelar Consulta", on_click=job.cancel)
+        return
     
-    # Gráfico 2: Análise temporal (se houver colunas de data)
-    if date_cols and numeric_cols:
-        date_col = date_cols[0]
-        value_col = numeric_cols[0]
-        df_temp = df.copy()
-        df_temp[date_col] = pd.to_datetime(df_temp[date_col])
-        df_grouped = df_temp.groupby(df_temp[date_col].dt.date)[value_col].sum().reset_index()
-        
-        fig = px.line(df_grouped, x=date_col, y=value_col, 
-                     title=f"Evolução Temporal de {value_col}",
-                     color_discrete_sequence=['#ff7f0e'])
-        charts.append(("Evolução Temporal", fig))
-    
-    # Gráfico 3: Top 10 categorias (se houver colunas categóricas e numéricas)
-    if categorical_cols and numeric_cols:
-        cat_col = categorical_cols[0]
-        value_col = numeric_cols[0]
-        
-        top_categories = df.groupby(cat_col)[value_col].sum().sort_values(ascending=False).head(10)
-        
-        fig = px.bar(x=top_categories.values, y=top_categories.index, 
-                    orientation='h', title=f"Top 10 {cat_col} por {value_col}",
-                    color_discrete_sequence=['#2ca02c'])
-        fig.update_layout(yaxis={'categoryorder':'total ascending'})
-        charts.append(("Top 10", fig))
-    
-    # Gráfico 4: Correlação entre variáveis numéricas
-    if len(numeric_cols) >= 2:
-        correlation_matrix = df[numeric_cols].corr()
-        
-        fig = px.imshow(correlation_matrix, 
-                       title="Matriz de Correlação",
-                       color_continuous_scale='RdBu_r',
-                       aspect="auto")
-        fig.update_layout(width=600, height=500)
-        charts.append(("Correlação", fig))
-    
-    return charts
+    del st.session_state.query_job_id
+    result = job.result or {'df': None, 'message': job.error, 'fetched': None, 'cache_hits': [], 'typing_report': None,
+                            'timings': None, 'query': None, 'params': None}
+    if result['df'] is not None and job.status == STATUS_DONE:
+        st.session_state.current_data = result['df']
+    else:
+        result = dict(result, df=None)
+    st.session_state.last_query_result = dict(result, status=job.status, elapsed=job.elapsed())
+    record_run(result['timings'], result['df'], job.status, job.elapsed())
+    st.rerun()
 
 def main():
     # Título principal
@@ -193,6 +131,10 @@ def main():
     # Inicializar conexão de banco de dados na sessão
     if 'db_connection' not in st.session_state:
         st.session_state.db_connection = DatabaseConnection()
+    if 'incremental_loader' not in st.session_state:
+        st.session_state.incremental_loader = IncrementalLoader()
+    if 'max_rows' not in st.session_state:
+        st.session_state.max_rows = DEFAULT_MAX_ROWS
     
     # Sidebar para configurações
     with st.sidebar:
@@ -240,6 +182,27 @@ def main():
             st.info("Nenhuma consulta salva")
         
         st.markdown('</div>', unsafe_allow_html=True)
+        
+        # Seção do cache de resultados
+        st.markdown('<div class="sidebar-section">', unsafe_allow_html=True)
+        st.subheader("🗄️ Cache de Resultados")
+        
+        result_cache = get_result_cache()
+        use_cache = st.checkbox("Usar cache de resultados", value=True,
+                                help="Reaproveita resultados de consultas com o mesmo SQL e parâmetros")
+        cache_ttl = st.number_input("Validade do cache (minutos)", min_value=1, max_value=1440,
+                                    value=DEFAULT_TTL // 60) * 60
+        
+        cache_stats = result_cache.stats()
+        st.caption(f"{cache_stats['entradas']} resultados, "
+                   f"{cache_stats['bytes'] / 1024 ** 2:.1f} de {cache_stats['max_bytes'] / 1024 ** 2:.0f} MB · "
+                   f"{cache_stats['hits']} hits / {cache_stats['misses']} misses")
+        
+        if st.button("🗑️ Invalidar Cache"):
+            result_cache.invalidate()
+            st.success("Cache invalidado!")
+        
+        st.markdown('</div>', unsafe_allow_html=True)
     
     # Área principal
     tab1, tab2, tab3 = st.tabs(["🔍 Consulta SQL", "📊 Visualizações", "⚙️ Configurações Avançadas"])
@@ -389,51 +352,118 @@ LEFT JOIN (
         
         cliente = st.text_input("Cliente (opcional)", value="")
         
+        # Busca em lotes
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            streaming = st.checkbox("Busca em lotes (streaming)", value=True,
+                                    help="Busca as linhas com fetchmany, exibindo o progresso de linhas recebidas")
+        with col2:
+            batch_size = st.number_input("Linhas por lote", min_value=100, max_value=100000,
+                                         value=DEFAULT_BATCH_SIZE, step=500, disabled=not streaming)
+        
+        # Carregamento incremental por período
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            incremental = st.checkbox("Carregamento incremental por período", value=True,
+                                      help="Consulta no banco apenas os dias ainda não carregados para a mesma empresa/consulta")
+        with col2:
+            refresh_today = st.checkbox("Recarregar o dia de hoje", value=True, disabled=not incremental,
+                                        help="O dia corrente ainda recebe pedidos e é sempre consultado de novo")
+        
+        save_snapshot = st.checkbox("Salvar snapshot local (Parquet)", value=True,
+                                    help="Grava o resultado em disco, particionado por empresa e mês, para reabrir sem consultar o banco")
+        # Origem dos snapshots: a conexão ativa ou, sem conexão, o banco configurado na barra lateral
+        snapshot_source = connection_source(st.session_state.db_connection) or (make_dsn(host, port, database), user)
+        snapshot_store = SnapshotStore(source=snapshot_source)
+        
+        optimize_types = st.checkbox("Otimizar tipos das colunas", value=True,
+                                     help="Converte Decimal em float, textos repetitivos em categoria, reduz inteiros e converte datas/ano_mes")
+        
         # Botões de ação
         col1, col2, col3 = st.columns([2, 1, 1])
         
         with col1:
             if st.button("🚀 Executar Consulta", type="primary"):
-                if hasattr(st.session_state, 'connected') and st.session_state.connected:
-                    # Construir a tupla de parâmetros na ordem correta
-                    # Para parâmetros opcionais, passamos o valor e o valor novamente
-                    # para a condição `(? IS NULL OR coluna = ?)`.
-                    # Se o campo estiver vazio, passamos None para que `? IS NULL` seja verdadeiro.
-                    
-                    params = (
-                        empresa,
-                        data_inicio,
-                        data_fim,
-                        None if not produto else produto, # Primeiro ? para o IS NULL
-                        produto, # Segundo ? para a comparação
-                        None if not cliente else cliente, # Primeiro ? para o IS NULL
-                        cliente # Segundo ? para a comparação
-                    )
+                running_job = get_job(st.session_state.get('query_job_id', ''))
+                if not (hasattr(st.session_state, 'connected') and st.session_state.connected):
+                    st.error("❌ Conecte-se ao banco de dados primeiro!")
+                elif running_job and not running_job.done:
+                    st.warning("⏳ Já existe uma consulta em andamento. Aguarde ou cancele-a.")
+                else:
+                    db_connection = st.session_state.db_connection
+                    loader = st.session_state.incremental_loader
                     
-                    with st.spinner("Executando consulta..."):
-                        df, message = st.session_state.db_connection.execute_query(query, params)
+                    def run_sales_query(job):
+                        # Executa em segundo plano: não pode usar st.* nem st.session_state
+                        fetch_options = {
+                            'should_cancel': job.cancel_requested,
+                            'on_connection': job.attach_connection
+                        }
+                        if streaming:
+                            fetch_options['batch_size'] = int(batch_size)
+                            fetch_options['on_progress'] = job.set_progress
                         
-                    if df is not None:
-                        st.success(message)
-                        st.session_state.current_data = df
+                        # Plano e tempos por fase (prepare, execute, fetch, montagem, tipagem)
+                        timings = QueryTimings(query, build_params(empresa, data_inicio, data_fim, produto, cliente), {
+                            'incremental': incremental, 'lotes': int(batch_size) if streaming else None,
+                            'cache': use_cache, 'tipagem': optimize_types
+                        })
+                        fetch_options['timings'] = timings
                         
-                        # Mostrar informações básicas
-                        st.info(f"📊 Consulta retornou {len(df)} registros com {len(df.columns)} colunas")
+                        cache_hits = []
+                        # Períodos (início, fim) que vieram do banco nesta execução: só eles vão ao snapshot
+                        fetched_from_db = []
                         
-                        # Mostrar preview dos dados
-                        st.subheader("Preview dos Dados")
-                        st.dataframe(df.head(100), use_container_width=True)
+                        def run_query(sql, query_params):
+                            # O dia de hoje recarregado não deve vir do cache
+                            skip_cache = incremental and refresh_today and query_params[2] >= date.today()
+                            if use_cache and not skip_cache:
+                                result, result_message, hit = execute_with_cache(
+                                    db_connection, sql, query_params, ttl=cache_ttl, **fetch_options
+                                )
+                                cache_hits.append(hit)
+                            else:
+                                result, result_message = db_connection.execute_query(sql, query_params, **fetch_options)
+                                hit = False
+                            if result is not None and not hit:
+                                fetched_from_db.append((query_params[1], query_params[2]))
+                            return result, result_message
                         
-                        # Estatísticas básicas
-                        if not df.empty:
-                            st.subheader("Estatísticas Básicas")
-                            numeric_cols = df.select_dtypes(include=['number']).columns
-                            if len(numeric_cols) > 0:
-                                st.dataframe(df[numeric_cols].describe(), use_container_width=True)
-                    else:
-                        st.error(message)
-                else:
-                    st.error("❌ Conecte-se ao banco de dados primeiro!")
+                        if incremental:
+                            df, message, fetched = loader.load(
+                                run_query, query, empresa, data_inicio, data_fim, produto, cliente,
+                                refresh_today=refresh_today,
+                                source=connection_source(st.session_state.db_connection)
+                            )
+                        else:
+                            params = build_params(empresa, data_inicio, data_fim, produto, cliente)
+                            df, message = run_query(query, params)
+                            fetched = None
+                        
+                        typing_report = None
+                        if df is not None and optimize_types:
+                            with timings.phase('typing'):
+                                df, typing_report = optimize_dtypes(df)
+                        if df is not None:
+                            # Monta as estatísticas ainda na thread da consulta: a aba já abre com o resumo
+                            column_statistics(df)
+                        
+                        if df is not None and save_snapshot and fetched_from_db:
+                            # Regrava só os meses do trecho que veio do banco (df já cobre todo o trecho)
+                            start = min(start for start, _ in fetched_from_db)
+                            end = max(end for _, end in fetched_from_db)
+                            _, snapshot_error = snapshot_store.safe_write(df, query, empresa, start, end,
+                                                                          produto, cliente)
+                            if snapshot_error:
+                                message = f"{message} ({snapshot_error})"
+                        return {'df': df, 'message': message, 'fetched': fetched, 'cache_hits': cache_hits,
+                                'typing_report': typing_report, 'timings': timings,
+                                'query': query, 'params': build_params(empresa, data_inicio, data_fim, produto, cliente)}
+                    
+                    st.session_state.query_job_id = submit_job(run_sales_query).id
+                    st.session_state.pop('last_query_result', None)
         
         with col2:
             query_name = st.text_input("Nome da consulta", placeholder="Ex: Vendas Mensais")
@@ -449,6 +479,135 @@ LEFT JOIN (
             if st.button("🔄 Limpar Editor"):
                 st.session_state.current_query = ""
                 st.rerun()
+        
+        # Acompanhamento da consulta em segundo plano
+        if 'query_job_id' in st.session_state:
+            show_query_job()
+        
+        # Resultado da última consulta
+        last_result = st.session_state.get('last_query_result')
+        if last_result:
+            df = last_result['df']
+            if df is not None:
+                st.success(f"{last_result['message']} ({last_result['elapsed']:.1f}s)")
+                if last_result['fetched']:
+                    st.caption("📅 Períodos consultados: " + ", ".join(
+                        f"{start.strftime('%d/%m/%Y')} a {end.strftime('%d/%m/%Y')}" for start, end in last_result['fetched']
+                    ))
+                cache_hits = last_result['cache_hits']
+                if cache_hits:
+                    st.caption(f"⚡ Cache: {sum(cache_hits)} hit(s), {len(cache_hits) - sum(cache_hits)} miss(es)")
+                
+                # Mostrar informações básicas
+                st.info(f"📊 Consulta retornou {len(df)} registros com {len(df.columns)} colunas")
+                
+                typing_report = last_result['typing_report']
+                if typing_report is not None:
+                    before = typing_report['bytes_antes'].sum()
+                    after = typing_report['bytes_depois'].sum()
+                    with st.expander(f"📉 Otimização de tipos: {before / 1024 ** 2:.1f} MB → {after / 1024 ** 2:.1f} MB"):
+                        st.dataframe(typing_report, use_container_width=True, hide_index=True)
+                
+                # Mostrar preview dos dados
+                st.subheader("Preview dos Dados")
+                render_data_grid(get_pager(df, key="preview"), key="preview", page_size=st.session_state.max_rows)
+                
+                # Estatísticas básicas
+                if not df.empty:
+                    st.subheader("Estatísticas Básicas")
+                    numeric_cols = df.select_dtypes(include=['number']).columns
+                    if len(numeric_cols) > 0:
+                        # Sketches calculados uma vez por versão dos dados (já aquecidos ao fim da consulta)
+                        st.dataframe(column_statistics(df).describe(), use_container_width=True)
+                        st.caption("Quartis e distintos aproximados por sketches (erro típico abaixo de 1%)")
+            elif last_result['status'] == STATUS_CANCELLED:
+                st.warning("⛔ Consulta cancelada pelo usuário")
+            else:
+                st.error(last_result['message'])
+        
+        # Plano do Firebird e tempos por fase das execuções
+        with st.expander("⏱️ Plano e Tempos"):
+            render_timings_panel(key="tempos")
+        
+        # Snapshot local em Parquet
+        with st.expander("📂 Snapshot Local"):
+            sid = snapshot_id(query, produto, cliente, snapshot_store.source)
+            metadata = snapshot_store.load_metadata(sid)
+            
+            if metadata:
+                partitions = [p for p in metadata["partitions"].values() if p["empresa"] == empresa]
+                st.caption(f"Snapshot {sid} · {len(partitions)} partição(ões) da empresa {empresa} · "
+                           f"atualizado em {metadata['updated_at'][:19].replace('T', ' ')}")
+                
+                if not snapshot_store.coverage_complete(sid, empresa, data_inicio, data_fim):
+                    st.warning("⚠️ O snapshot não cobre todo o período selecionado")
+                
+                columns = st.multiselect("Colunas a carregar (vazio = todas)",
+                                         snapshot_store.columns(sid))
+                
+                col1, col2, col3 = st.columns(3)
+                
+                with col1:
+                    if st.button("📂 Abrir do Snapshot"):
+                        try:
+                            df = snapshot_store.read(sid, empresa, data_inicio, data_fim, columns=columns or None)
+                        except (pa.ArrowException, OSError) as e:
+                            st.error(f"Erro ao ler o snapshot: {str(e)}")
+                        else:
+                            if df is not None:
+                                st.session_state.current_data = df
+                                st.success(f"📊 {len(df)} registros carregados do snapshot com {len(df.columns)} colunas")
+                            else:
+                                st.warning("Nenhuma partição do snapshot no período selecionado")
+                
+                with col2:
+                    max_age = st.number_input("Idade máxima (horas)", min_value=1, max_value=720, value=24)
+                
+                with col3:
+                    if st.button("🔄 Atualizar Partições"):
+                        if hasattr(st.session_state, 'connected') and st.session_state.connected:
+                            with st.spinner("Atualizando partições desatualizadas..."):
+                                refreshed, error = snapshot_store.refresh(
+                                    st.session_state.db_connection.execute_query, query,
+                                    empresa, data_inicio, data_fim, produto, cliente, max_age_hours=max_age
+                                )
+                            if error:
+                                st.error(error)
+                            elif refreshed:
+                                st.success(f"Partições atualizadas: {', '.join(refreshed)}")
+                            else:
+                                st.info("Todas as partições estão atualizadas")
+                        else:
+                            st.error("❌ Conecte-se ao banco de dados primeiro!")
+            else:
+                st.info("Nenhum snapshot salvo para esta consulta e filtros")
+        
+        # Paginação direto no Firebird, sem carregar o resultado
+        with st.expander("📑 Navegar no Servidor"):
+            st.caption("Pagina a consulta no Firebird (ROWS m TO n) com ordenação e busca no servidor, "
+                       "sem carregar o resultado inteiro na memória")
+            if hasattr(st.session_state, 'connected') and st.session_state.connected:
+                if st.checkbox("Ativar navegação no servidor", key="servidor_ativo"):
+                    pager = get_server_pager(st.session_state.db_connection, query,
+                                             build_params(empresa, data_inicio, data_fim, produto, cliente),
+                                             key="servidor")
+                    render_data_grid(pager, key="servidor", page_size=st.session_state.max_rows)
+            else:
+                st.info("Conecte-se ao banco de dados para navegar no servidor")
+        
+        # Importação de arquivos exportados (Parquet/Feather) como dados atuais
+        with st.expander("📥 Importar Arquivo"):
+            imported = render_arrow_import(key="importar")
+            if imported is not None:
+                st.session_state.current_data = imported
+        
+        # SQL ad hoc sobre os dados carregados e o snapshot, no DuckDB (sem voltar ao Firebird)
+        with st.expander("🦆 SQL Local (DuckDB)"):
+            local_result = render_local_sql(st.session_state.get('current_data'), key="sql_local",
+                                            snapshot_files=snapshot_store.files(sid),
+                                            page_size=st.session_state.max_rows)
+            if local_result is not None:
+                st.session_state.current_data = local_result
     
     with tab2:
         st.header("Visualizações Avançadas")
@@ -456,8 +615,56 @@ LEFT JOIN (
         if 'current_data' in st.session_state and not st.session_state.current_data.empty:
             df = st.session_state.current_data
             
+            # Filtros sobre o resultado carregado (índices montados uma vez por resultado)
+            date_column = find_date_column(df)
+            with st.expander("🔎 Filtros"):
+                df, filters = render_filter_panel(df, key="resultado", date_column=date_column)
+                if df is not st.session_state.current_data:
+                    st.caption(f"📊 {len(df):,} de {len(st.session_state.current_data):,} registros selecionados")
+            
+            # Modo aproximado: amostra estratificada enquanto o cubo exato é montado em segundo plano
+            approximate = render_approximate_mode(st.session_state.current_data, df, filters, key="resultado",
+                                                  date_column=date_column)
+            
+            # Cubo do resultado: atende aos KPIs e gráficos quando os filtros cabem nas suas dimensões
+            if approximate is None:
+                cube = get_cube(st.session_state.current_data, key="resultado")
+                slices = cube.slices_for(filters)
+                view = df
+            else:
+                sample, view, sample_mask = approximate
+                cube = slices = None
+            
+            # Métricas principais
+            if approximate is None:
+                render_kpi_row(cube, slices, df, key="resultado")
+            else:
+                render_kpi_row(None, None, view, key="resultado", estimate=sample.estimate_kpis(sample_mask))
+            
+            # Agregação no servidor: só para o resultado da última consulta ao Firebird
+            last_result = st.session_state.get('last_query_result')
+            can_aggregate = (hasattr(st.session_state, 'connected') and st.session_state.connected
+                             and last_result is not None and last_result['df'] is df)
+            server_aggregation = st.checkbox(
+                "Agregar no servidor (Firebird)", value=False, disabled=not can_aggregate,
+                help="Gera um GROUP BY em torno da consulta e busca apenas as linhas agregadas para os gráficos Top 10, temporal, barras e pizza"
+            )
+            aggregator = None
+            if server_aggregation and can_aggregate:
+                db_connection = st.session_state.db_connection
+                aggregator = ServerAggregator(
+                    lambda sql, params: execute_with_cache(db_connection, sql, params)[:2],
+                    last_result['query'], last_result['params']
+                )
+            elif approximate is not None:
+                aggregator = SampleAggregator(sample, view, sample_mask)
+            elif slices is not None:
+                aggregator = CubeAggregator(cube, slices)
+            
             # Criar gráficos automaticamente
-            charts = create_advanced_charts(df)
+            chart_start = time.perf_counter()
+            charts = create_advanced_charts(view, aggregator)
+            record_charts(st.session_state.current_data, time.perf_counter() - chart_start)
             
             if charts:
                 # Organizar gráficos em colunas
@@ -470,11 +677,21 @@ LEFT JOIN (
                             with col:
                                 st.plotly_chart(fig, use_container_width=True)
             
+            if isinstance(aggregator, ServerAggregator):
+                st.caption(f"🗄️ {aggregator.fetched_rows:,} linhas agregadas transferidas do Firebird")
+            
+            # Roll-up / drill-down pelo cubo
+            st.subheader("🧊 Análise por Cubo")
+            if cube is None:
+                st.info("⏳ A análise por cubo fica disponível quando o resultado exato estiver pronto.")
+            else:
+                render_cube_explorer(cube, slices, df, key="resultado")
+            
             # Seção de gráficos personalizados
             st.subheader("🎨 Criar Gráfico Personalizado")
             
-            numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-            categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+            numeric_cols = view.select_dtypes(include=['number']).columns.tolist()
+            categorical_cols = view.select_dtypes(include=['object', 'category']).columns.tolist()
             
             col1, col2, col3 = st.columns(3)
             
@@ -497,17 +714,18 @@ LEFT JOIN (
             
             if st.button("📈 Gerar Gráfico Personalizado") and y_axis:
                 if chart_type == "Barras" and x_axis:
-                    fig = px.bar(df, x=x_axis, y=y_axis, title=f"{y_axis} por {x_axis}")
+                    data = aggregate_by(view, x_axis, y_axis, aggregator) if aggregator else view
+                    fig = px.bar(data, x=x_axis, y=y_axis, title=f"{y_axis} por {x_axis}")
                 elif chart_type == "Linha" and x_axis:
-                    fig = px.line(df, x=x_axis, y=y_axis, title=f"Evolução de {y_axis}")
+                    fig = line_figure(view, x_axis, y_axis, f"Evolução de {y_axis}")
                 elif chart_type == "Dispersão" and len(numeric_cols) >= 2:
                     x_numeric = st.selectbox("Selecione X numérico:", numeric_cols)
-                    fig = px.scatter(df, x=x_numeric, y=y_axis, title=f"{y_axis} vs {x_numeric}")
+                    fig = scatter_figure(view, x_numeric, y_axis, f"{y_axis} vs {x_numeric}")
                 elif chart_type == "Pizza" and x_axis:
-                    df_grouped = df.groupby(x_axis)[y_axis].sum().reset_index()
+                    df_grouped = aggregate_by(view, x_axis, y_axis, aggregator)
                     fig = px.pie(df_grouped, values=y_axis, names=x_axis, title=f"Distribuição de {y_axis}")
                 elif chart_type == "Histograma":
-                    fig = px.histogram(df, x=y_axis, title=f"Distribuição de {y_axis}")
+                    fig = histogram_figure(view[y_axis], f"Distribuição de {y_axis}")
                 else:
                     st.error("Configuração inválida para o tipo de gráfico selecionado")
                     fig = None
@@ -518,31 +736,24 @@ LEFT JOIN (
             # Opção de download dos dados
             st.subheader("📥 Exportar Dados")
             
-            col1, col2 = st.columns(2)
+            col1, col2, col3 = st.columns(3)
             
             with col1:
-                csv = df.to_csv(index=False)
-                st.download_button(
-                    label="📄 Download CSV",
-                    data=csv,
-                    file_name=f"dados_vendas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    mime="text/csv"
-                )
+                # Exportação direto do cursor: só para o resultado da última consulta ao Firebird
+                from_database = (hasattr(st.session_state, 'connected') and st.session_state.connected
+                                 and last_result is not None and last_result['df'] is st.session_state.current_data)
+                if from_database:
+                    render_csv_export(df, key="resultado", file_prefix="dados_vendas",
+                                      db_connection=st.session_state.db_connection,
+                                      query=last_result['query'], params=last_result['params'])
+                else:
+                    render_csv_export(df, key="resultado", file_prefix="dados_vendas")
             
             with col2:
-                # Usar BytesIO para criar o arquivo Excel em memória
-                from io import BytesIO
-                excel_buffer = BytesIO()
-                with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                    df.to_excel(writer, index=False, sheet_name='Dados')
-                excel_buffer.seek(0) # Voltar ao início do buffer
-                
-                st.download_button(
-                    label="📊 Download Excel",
-                    data=excel_buffer,
-                    file_name=f"dados_vendas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+                render_excel_export(df, key="resultado", file_prefix="dados_vendas")
+            
+            with col3:
+                render_arrow_export(df, key="resultado", file_prefix="dados_vendas")
         else:
             st.info("🔍 Execute uma consulta na aba 'Consulta SQL' para visualizar os dados aqui.")
     
@@ -566,13 +777,17 @@ LEFT JOIN (
         st.subheader("⚡ Configurações de Performance")
         
         max_rows = st.number_input("Máximo de linhas para visualização", 
-                                 min_value=100, max_value=10000, value=1000)
+                                 min_value=100, max_value=10000, key="max_rows",
+                                 help="Linhas por página nas grades de dados")
         
         auto_refresh = st.checkbox("Atualização automática dos gráficos")
         
         # Informações do sistema
         st.subheader("ℹ️ Informações do Sistema")
         
+        pool = st.session_state.db_connection.pool
+        pool_stats = pool.stats() if pool else None
+        
         st.info(f"""
         **Versões das Bibliotecas:**
         - Streamlit: {st.__version__}
@@ -581,6 +796,8 @@ LEFT JOIN (
         
         **Status da Conexão:**
         - Banco: {'✅ Conectado' if hasattr(st.session_state, 'connected') and st.session_state.connected else '❌ Desconectado'}
+        - Pool de conexões: {f"{pool_stats['em_uso']} em uso, {pool_stats['ociosas']} ociosas (máx. {pool_stats['max']})" if pool_stats else 'N/A'}
+        - Instruções preparadas: {f"{pool_stats['instrucoes_preparadas']} em cache, {pool_stats['prepare_hits']} reaproveitadas, {pool_stats['prepare_misses']} preparadas" if pool_stats else 'N/A'}
         
         **Dados Carregados:**
         - Registros: {len(st.session_state.current_data) if 'current_data' in st.session_state else 0}
@@ -0,0 +1,103 @@
+import streamlit as st
+
+from charts import create_advanced_charts
+from cube import CubeAggregator, SalesCube
+from cube_panel import current_cube, store_cube
+from datasets import dataset_token
+from filter_panel import get_filter_index
+from jobs import STATUS_DONE, get_job, submit_job
+from sampling import DEFAULT_FRACTION, StratifiedSample
+
+
+def get_sample(df, key, fraction):
+    """Retorna a amostra estratificada da sessão para o DataFrame, sorteando-a quando os dados mudam"""
+    state_key = f"{key}_amostra"
+    sample = st.session_state.get(state_key)
+    if sample is None or sample.population is not df or sample.fraction != fraction:
+        sample = StratifiedSample(df, fraction)
+        st.session_state[state_key] = sample
+    return sample
+
+
+def _build_exact(df, df_filtered, filters):
+    """Monta o cubo exato e aquece os gráficos dos filtros atuais (executa em segundo plano)"""
+    cube = SalesCube(df)
+    slices = cube.slices_for(filters)
+    create_advanced_charts(df_filtered, CubeAggregator(cube, slices) if slices is not None else None)
+    return cube
+
+
+def _start_exact(df, df_filtered, filters, key):
+    """Dispara o cálculo exato em segundo plano, uma vez por conjunto de dados"""
+    state_key = f"{key}_exato"
+    token = dataset_token(df)
+    state = st.session_state.get(state_key)
+    if state is not None and state['token'] == token:
+        return state
+    if state is not None and state['job_id']:
+        previous = get_job(state['job_id'])
+        if previous is not None:
+            previous.cancel()
+    job = submit_job(lambda job: _build_exact(df, df_filtered, filters), background=True)
+    state = {'token': token, 'job_id': job.id, 'error': None}
+    st.session_state[state_key] = state
+    return state
+
+
+@st.fragment(run_every=1)
+def _show_exact_job(key):
+    """Acompanha o cálculo exato e recarrega a página com o cubo quando ele ficar pronto"""
+    state = st.session_state[f"{key}_exato"]
+    job = get_job(state['job_id']) if state['job_id'] else None
+    if job is None:
+        return
+    if not job.done:
+        st.caption(f"⏳ Calculando o resultado exato em segundo plano... {job.elapsed():.0f}s")
+        return
+    state['job_id'] = None
+    if job.status == STATUS_DONE:
+        store_cube(job.result, key)
+    else:
+        state['error'] = job.error or job.status
+    st.rerun()
+
+
+def render_approximate_mode(df, df_filtered, filters, key, date_column=None):
+    """Controles do modo aproximado: KPIs e gráficos sobre uma amostra estratificada por ano_mes e tipo
+
+    Enquanto o modo está ligado e o cubo exato não fica pronto (ele é montado em segundo
+    plano), retorna (amostra, recorte da amostra, máscara) para os filtros atuais; caso
+    contrário retorna None e a página segue com o resultado exato. df e filters são os
+    mesmos passados a/devolvidos por render_filter_panel.
+    """
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        approximate = st.toggle(
+            "⚡ Modo aproximado (amostra estratificada)", key=f"{key}_aproximado",
+            help="Mostra KPIs e gráficos estimados por uma amostra estratificada por mês e tipo "
+                 "(Venda/Devolução) enquanto o resultado exato é calculado em segundo plano"
+        )
+    with col2:
+        percent = st.number_input("Amostra (%)", min_value=1, max_value=50, value=int(DEFAULT_FRACTION * 100),
+                                  key=f"{key}_amostra_pct", disabled=not approximate)
+    if not approximate:
+        return None
+    if current_cube(df, key) is not None:
+        st.caption("✅ Resultado exato pronto: KPIs e gráficos calculados sobre todas as linhas")
+        return None
+
+    state = _start_exact(df, df_filtered, filters, key)
+    if state['error']:
+        st.error(f"Erro ao calcular o resultado exato: {state['error']}")
+    elif state['job_id']:
+        _show_exact_job(key)
+
+    sample = get_sample(df, key, percent / 100)
+    rows = None
+    if df_filtered is not df:
+        index = get_filter_index(df, key, date_column)
+        rows = index.rows(filters['date_range'], filters['values'], filters['ranges'])
+    frame, mask = sample.subset(df_filtered, rows)
+    st.caption(f"🎲 Amostra de {len(sample):,} de {len(df):,} linhas em {sample.strata_count} estratos "
+               f"({len(frame):,} no recorte dos filtros); somas expandidas pelos pesos de cada estrato")
+    return sample, frame, mask
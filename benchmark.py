@@ -0,0 +1,358 @@
+"""Benchmark dos caminhos críticos do dashboard, sem navegador
+
+Mede tempo (perf_counter) e pico de memória (tracemalloc, em uma execução separada)
+da busca de linhas em execute_query, dos gráficos avançados, dos filtros da sidebar
+do demo, das estatísticas básicas (column_statistics) e da exportação CSV/Excel, sobre dados sintéticos de
+vendas. O Firebird é substituído por um cursor em memória.
+
+Uso:
+    python benchmark.py --sizes 10000 100000 --output bench.json
+    python benchmark.py --sizes 10000 100000 --compare bench_anterior.json
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from charts import clear_figure_cache, create_advanced_charts
+from cube import SalesCube
+from datasets import clear_result_cache
+from exports import ExportStore, export_csv, write_excel
+from filters import FilterIndex, filter_sales_data
+from firebird_db import DatabaseConnection
+from pool import PooledConnection
+from sample_data import generate_sample_data
+from stats import column_statistics
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+# Acima destes tamanhos o benchmark é pulado (memória/tempo proibitivos)
+DEFAULT_MAX_FETCH_ROWS = 1_000_000
+DEFAULT_MAX_EXCEL_ROWS = 100_000
+
+# Benchmarks do caminho com cache: uma execução de aquecimento, fora da medição
+WARM_BENCHMARKS = {"column_statistics_cached"}
+
+# Diferença relativa de tempo a partir da qual a comparação marca regressão
+REGRESSION_THRESHOLD = 0.10
+
+
+class FakeCursor:
+    """Cursor em memória com a mesma interface usada do fdb (description, prep, execute, fetchmany, fetchall)"""
+
+    def __init__(self, columns, description):
+        self._columns = columns
+        self._rows = len(columns[0]) if columns else 0
+        self._pos = 0
+        self.description = description
+
+    def prep(self, query):
+        return query
+
+    def execute(self, query, params=None):
+        self._pos = 0
+
+    def fetchmany(self, size):
+        start = self._pos
+        self._pos = min(start + size, self._rows)
+        return list(zip(*[column[start:self._pos] for column in self._columns]))
+
+    def fetchall(self):
+        return self.fetchmany(self._rows - self._pos)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Conexão que devolve sempre um FakeCursor sobre as mesmas colunas"""
+
+    def __init__(self, columns, description):
+        self._columns = columns
+        self._description = description
+
+    def cursor(self):
+        return FakeCursor(self._columns, self._description)
+
+
+class FakePooled(PooledConnection):
+    """PooledConnection sobre a conexão em memória (sem health check)"""
+
+    def is_alive(self):
+        return True
+
+
+class FakePool:
+    """Substituto de ConnectionPool com uma única conexão em memória"""
+
+    def __init__(self, connection):
+        self._pooled = FakePooled(connection)
+
+    def acquire(self):
+        return self._pooled
+
+    def release(self, pooled, discard=False):
+        pass
+
+
+def _type_code(series):
+    """type_code que o fdb informaria para a coluna"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return datetime.datetime
+    if pd.api.types.is_integer_dtype(series):
+        return int
+    if pd.api.types.is_float_dtype(series):
+        return float
+    return str
+
+
+def make_fake_connection(df):
+    """Monta um DatabaseConnection cujo pool devolve as linhas de df como o driver devolveria
+
+    As colunas são convertidas para listas de objetos Python uma única vez, fora da
+    medição, e os nomes ficam em maiúsculas como no Firebird.
+    """
+    description = [(str(name).upper(), _type_code(df[name]), None, None, None, None, True)
+                   for name in df.columns]
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            columns.append(series.to_numpy().astype('datetime64[us]').tolist())
+        else:
+            columns.append(series.astype(object).tolist())
+    db = DatabaseConnection()
+    db.pool = FakePool(FakeConnection(columns, description))
+    return db
+
+
+def _fetch(db, batch_size):
+    """Executa a consulta no cursor falso e falha se o resultado vier vazio"""
+    df, message = db.execute_query("SELECT * FROM VENDAS", batch_size=batch_size)
+    if df is None:
+        raise RuntimeError(message)
+    return df
+
+
+DEMO_FILTER = ((datetime.date(2024, 1, 1), datetime.date(2024, 6, 30)), 'Produto A', 'Todos', 'Todos')
+
+
+def _demo_filter(df):
+    """Filtros da sidebar do demo: primeiro semestre e um produto"""
+    return filter_sales_data(df, *DEMO_FILTER)
+
+
+def _demo_filter_indexed(df):
+    """Mesmos filtros respondidos pelo FilterIndex (montagem dos índices incluída)"""
+    return FilterIndex(df).filter_sales_data(*DEMO_FILTER)
+
+
+def _advanced_charts(df):
+    """Gráficos avançados montados do zero (sem o cache de figuras)"""
+    clear_figure_cache()
+    return create_advanced_charts(df)
+
+
+def _column_statistics(df):
+    """Estatísticas básicas calculadas do zero (sem o cache de resultados derivados)"""
+    clear_result_cache()
+    return column_statistics(df).describe()
+
+
+def _column_statistics_cached(df):
+    """Estatísticas básicas já calculadas para esta versão dos dados
+
+    Aquecido antes da medição (WARM_BENCHMARKS): o tempo medido é o do acesso pelo token
+    de versão mais a montagem da tabela exibida.
+    """
+    return column_statistics(df).describe()
+
+
+def _export_csv(df, directory, compress=False):
+    """Exportação CSV em blocos para arquivo, como no botão de download (sem reaproveitar arquivos)"""
+    return export_csv(df, compress, store=ExportStore(directory, max_files=1))
+
+
+def _export_csv_cursor(db, directory):
+    """Exportação CSV direto do cursor, sem montar DataFrame"""
+    rows, message = db.export_csv("SELECT * FROM VENDAS", None, os.path.join(directory, 'cursor.csv'))
+    if rows is None:
+        raise RuntimeError(message)
+    return rows
+
+
+def _export_excel(df, directory):
+    """Exportação Excel (openpyxl write-only, em blocos) como no botão de download"""
+    return write_excel(df, os.path.join(directory, 'dados.xlsx'))
+
+
+def build_benchmarks(df, db, options, directory):
+    """Lista (nome, função, motivo para pular ou None) dos benchmarks para um tamanho de dados"""
+    rows = len(df)
+    fetch_skip = (f"acima de --max-fetch-rows ({options.max_fetch_rows})"
+                  if rows > options.max_fetch_rows else None)
+    excel_skip = (f"acima de --max-excel-rows ({options.max_excel_rows})"
+                  if rows > options.max_excel_rows else None)
+    return [
+        ("fetch_fetchall", lambda: _fetch(db, None), fetch_skip),
+        ("fetch_streaming", lambda: _fetch(db, options.batch_size), fetch_skip),
+        ("advanced_charts", lambda: _advanced_charts(df), None),
+        ("demo_filter", lambda: _demo_filter(df), None),
+        ("demo_filter_index", lambda: _demo_filter_indexed(df), None),
+        ("cube_build", lambda: SalesCube(df), None),
+        ("column_statistics", lambda: _column_statistics(df), None),
+        ("column_statistics_cached", lambda: _column_statistics_cached(df), None),
+        ("export_csv", lambda: _export_csv(df, directory), None),
+        ("export_csv_gzip", lambda: _export_csv(df, directory, compress=True), None),
+        ("export_csv_cursor", lambda: _export_csv_cursor(db, directory), fetch_skip),
+        ("export_excel", lambda: _export_excel(df, directory), excel_skip),
+    ]
+
+
+def measure(func, repeat):
+    """Retorna (menor tempo em segundos, pico de memória em bytes)
+
+    O tempo é medido sem tracemalloc, que deixa as alocações bem mais lentas; o pico de
+    memória vem de uma execução extra com tracemalloc ativo.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+        del result
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return min(times), peak
+
+
+def _git_commit():
+    """Commit atual do repositório (ou None fora de um checkout git)"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _metadata(options):
+    """Informações do ambiente gravadas junto com os resultados"""
+    import plotly
+    return {
+        "commit": _git_commit(),
+        "data_hora": datetime.datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plotly": plotly.__version__,
+        "batch_size": options.batch_size,
+        "repeat": options.repeat,
+    }
+
+
+def run(options, log=print):
+    """Executa todos os benchmarks em todos os tamanhos e retorna o relatório"""
+    results = []
+    for rows in options.sizes:
+        log(f"Gerando {rows:,} registros...")
+        df = generate_sample_data(rows, seed=options.seed)
+        db = make_fake_connection(df) if rows <= options.max_fetch_rows else None
+
+        with tempfile.TemporaryDirectory() as directory:
+            for name, func, skip in build_benchmarks(df, db, options, directory):
+                if options.only and name not in options.only:
+                    continue
+                if skip:
+                    log(f"  {name:<24} pulado ({skip})")
+                    results.append({"benchmark": name, "linhas": rows, "pulado": skip})
+                    continue
+                if name in WARM_BENCHMARKS:
+                    func()
+                seconds, peak = measure(func, options.repeat)
+                log(f"  {name:<24} {seconds:9.3f} s {peak / 1024 ** 2:10.1f} MB")
+                results.append({"benchmark": name, "linhas": rows, "segundos": round(seconds, 6),
+                                "pico_bytes": peak})
+
+        del df, db
+        gc.collect()
+    return {"meta": _metadata(options), "resultados": results}
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """Compara dois relatórios e retorna as linhas da tabela de comparação e se houve regressão"""
+    previous = {(r["benchmark"], r["linhas"]): r for r in baseline["resultados"] if "segundos" in r}
+    lines = [f"{'benchmark':<24} {'linhas':>11} {'antes (s)':>10} {'agora (s)':>10} {'tempo':>8} {'memória':>8}"]
+    regression = False
+    for result in report["resultados"]:
+        old = previous.get((result["benchmark"], result["linhas"]))
+        if old is None or "segundos" not in result:
+            continue
+        time_ratio = result["segundos"] / old["segundos"] if old["segundos"] else float('inf')
+        memory_ratio = result["pico_bytes"] / old["pico_bytes"] if old["pico_bytes"] else float('inf')
+        flag = ""
+        if time_ratio > 1 + threshold or memory_ratio > 1 + threshold:
+            flag = "  <- regressão"
+            regression = True
+        lines.append(f"{result['benchmark']:<24} {result['linhas']:>11,} {old['segundos']:>10.3f} "
+                     f"{result['segundos']:>10.3f} {time_ratio:>7.2f}x {memory_ratio:>7.2f}x{flag}")
+    return lines, regression
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos caminhos críticos do dashboard")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="quantidades de linhas dos dados sintéticos")
+    parser.add_argument('--repeat', type=int, default=3, help="execuções cronometradas (vale a menor)")
+    parser.add_argument('--batch-size', type=int, default=5000, help="lote do fetch em modo streaming")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', nargs='+', help="executa apenas os benchmarks informados")
+    parser.add_argument('--max-fetch-rows', type=int, default=DEFAULT_MAX_FETCH_ROWS)
+    parser.add_argument('--max-excel-rows', type=int, default=DEFAULT_MAX_EXCEL_ROWS)
+    parser.add_argument('--output', help="arquivo JSON para gravar o relatório")
+    parser.add_argument('--compare', help="relatório JSON anterior para comparação")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="variação relativa considerada regressão (padrão 0.10)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+
+    report = run(options)
+
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Relatório gravado em {options.output}")
+
+    if options.compare:
+        with open(options.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        lines, regression = compare(report, baseline, options.threshold)
+        print(f"\nComparação com {options.compare} (commit {baseline['meta'].get('commit')}):")
+        print("\n".join(lines))
+        return 1 if regression else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
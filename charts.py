@@ -0,0 +1,187 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from datasets import dataset_token
+
+# Figuras mantidas em memória (compartilhadas pelo processo)
+FIGURE_CACHE_SIZE = 32
+
+# Limites de pontos enviados ao navegador
+HISTOGRAM_BINS = 50
+MAX_LINE_POINTS = 2000
+MAX_SCATTER_POINTS = 20_000
+WEBGL_MIN_POINTS = 5000
+
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+
+
+def cached_figures(key, build):
+    """Retorna as figuras em cache para a chave ou as monta com build() e guarda"""
+    with _figures_lock:
+        if key in _figures:
+            _figures.move_to_end(key)
+            return _figures[key]
+    figures = build()
+    with _figures_lock:
+        _figures[key] = figures
+        while len(_figures) > FIGURE_CACHE_SIZE:
+            _figures.popitem(last=False)
+    return figures
+
+
+def clear_figure_cache():
+    """Esvazia o cache de figuras"""
+    with _figures_lock:
+        _figures.clear()
+
+
+def lttb(x, y, threshold):
+    """Índices dos pontos escolhidos pelo Largest-Triangle-Three-Buckets
+
+    Mantém o primeiro e o último ponto e, em cada balde intermediário, o ponto que forma
+    o maior triângulo com o ponto escolhido antes e a média do balde seguinte.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_start, next_stop = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+        area = np.abs((x[previous] - avg_x) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def histogram_figure(series, title, color='#1f77b4', bins=HISTOGRAM_BINS):
+    """Histograma pré-agrupado com np.histogram: envia só as contagens de cada faixa"""
+    values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64)
+    values = values[np.isfinite(values)]
+    counts, edges = np.histogram(values, bins=bins) if len(values) else (np.array([]), np.array([0.0]))
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+                           marker_color=color))
+    fig.update_layout(title=title, xaxis_title=series.name, yaxis_title='count', bargap=0,
+                      showlegend=False)
+    return fig
+
+
+def line_figure(df, x, y, title, color='#ff7f0e', max_points=MAX_LINE_POINTS):
+    """Gráfico de linha reduzido a max_points pontos com LTTB"""
+    if len(df) > max_points:
+        xs = df[x]
+        numeric_x = xs.astype('int64') if pd.api.types.is_datetime64_any_dtype(xs) else np.arange(len(df))
+        df = df.iloc[lttb(numeric_x, df[y].to_numpy(dtype=np.float64), max_points)]
+    return px.line(df, x=x, y=y, title=title, color_discrete_sequence=[color])
+
+
+def scatter_figure(df, x, y, title, max_points=MAX_SCATTER_POINTS, **kwargs):
+    """Dispersão em WebGL para muitos pontos, com amostra aleatória acima de max_points"""
+    if len(df) > max_points:
+        df = df.sample(max_points, random_state=0)
+    render_mode = 'webgl' if len(df) >= WEBGL_MIN_POINTS else 'auto'
+    return px.scatter(df, x=x, y=y, title=title, render_mode=render_mode, **kwargs)
+
+
+def aggregate_by(df, dimension, measure, aggregator=None, temporal=False, limit=None):
+    """Soma a medida por dimensão, no Firebird quando houver agregador ou no pandas como fallback
+
+    Com temporal=True a dimensão é reduzida ao dia e o resultado fica ordenado por data;
+    caso contrário, fica ordenado pela medida em ordem decrescente.
+    """
+    if aggregator is not None:
+        grouped = aggregator.aggregate(dimension, measure, temporal=temporal, limit=limit)
+        if grouped is not None:
+            return grouped
+
+    if temporal:
+        dates = df[dimension]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates)
+        grouped = df.groupby(dates.dt.normalize().rename(dimension))[measure].sum().reset_index()
+    else:
+        grouped = df.groupby(dimension, observed=True)[measure].sum().sort_values(ascending=False).reset_index()
+    if limit:
+        grouped = grouped.head(limit)
+    return grouped
+
+
+def create_advanced_charts(df, aggregator=None):
+    """Cria visualizações avançadas com base nos dados
+
+    Com um ServerAggregator, os gráficos de evolução temporal e Top 10 buscam apenas as
+    linhas já agregadas no Firebird. As figuras ficam em cache pelo token de versão do
+    DataFrame e pelo agregador, de modo que reruns (ex.: troca de aba) não as recalculam.
+    """
+    if df.empty:
+        return []
+
+    aggregator_key = aggregator.cache_key() if aggregator is not None else None
+    key = ('advanced_charts', dataset_token(df), aggregator_key)
+    return cached_figures(key, lambda: _build_advanced_charts(df, aggregator))
+
+
+def _build_advanced_charts(df, aggregator):
+    charts = []
+
+    # Detectar colunas numéricas e categóricas
+    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+    categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+    date_cols = df.select_dtypes(include=['datetime64']).columns.tolist()
+
+    # Gráfico 1: Distribuição de valores (se houver colunas numéricas)
+    if numeric_cols:
+        col = numeric_cols[0]
+        fig = histogram_figure(df[col], f"Distribuição de {col}")
+        charts.append(("Distribuição", fig))
+
+    # Gráfico 2: Análise temporal (se houver colunas de data)
+    if date_cols and numeric_cols:
+        date_col = date_cols[0]
+        value_col = numeric_cols[0]
+        df_grouped = aggregate_by(df, date_col, value_col, aggregator, temporal=True)
+
+        fig = line_figure(df_grouped, date_col, value_col, f"Evolução Temporal de {value_col}")
+        charts.append(("Evolução Temporal", fig))
+
+    # Gráfico 3: Top 10 categorias (se houver colunas categóricas e numéricas)
+    if categorical_cols and numeric_cols:
+        cat_col = categorical_cols[0]
+        value_col = numeric_cols[0]
+
+        top_categories = aggregate_by(df, cat_col, value_col, aggregator, limit=10)
+
+        fig = px.bar(x=top_categories[value_col], y=top_categories[cat_col],
+                    orientation='h', title=f"Top 10 {cat_col} por {value_col}",
+                    color_discrete_sequence=['#2ca02c'])
+        fig.update_layout(yaxis={'categoryorder':'total ascending'})
+        charts.append(("Top 10", fig))
+
+    # Gráfico 4: Correlação entre variáveis numéricas
+    if len(numeric_cols) >= 2:
+        correlation_matrix = df[numeric_cols].corr()
+
+        fig = px.imshow(correlation_matrix,
+                       title="Matriz de Correlação",
+                       color_continuous_scale='RdBu_r',
+                       aspect="auto")
+        fig.update_layout(width=600, height=500)
+        charts.append(("Correlação", fig))
+
+    return charts
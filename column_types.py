@@ -0,0 +1,107 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from datasets import derive
+
+# Colunas de texto com até esta fração de valores distintos viram 'category'
+CATEGORY_MAX_RATIO = 0.5
+
+DATE_COLUMNS = ('data_efe',)
+PERIOD_COLUMNS = ('ano_mes',)
+
+# Texto de ano_mes devolvido pela consulta: extract(year) || '/' || lpad(month, 2, '0')
+PERIOD_TEXT_FORMAT = '%Y/%m'
+
+
+def _first_value(series):
+    """Primeiro valor não nulo da coluna (ou None)"""
+    index = series.first_valid_index()
+    return None if index is None else series[index]
+
+
+def _is_text(series):
+    """Coluna object ou string (os Decimals do fdb também chegam como object)"""
+    return series.dtype == object or pd.api.types.is_string_dtype(series.dtype)
+
+
+def period_to_text(series):
+    """Devolve uma coluna period ao texto 'AAAA/MM' da consulta (nulos continuam nulos)"""
+    return series.dt.strftime(PERIOD_TEXT_FORMAT).where(series.notna(), None)
+
+
+def _convert_decimal(series, mode):
+    """Converte Decimals em float64 ou, com mode='scaled', em int64 escalado pela maior casa decimal
+
+    No modo escalado a escala usada fica em attrs['scale'] (valor real = inteiro / 10**scale).
+    """
+    values = series.astype('float64')
+    if mode != 'scaled' or values.isna().any():
+        return values
+    scale = max((-v.as_tuple().exponent for v in series if isinstance(v, Decimal)), default=0)
+    scaled = np.rint(values.to_numpy() * 10 ** scale).astype(np.int64)
+    result = pd.Series(scaled, index=series.index, name=series.name)
+    result.attrs['scale'] = scale
+    return result
+
+
+def _convert_column(series, name, category_max_ratio, decimal_mode):
+    """Retorna a coluna convertida para um tipo mais compacto (ou a própria coluna)"""
+    lowered = str(name).lower()
+
+    if lowered in DATE_COLUMNS and not pd.api.types.is_datetime64_any_dtype(series):
+        return pd.to_datetime(series, errors='coerce')
+
+    if lowered in PERIOD_COLUMNS and _is_text(series):
+        parsed = pd.to_datetime(series.astype(str).str.replace('/', '-'), format='%Y-%m', errors='coerce')
+        if parsed.notna().sum() == series.notna().sum():
+            return parsed.dt.to_period('M')
+
+    if pd.api.types.is_integer_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+        return pd.to_numeric(series, downcast='integer')
+
+    if _is_text(series):
+        first = _first_value(series)
+        if isinstance(first, Decimal):
+            return _convert_decimal(series, decimal_mode)
+        if isinstance(first, str) and len(series) > 0:
+            if series.nunique(dropna=True) / len(series) <= category_max_ratio:
+                return series.astype('category')
+
+    return series
+
+
+def optimize_dtypes(df, category_max_ratio=CATEGORY_MAX_RATIO, decimal_mode='float'):
+    """Etapa de tipagem pós-consulta: Decimal -> float64, textos repetitivos -> category,
+    inteiros reduzidos e datas/ano_mes convertidos para datetime/period
+
+    Retorna (df_otimizado, relatorio), onde o relatório traz a memória de cada coluna
+    antes e depois da conversão. No modo decimal 'scaled' as escalas ficam em
+    df.attrs['decimal_scales'].
+    """
+    converted = {}
+    scales = {}
+    report = []
+    for column in df.columns:
+        series = df[column]
+        new_series = _convert_column(series, column, category_max_ratio, decimal_mode)
+        before = int(series.memory_usage(index=False, deep=True))
+        after = int(new_series.memory_usage(index=False, deep=True))
+        converted[column] = new_series
+        if 'scale' in new_series.attrs:
+            scales[column] = new_series.attrs['scale']
+        report.append({
+            "coluna": column,
+            "tipo_original": str(series.dtype),
+            "tipo_novo": str(new_series.dtype),
+            "bytes_antes": before,
+            "bytes_depois": after,
+            "economia_pct": round(100 * (before - after) / before, 1) if before else 0.0,
+        })
+
+    result = pd.DataFrame(converted, index=df.index)
+    if scales:
+        result.attrs['decimal_scales'] = scales
+    derive(result, df, 'tipagem', (category_max_ratio, decimal_mode))
+    return result, pd.DataFrame(report)
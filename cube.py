@@ -0,0 +1,240 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Dimensões e medidas expostas pela CTE vendas (comparadas sem diferenciar maiúsculas)
+DIMENSIONS = ('ano_mes', 'vendedor', 'nome_vendedor', 'cliente', 'cidade', 'estado', 'regiao',
+              'produto', 'marca', 'fabricante', 'grupo', 'tipo')
+MEASURES = ('quantidade', 'valorliquido', 'custofabrica', 'custoreposicao', 'custofinal',
+            'frete', 'despesas', 'vlr_total', 'markup_fabrica_x_vendas',
+            'markup_custoreposicao_x_vendas', 'markup_custofinal_x_vendas')
+TIME_DIMENSION = 'ano_mes'
+
+# Contagem de linhas de cada célula (permite médias e o total de registros)
+COUNT = 'registros'
+
+DEFAULT_CACHE_SIZE = 64
+
+
+def _resolve(df, names):
+    """Mapeia nome minúsculo -> coluna real do DataFrame para os nomes presentes"""
+    lowered = {str(column).lower(): column for column in df.columns}
+    return {name: lowered[name] for name in names if name in lowered}
+
+
+def to_month(value):
+    """Converte um valor de ano_mes ('2024/01', '2024-01' ou Period) em pd.Period mensal"""
+    if isinstance(value, pd.Period):
+        return value.asfreq('M')
+    return pd.Period(str(value).replace('/', '-'), freq='M')
+
+
+def _numeric_measures(df, measures):
+    """Converte as medidas em números (ex.: Decimals do fdb sem a etapa de tipagem)
+
+    Retorna (linhas, medidas): uma cópia rasa de df com as colunas convertidas, sem alterar
+    o original, e só as medidas cujos valores não nulos são todos numéricos.
+    """
+    columns = {}
+    numeric = {}
+    for name, column in measures.items():
+        series = df[column]
+        if not pd.api.types.is_numeric_dtype(series):
+            converted = pd.to_numeric(series, errors='coerce')
+            if converted.notna().sum() != series.notna().sum():
+                continue
+            columns[column] = converted
+        numeric[name] = column
+    return (df.assign(**columns) if columns else df), numeric
+
+
+class SalesCube:
+    """Cubo OLAP com as medidas somadas por dimensão, montado uma vez por conjunto de dados
+
+    Na montagem são materializados os cuboides (ano_mes, dimensão) de cada dimensão e,
+    a partir deles, os de uma dimensão só. Uma consulta é respondida pelo menor cuboide
+    que contém as dimensões agrupadas e fatiadas (roll-up); combinações sem cuboide
+    (ex.: cliente x marca) são agregadas uma vez a partir das linhas e guardadas.
+    """
+
+    def __init__(self, df, dimensions=DIMENSIONS, measures=MEASURES, cache_size=DEFAULT_CACHE_SIZE):
+        self.df = df
+        self.dimensions = _resolve(df, dimensions)
+        self._rows, self.measures = _numeric_measures(df, _resolve(df, measures))
+        self.cache_size = cache_size
+        self._cuboids = {}
+        self._cache = OrderedDict()
+
+        time_dimension = self.dimensions.get(TIME_DIMENSION)
+        others = [column for name, column in self.dimensions.items() if name != TIME_DIMENSION]
+        if time_dimension is not None:
+            for column in others:
+                self._materialize((time_dimension, column), self._rows)
+            base = self._cuboids.get(frozenset((time_dimension, others[0]))) if others else None
+            self._materialize((time_dimension,), base if base is not None else self._rows)
+            for column in others:
+                self._materialize((column,), self._cuboids[frozenset((time_dimension, column))])
+        else:
+            for column in others:
+                self._materialize((column,), self._rows)
+
+    def _aggregate(self, source, group_by):
+        """Soma as medidas de source (linhas ou cuboide) por group_by"""
+        measure_columns = list(self.measures.values())
+        if source is self._rows:
+            grouped = source.groupby(list(group_by), observed=True, dropna=False, sort=False)
+            cells = grouped[measure_columns].sum()
+            cells[COUNT] = grouped.size()
+        else:
+            grouped = source.groupby(list(group_by), observed=True, dropna=False, sort=False)
+            cells = grouped[measure_columns + [COUNT]].sum()
+        return cells.reset_index()
+
+    def _totals(self):
+        """Cuboide sem dimensões (uma linha com os totais)"""
+        totals = self._rows[list(self.measures.values())].sum().to_frame().T
+        totals[COUNT] = len(self._rows)
+        return totals
+
+    def _materialize(self, group_by, source):
+        cells = self._aggregate(source, group_by)
+        self._cuboids[frozenset(group_by)] = cells
+        return cells
+
+    def _source(self, columns):
+        """Menor cuboide materializado que contém as colunas (ou as próprias linhas)"""
+        candidates = [cells for dims, cells in self._cuboids.items() if columns <= dims]
+        if not candidates:
+            return None
+        return min(candidates, key=len)
+
+    @property
+    def cells(self):
+        """Total de células materializadas em todos os cuboides"""
+        return sum(len(cells) for cells in self._cuboids.values())
+
+    def dimension_names(self):
+        return list(self.dimensions.values())
+
+    def measure_names(self):
+        return list(self.measures.values())
+
+    def query(self, group_by, slices=None, measures=None):
+        """Agrega as medidas por group_by, restrito às fatias {dimensão: valores aceitos}
+
+        Com group_by vazio retorna uma única linha com os totais. Retorna None quando
+        alguma coluna não é dimensão ou medida do cubo.
+        """
+        group_by = tuple(group_by)
+        slices = {column: tuple(values) for column, values in (slices or {}).items()}
+        measures = tuple(measures) if measures else tuple(self.measures.values()) + (COUNT,)
+        dimension_columns = set(self.dimensions.values())
+        if not set(group_by) <= dimension_columns or not set(slices) <= dimension_columns:
+            return None
+        if not set(measures) <= set(self.measures.values()) | {COUNT}:
+            return None
+
+        key = (group_by, tuple(sorted(slices.items(), key=str)), measures)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        needed = frozenset(group_by) | frozenset(slices)
+        source = self._source(needed)
+        if source is None and needed:
+            # Drill-down sem cuboide: agrega uma vez a partir das linhas e guarda o cuboide
+            source = self._materialize(tuple(needed), self._rows)
+        elif source is None:
+            source = self._totals()
+
+        if slices:
+            mask = np.ones(len(source), dtype=bool)
+            for column, values in slices.items():
+                mask &= source[column].isin(values).to_numpy()
+            source = source[mask]
+
+        if group_by:
+            result = source.groupby(list(group_by), observed=True, dropna=False)[list(measures)].sum().reset_index()
+        else:
+            result = source[list(measures)].sum().to_frame().T
+
+        self._cache[key] = result
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def months(self, start, end):
+        """Valores de ano_mes cobertos inteiramente pelo período [start, end]
+
+        Retorna None se o período não começar no primeiro dia de um mês e terminar no
+        último dia de outro (o cubo não tem granularidade diária).
+        """
+        column = self.dimensions.get(TIME_DIMENSION)
+        if column is None:
+            return None
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if start.day != 1 or not end.is_month_end:
+            return None
+        values = self._cuboids[frozenset((column,))][column]
+        first, last = start.to_period('M'), end.to_period('M')
+        return [value for value in values if first <= to_month(value) <= last]
+
+    def slices_for(self, filters):
+        """Converte o estado do painel de filtros em fatias do cubo
+
+        filters é o dicionário devolvido por render_filter_panel. Retorna None quando
+        algum filtro não pode ser expresso no cubo (faixas numéricas, colunas que não são
+        dimensões ou um período que não cobre meses inteiros).
+        """
+        if filters is None:
+            return {}
+        if filters.get('ranges'):
+            return None
+        slices = {}
+        dimension_columns = set(self.dimensions.values())
+        for column, values in (filters.get('values') or {}).items():
+            if column not in dimension_columns:
+                return None
+            slices[column] = tuple(values)
+
+        date_range = filters.get('date_range')
+        date_bounds = filters.get('date_bounds')
+        if date_range and len(date_range) == 2 and date_bounds is not None:
+            first, last = (pd.Timestamp(d).normalize() for d in date_bounds)
+            start, end = pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1])
+            if start > first or end < last:
+                # Extremos do período além dos dados contam como meses inteiros
+                if start <= first:
+                    start = first.replace(day=1)
+                if end >= last:
+                    end = last + pd.offsets.MonthEnd(0)
+                months = self.months(start, end)
+                if months is None:
+                    return None
+                slices[self.dimensions[TIME_DIMENSION]] = tuple(months)
+        return slices
+
+
+class CubeAggregator:
+    """Responde às agregações dos gráficos pelo cubo, com a mesma interface do ServerAggregator"""
+
+    def __init__(self, cube, slices=None):
+        self.cube = cube
+        self.slices = slices or {}
+
+    def cache_key(self):
+        """Identifica as agregações deste agregador no cache de figuras"""
+        return ('cubo', id(self.cube), tuple(sorted(self.slices.items(), key=str)))
+
+    def aggregate(self, dimension, measure, temporal=False, limit=None):
+        """Retorna o DataFrame agregado ou None para que o chamador agregue no pandas"""
+        if temporal:
+            return None
+        grouped = self.cube.query((dimension,), self.slices, (measure,))
+        if grouped is None:
+            return None
+        grouped = grouped.sort_values(measure, ascending=False)
+        if limit:
+            grouped = grouped.head(limit)
+        return grouped.reset_index(drop=True)
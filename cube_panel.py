@@ -0,0 +1,133 @@
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from cube import SalesCube, COUNT
+from kpis import KpiEngine, kpis_from_frame
+
+
+def get_cube(df, key):
+    """Retorna o cubo da sessão para o DataFrame, montando-o quando os dados mudam"""
+    state_key = f"{key}_cube"
+    cube = st.session_state.get(state_key)
+    if cube is None or cube.df is not df:
+        cube = SalesCube(df)
+        st.session_state[state_key] = cube
+    return cube
+
+
+def current_cube(df, key):
+    """Retorna o cubo da sessão já montado para o DataFrame, ou None (sem montá-lo)"""
+    cube = st.session_state.get(f"{key}_cube")
+    return cube if cube is not None and cube.df is df else None
+
+
+def store_cube(cube, key):
+    """Guarda na sessão um cubo montado fora dela (ex.: em um job em segundo plano)"""
+    st.session_state[f"{key}_cube"] = cube
+
+
+def get_kpi_engine(cube, key):
+    """Retorna o KpiEngine da sessão para o cubo, recriando-o quando o cubo muda"""
+    state_key = f"{key}_kpis"
+    engine = st.session_state.get(state_key)
+    if engine is None or engine.cube is not cube:
+        engine = KpiEngine(cube)
+        st.session_state[state_key] = engine
+    return engine
+
+
+def _money(value):
+    return "—" if value is None else f"R$ {value:,.2f}"
+
+
+def _format(name, value):
+    """Formata a margem de erro de um KPI pela unidade da métrica"""
+    if name in ("total_vendas", "ticket_medio"):
+        return _money(value)
+    if name == "registros":
+        return f"{value:,.0f}"
+    return f"{value:.3f}x"
+
+
+def render_kpi_row(cube, slices, df_filtered, key, estimate=None):
+    """Linha de métricas (vendas, pedidos, ticket médio, markup) para os filtros ativos
+
+    Com slices vindas do cubo os KPIs saem das somas parciais do KpiEngine; caso
+    contrário são calculados sobre as linhas filtradas. Com estimate (kpis, margens),
+    vindo de uma amostra, as métricas mostram a estimativa e o intervalo de confiança.
+    """
+    margins = None
+    if estimate is not None:
+        kpis, margins = estimate
+    elif slices is not None:
+        kpis = get_kpi_engine(cube, key).kpis(slices)
+    else:
+        kpis = kpis_from_frame(df_filtered)
+
+    def show(label, name, text, help=None):
+        # Margem zero (ex.: contagem sem filtros) significa valor exato
+        margin = margins.get(name) if margins is not None else None
+        st.metric(label, ("≈ " + text) if margin else text, help=help)
+        if margin:
+            st.caption(f"IC 95%: ± {_format(name, margin)}")
+
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        show("💰 Total de Vendas", "total_vendas", _money(kpis["total_vendas"]))
+
+    with col2:
+        show("📋 Total de Pedidos", "registros", f"{kpis['registros']:,}")
+
+    with col3:
+        show("🎯 Ticket Médio", "ticket_medio", _money(kpis["ticket_medio"]))
+
+    with col4:
+        markup = kpis["markup_medio"]
+        weighted = kpis["markup_ponderado"]
+        show("📈 Markup Médio", "markup_medio", "—" if markup is None else f"{markup:.2f}x",
+             help=None if weighted is None else f"Markup ponderado (vendas / custo de fábrica): {weighted:.2f}x"
+             + (f" ± {_format('markup_ponderado', margins['markup_ponderado'])}" if margins and margins.get("markup_ponderado") else ""))
+
+
+def render_cube_explorer(cube, slices, df_filtered, key):
+    """Roll-up/drill-down por dimensão do cubo, fatiado pelos filtros ativos
+
+    Quando os filtros não podem ser expressos no cubo (slices None), a mesma agregação
+    é feita sobre as linhas filtradas.
+    """
+    dimensions = cube.dimension_names()
+    measures = cube.measure_names() + [COUNT]
+    if not dimensions or len(measures) == 1:
+        st.info("O resultado não tem dimensões/medidas da consulta de vendas para montar o cubo.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        dimension = st.selectbox("Agrupar por", dimensions, key=f"{key}_cubo_dimensao")
+    with col2:
+        drill = st.selectbox("Detalhar por", [""] + [d for d in dimensions if d != dimension],
+                             key=f"{key}_cubo_detalhe")
+    with col3:
+        default = measures.index(cube.measures['valorliquido']) if 'valorliquido' in cube.measures else 0
+        measure = st.selectbox("Medida", measures, index=default, key=f"{key}_cubo_medida")
+
+    group_by = [dimension] + ([drill] if drill else [])
+    if slices is not None:
+        result = cube.query(group_by, slices, (measure,))
+        st.caption(f"🧊 Respondido pelo cubo ({cube.cells:,} células materializadas)")
+    else:
+        grouped = df_filtered.groupby(group_by, observed=True, dropna=False)
+        result = (grouped.size().rename(COUNT) if measure == COUNT else grouped[measure].sum()).reset_index()
+        st.caption("Filtros fora das dimensões do cubo: agregado a partir das linhas filtradas")
+
+    result = result.sort_values(measure, ascending=False)
+    # O plotly não serializa pd.Period (ano_mes tipado): plota os períodos como texto
+    plotted = result.assign(**{str(column): result[column].astype(str) for column in group_by
+                               if isinstance(result[column].dtype, pd.PeriodDtype)})
+    fig = px.bar(plotted, x=dimension, y=measure, color=drill or None,
+                 title=f"{measure} por {dimension}" + (f" e {drill}" if drill else ""))
+    st.plotly_chart(fig, use_container_width=True)
+    with st.expander("Ver tabela agregada"):
+        st.dataframe(result, use_container_width=True)
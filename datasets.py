@@ -0,0 +1,113 @@
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Chave em df.attrs com o token de versão do conjunto de dados
+TOKEN_ATTR = 'dataset_token'
+
+# Resultados derivados mantidos em memória (compartilhados pelo processo)
+RESULT_CACHE_SIZE = 64
+
+# Linhas amostradas para a impressão digital do DataFrame
+FINGERPRINT_SAMPLE = 256
+
+
+def fingerprint(df):
+    """Impressão digital barata do DataFrame: formato, colunas, tipos e hash de linhas amostradas
+
+    Custa o mesmo para 1 mil ou 10 milhões de linhas (até FINGERPRINT_SAMPLE linhas são
+    lidas, incluindo a primeira e a última).
+    """
+    rows = len(df)
+    sample = np.unique(np.linspace(0, rows - 1, min(rows, FINGERPRINT_SAMPLE)).astype(np.int64)) if rows else []
+    try:
+        hashed = pd.util.hash_pandas_object(df.iloc[sample], index=False).to_numpy()
+    except TypeError:
+        # Valores não hasheáveis (ex.: listas): a identidade do objeto é o que resta
+        hashed = np.array([id(df)], dtype=np.int64)
+    return (rows, tuple(map(str, df.columns)), tuple(map(str, df.dtypes)), hashed.tobytes())
+
+
+def _guard(df):
+    """Identidade e formato do objeto que recebeu o token
+
+    O pandas copia df.attrs para os DataFrames derivados (iloc, take, copy...); a guarda
+    faz com que essas cópias não herdem um token que não descreve os seus dados.
+    """
+    return (id(df), len(df), tuple(map(str, df.columns)))
+
+
+def _digest(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def _set_token(df, token):
+    # Atribui um novo dicionário: o attrs pode ser compartilhado com o DataFrame de origem
+    df.attrs = {**df.attrs, TOKEN_ATTR: (token, _guard(df))}
+    return df
+
+
+def stamp(df, source, params=None):
+    """Atribui um token de versão a dados recém-carregados e retorna o próprio df
+
+    Com params o token é determinístico (mesma origem e parâmetros, mesmo token, como nos
+    dados de exemplo gerados com semente); sem params cada carga recebe um token novo.
+    """
+    if df is None:
+        return df
+    token = _digest(source, params) if params is not None else _digest(source, uuid.uuid4().hex)
+    return _set_token(df, token)
+
+
+def derive(df, parents, op, params=None):
+    """Atribui a df o token derivado dos pais pela operação op com os parâmetros params
+
+    parents é um DataFrame ou uma sequência deles (ex.: partes concatenadas). O token é
+    determinístico: repetir a operação sobre os mesmos dados gera o mesmo token.
+    """
+    if df is None:
+        return df
+    if isinstance(parents, pd.DataFrame):
+        parents = (parents,)
+    return _set_token(df, _digest(tuple(dataset_token(parent) for parent in parents), op, params))
+
+
+def dataset_token(df):
+    """Token de versão do DataFrame em O(1), ou a impressão digital quando não há token válido
+
+    Os DataFrames tratados por stamp/derive são considerados imutáveis: alterar um deles
+    no lugar exige marcá-lo de novo.
+    """
+    entry = df.attrs.get(TOKEN_ATTR)
+    if entry is not None and entry[1] == _guard(df):
+        return entry[0]
+    return fingerprint(df)
+
+
+_results = OrderedDict()
+_results_lock = threading.Lock()
+
+
+def cached_result(df, op, params, compute):
+    """Resultado de compute() guardado pela chave (token do df, op, params)"""
+    key = (dataset_token(df), op, params)
+    with _results_lock:
+        if key in _results:
+            _results.move_to_end(key)
+            return _results[key]
+    result = compute()
+    with _results_lock:
+        _results[key] = result
+        while len(_results) > RESULT_CACHE_SIZE:
+            _results.popitem(last=False)
+    return result
+
+
+def clear_result_cache():
+    """Esvazia o cache de resultados derivados"""
+    with _results_lock:
+        _results.clear()
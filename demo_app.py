@@ -5,6 +5,14 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
 from datetime import datetime, date, timedelta
+from sample_data import generate_sample_data, DEFAULT_N_RECORDS
+from charts import cached_figures, histogram_figure, line_figure, scatter_figure
+from datasets import dataset_token
+from grid_panel import get_pager, render_data_grid
+from export_panel import render_arrow_export, render_csv_export
+from filter_panel import render_filter_panel
+from cube_panel import get_cube, render_cube_explorer, render_kpi_row
+from stats import column_statistics, sliced_statistics
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -35,110 +43,32 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def generate_sample_data():
-    """Gera dados de exemplo para demonstração"""
-    np.random.seed(42)
-    
-    # Gerar dados de vendas
-    n_records = 1000
-    
-    # Datas
-    start_date = datetime(2024, 1, 1)
-    end_date = datetime(2024, 12, 31)
-    dates = pd.date_range(start_date, end_date, periods=n_records)
-    
-    # Produtos
-    produtos = ['Produto A', 'Produto B', 'Produto C', 'Produto D', 'Produto E']
-    
-    # Vendedores
-    vendedores = ['João Silva', 'Maria Santos', 'Pedro Costa', 'Ana Oliveira', 'Carlos Lima']
-    
-    # Clientes
-    clientes = [f'Cliente {i+1}' for i in range(50)]
-    
-    # Cidades
-    cidades = ['São Paulo', 'Rio de Janeiro', 'Belo Horizonte', 'Salvador', 'Brasília', 
-               'Fortaleza', 'Recife', 'Porto Alegre', 'Curitiba', 'Goiânia']
-    
-    # Estados
-    estados = ['SP', 'RJ', 'MG', 'BA', 'DF', 'CE', 'PE', 'RS', 'PR', 'GO']
-    
-    # Marcas
-    marcas = ['Marca Alpha', 'Marca Beta', 'Marca Gamma', 'Marca Delta', 'Marca Epsilon']
-    
-    data = []
+def sum_by(df, group_by, measure, cube=None, slices=None):
+    """Soma a medida por group_by pelo cubo (quando os filtros cabem nele) ou pelas linhas"""
+    if cube is not None and slices is not None:
+        result = cube.query(group_by, slices, (measure,))
+        if result is not None:
+            return result
+    return df.groupby(list(group_by), observed=True)[measure].sum().reset_index()
+
+def create_advanced_charts(df, cube=None, slices=None):
+    """Cria visualizações avançadas com base nos dados
     
-    for i in range(n_records):
-        produto = np.random.choice(produtos)
-        vendedor = np.random.choice(vendedores)
-        cliente = np.random.choice(clientes)
-        cidade = np.random.choice(cidades)
-        estado = np.random.choice(estados)
-        marca = np.random.choice(marcas)
-        
-        # Quantidade vendida
-        quantidade = np.random.randint(1, 100)
-        
-        # Preços baseados no produto
-        preco_base = {'Produto A': 50, 'Produto B': 75, 'Produto C': 100, 
-                     'Produto D': 125, 'Produto E': 150}[produto]
-        
-        preco_unitario = preco_base + np.random.normal(0, 10)
-        valor_liquido = quantidade * preco_unitario
-        
-        # Custos
-        custo_fabrica = valor_liquido * np.random.uniform(0.4, 0.6)
-        custo_reposicao = valor_liquido * np.random.uniform(0.5, 0.7)
-        custo_final = valor_liquido * np.random.uniform(0.6, 0.8)
-        
-        # Frete e despesas
-        frete = valor_liquido * np.random.uniform(0.02, 0.08)
-        despesas = valor_liquido * np.random.uniform(0.01, 0.05)
-        
-        vlr_total = valor_liquido + frete + despesas
-        
-        # Markup
-        markup_fabrica = valor_liquido / custo_fabrica if custo_fabrica > 0 else 0
-        markup_reposicao = valor_liquido / custo_reposicao if custo_reposicao > 0 else 0
-        markup_final = valor_liquido / custo_final if custo_final > 0 else 0
-        
-        data.append({
-            'data_efe': dates[i],
-            'ano_mes': dates[i].strftime('%Y/%m'),
-            'pedido': f'PED{i+1:06d}',
-            'nfe': f'NFE{i+1:06d}',
-            'produto': produto,
-            'marca': marca,
-            'vendedor': vendedor,
-            'nome_vendedor': vendedor,
-            'cliente': cliente,
-            'cidade': cidade,
-            'estado': estado,
-            'quantidade': quantidade,
-            'valorliquido': round(valor_liquido, 2),
-            'custofabrica': round(custo_fabrica, 2),
-            'custoreposicao': round(custo_reposicao, 2),
-            'custofinal': round(custo_final, 2),
-            'frete': round(frete, 2),
-            'despesas': round(despesas, 2),
-            'vlr_total': round(vlr_total, 2),
-            'markup_fabrica_x_vendas': round(markup_fabrica, 2),
-            'markup_custoreposicao_x_vendas': round(markup_reposicao, 2),
-            'markup_custofinal_x_vendas': round(markup_final, 2),
-            'tipo': np.random.choice(['Venda', 'Devolução'], p=[0.95, 0.05])
-        })
+    As agregações por dimensão vêm do cubo quando slices não é None. As figuras ficam
+    em cache pelo token de versão dos dados filtrados.
+    """
+    if df.empty:
+        return []
     
-    return pd.DataFrame(data)
+    slices_key = None if slices is None else tuple(sorted(slices.items(), key=str))
+    key = ('demo_charts', dataset_token(df), slices_key)
+    return cached_figures(key, lambda: _build_advanced_charts(df, cube, slices))
 
-def create_advanced_charts(df):
-    """Cria visualizações avançadas com base nos dados"""
+def _build_advanced_charts(df, cube, slices):
     charts = []
     
-    if df.empty:
-        return charts
-    
     # 1. Evolução das vendas por mês
-    df_monthly = df.groupby('ano_mes')['valorliquido'].sum().reset_index()
+    df_monthly = sum_by(df, ['ano_mes'], 'valorliquido', cube, slices)
     fig1 = px.line(df_monthly, x='ano_mes', y='valorliquido', 
                    title='Evolução das Vendas por Mês',
                    labels={'valorliquido': 'Valor Líquido (R$)', 'ano_mes': 'Mês'})
@@ -147,8 +77,8 @@ def create_advanced_charts(df):
     charts.append(("Evolução Mensal", fig1))
     
     # 2. Top 10 produtos por valor
-    top_produtos = df.groupby('produto')['valorliquido'].sum().sort_values(ascending=False).head(10)
-    fig2 = px.bar(x=top_produtos.values, y=top_produtos.index, 
+    top_produtos = sum_by(df, ['produto'], 'valorliquido', cube, slices).nlargest(10, 'valorliquido')
+    fig2 = px.bar(x=top_produtos['valorliquido'], y=top_produtos['produto'], 
                   orientation='h', title='Top 10 Produtos por Valor de Vendas',
                   labels={'x': 'Valor Líquido (R$)', 'y': 'Produto'})
     fig2.update_traces(marker_color='#ff7f0e')
@@ -156,31 +86,32 @@ def create_advanced_charts(df):
     charts.append(("Top Produtos", fig2))
     
     # 3. Vendas por vendedor
-    vendas_vendedor = df.groupby('nome_vendedor')['valorliquido'].sum().reset_index()
+    vendas_vendedor = sum_by(df, ['nome_vendedor'], 'valorliquido', cube, slices)
     fig3 = px.pie(vendas_vendedor, values='valorliquido', names='nome_vendedor',
                   title='Distribuição de Vendas por Vendedor')
     fig3.update_traces(textposition='inside', textinfo='percent+label')
     charts.append(("Vendas por Vendedor", fig3))
     
     # 4. Análise de markup
-    fig4 = px.scatter(df, x='valorliquido', y='markup_fabrica_x_vendas',
-                      color='produto', size='quantidade',
-                      title='Análise de Markup vs Valor de Vendas',
-                      labels={'valorliquido': 'Valor Líquido (R$)', 
-                             'markup_fabrica_x_vendas': 'Markup Fábrica'})
+    fig4 = scatter_figure(df, 'valorliquido', 'markup_fabrica_x_vendas',
+                          'Análise de Markup vs Valor de Vendas',
+                          color='produto', size='quantidade',
+                          labels={'valorliquido': 'Valor Líquido (R$)', 
+                                  'markup_fabrica_x_vendas': 'Markup Fábrica'})
     charts.append(("Análise de Markup", fig4))
     
     # 5. Vendas por estado
-    vendas_estado = df.groupby('estado')['valorliquido'].sum().sort_values(ascending=False)
-    fig5 = px.bar(x=vendas_estado.index, y=vendas_estado.values,
+    vendas_estado = sum_by(df, ['estado'], 'valorliquido', cube, slices).sort_values('valorliquido', ascending=False)
+    fig5 = px.bar(x=vendas_estado['estado'], y=vendas_estado['valorliquido'],
                   title='Vendas por Estado',
                   labels={'x': 'Estado', 'y': 'Valor Líquido (R$)'})
     fig5.update_traces(marker_color='#2ca02c')
     charts.append(("Vendas por Estado", fig5))
     
     # 6. Heatmap de vendas por mês e produto
-    pivot_data = df.pivot_table(values='valorliquido', index='produto', 
-                               columns='ano_mes', aggfunc='sum', fill_value=0)
+    pivot_data = sum_by(df, ['produto', 'ano_mes'], 'valorliquido', cube, slices).pivot_table(
+        values='valorliquido', index='produto', columns='ano_mes', aggfunc='sum', fill_value=0,
+        observed=True)
     fig6 = px.imshow(pivot_data, 
                      title='Heatmap: Vendas por Produto e Mês',
                      labels={'x': 'Mês', 'y': 'Produto', 'color': 'Valor (R$)'},
@@ -197,7 +128,10 @@ def main():
     # Gerar dados de exemplo
     if 'demo_data' not in st.session_state:
         with st.spinner("Gerando dados de demonstração..."):
-            st.session_state.demo_data = generate_sample_data()
+            st.session_state.demo_data = generate_sample_data(
+                n_records=st.session_state.get('demo_n_records', DEFAULT_N_RECORDS),
+                seed=st.session_state.get('demo_seed', 42)
+            )
     
     df = st.session_state.demo_data
     
@@ -205,67 +139,19 @@ def main():
     with st.sidebar:
         st.header("🔧 Filtros")
         
-        # Filtro por período
-        min_date = df['data_efe'].min().date()
-        max_date = df['data_efe'].max().date()
-        
-        date_range = st.date_input(
-            "Período:",
-            value=(min_date, max_date),
-            min_value=min_date,
-            max_value=max_date
+        df_filtered, filters = render_filter_panel(
+            df, key="demo", date_column='data_efe',
+            default_columns=('produto', 'nome_vendedor', 'estado')
         )
         
-        # Filtro por produto
-        produtos = ['Todos'] + sorted(df['produto'].unique().tolist())
-        produto_selecionado = st.selectbox("Produto:", produtos)
-        
-        # Filtro por vendedor
-        vendedores = ['Todos'] + sorted(df['nome_vendedor'].unique().tolist())
-        vendedor_selecionado = st.selectbox("Vendedor:", vendedores)
-        
-        # Filtro por estado
-        estados = ['Todos'] + sorted(df['estado'].unique().tolist())
-        estado_selecionado = st.selectbox("Estado:", estados)
-        
-        # Aplicar filtros
-        df_filtered = df.copy()
-        
-        if len(date_range) == 2:
-            df_filtered = df_filtered[
-                (df_filtered['data_efe'].dt.date >= date_range[0]) &
-                (df_filtered['data_efe'].dt.date <= date_range[1])
-            ]
-        
-        if produto_selecionado != 'Todos':
-            df_filtered = df_filtered[df_filtered['produto'] == produto_selecionado]
-        
-        if vendedor_selecionado != 'Todos':
-            df_filtered = df_filtered[df_filtered['nome_vendedor'] == vendedor_selecionado]
-        
-        if estado_selecionado != 'Todos':
-            df_filtered = df_filtered[df_filtered['estado'] == estado_selecionado]
-        
         st.info(f"📊 {len(df_filtered)} registros selecionados")
     
-    # Métricas principais
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        total_vendas = df_filtered['valorliquido'].sum()
-        st.metric("💰 Total de Vendas", f"R$ {total_vendas:,.2f}")
+    # Cubo montado uma vez por conjunto de dados e fatiado pelos filtros
+    cube = get_cube(df, key="demo")
+    slices = cube.slices_for(filters)
     
-    with col2:
-        total_pedidos = len(df_filtered)
-        st.metric("📋 Total de Pedidos", f"{total_pedidos:,}")
-    
-    with col3:
-        ticket_medio = total_vendas / total_pedidos if total_pedidos > 0 else 0
-        st.metric("🎯 Ticket Médio", f"R$ {ticket_medio:,.2f}")
-    
-    with col4:
-        markup_medio = df_filtered['markup_fabrica_x_vendas'].mean()
-        st.metric("📈 Markup Médio", f"{markup_medio:.2f}x")
+    # Métricas principais
+    render_kpi_row(cube, slices, df_filtered, key="demo")
     
     # Tabs principais
     tab1, tab2, tab3 = st.tabs(["📊 Visualizações", "📋 Dados", "⚙️ Configurações"])
@@ -274,7 +160,7 @@ def main():
         st.header("Visualizações Avançadas")
         
         # Criar gráficos
-        charts = create_advanced_charts(df_filtered)
+        charts = create_advanced_charts(df_filtered, cube, slices)
         
         if charts:
             # Organizar gráficos em colunas
@@ -287,6 +173,10 @@ def main():
                         with col:
                             st.plotly_chart(fig, use_container_width=True)
         
+        # Roll-up / drill-down pelo cubo
+        st.subheader("🧊 Análise por Cubo")
+        render_cube_explorer(cube, slices, df_filtered, key="demo")
+        
         # Seção de gráficos personalizados
         st.subheader("🎨 Criar Gráfico Personalizado")
         
@@ -301,22 +191,22 @@ def main():
             y_axis = st.selectbox("Eixo Y (Valores)", numeric_cols)
         
         with col3:
-            categorical_cols = df_filtered.select_dtypes(include=['object']).columns.tolist()
+            categorical_cols = df_filtered.select_dtypes(include=['object', 'category']).columns.tolist()
             x_axis = st.selectbox("Eixo X (Categorias)", [""] + categorical_cols)
         
         if st.button("📈 Gerar Gráfico Personalizado") and y_axis:
             if chart_type == "Barras" and x_axis:
                 fig = px.bar(df_filtered, x=x_axis, y=y_axis, title=f"{y_axis} por {x_axis}")
             elif chart_type == "Linha" and x_axis:
-                fig = px.line(df_filtered, x=x_axis, y=y_axis, title=f"Evolução de {y_axis}")
+                fig = line_figure(df_filtered, x_axis, y_axis, f"Evolução de {y_axis}")
             elif chart_type == "Dispersão" and len(numeric_cols) >= 2:
                 x_numeric = st.selectbox("Selecione X numérico:", numeric_cols, key="scatter_x")
-                fig = px.scatter(df_filtered, x=x_numeric, y=y_axis, title=f"{y_axis} vs {x_numeric}")
+                fig = scatter_figure(df_filtered, x_numeric, y_axis, f"{y_axis} vs {x_numeric}")
             elif chart_type == "Pizza" and x_axis:
-                df_grouped = df_filtered.groupby(x_axis)[y_axis].sum().reset_index()
+                df_grouped = sum_by(df_filtered, [x_axis], y_axis, cube, slices)
                 fig = px.pie(df_grouped, values=y_axis, names=x_axis, title=f"Distribuição de {y_axis}")
             elif chart_type == "Histograma":
-                fig = px.histogram(df_filtered, x=y_axis, title=f"Distribuição de {y_axis}")
+                fig = histogram_figure(df_filtered[y_axis], f"Distribuição de {y_axis}")
             else:
                 st.error("Configuração inválida para o tipo de gráfico selecionado")
                 fig = None
@@ -328,31 +218,31 @@ def main():
         st.header("Dados Filtrados")
         
         # Mostrar dados
-        st.dataframe(df_filtered, use_container_width=True)
+        render_data_grid(get_pager(df_filtered, key="demo_dados"), key="demo_dados")
         
         # Estatísticas básicas
         st.subheader("Estatísticas Básicas")
         numeric_cols = df_filtered.select_dtypes(include=['number']).columns
         if len(numeric_cols) > 0:
-            st.dataframe(df_filtered[numeric_cols].describe(), use_container_width=True)
+            # Filtro em uma única coluna combina os sketches já montados por valor dessa coluna
+            statistics = sliced_statistics(df, slices) or column_statistics(df_filtered)
+            st.dataframe(statistics.describe(), use_container_width=True)
+            st.caption("Quartis e distintos aproximados por sketches (erro típico abaixo de 1%)")
         
         # Opção de download
         st.subheader("📥 Exportar Dados")
         
-        col1, col2 = st.columns(2)
+        col1, col2, col3 = st.columns(3)
         
         with col1:
-            csv = df_filtered.to_csv(index=False)
-            st.download_button(
-                label="📄 Download CSV",
-                data=csv,
-                file_name=f"dados_vendas_demo_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
+            render_csv_export(df_filtered, key="demo", file_prefix="dados_vendas_demo")
         
         with col2:
             # Simular download Excel
             st.info("📊 Funcionalidade Excel disponível na versão completa")
+        
+        with col3:
+            render_arrow_export(df_filtered, key="demo", file_prefix="dados_vendas_demo")
     
     with tab3:
         st.header("Configurações da Demonstração")
@@ -380,6 +270,14 @@ def main():
         """)
         
         # Botão para regenerar dados
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.number_input("Número de registros", min_value=100, max_value=50_000_000,
+                            value=DEFAULT_N_RECORDS, step=1000, key="demo_n_records")
+        with col2:
+            st.number_input("Semente aleatória", min_value=0, value=42, key="demo_seed")
+        
         if st.button("🔄 Regenerar Dados de Demonstração"):
             del st.session_state.demo_data
             st.rerun()
@@ -392,7 +290,7 @@ def main():
         - Streamlit 1.45.1
         - Plotly 5.24.1
         - Pandas 2.3.0
-        - NumPy para geração de dados
+        - NumPy para geração de dados (vetorizada)
         
         # Funcionalidades implementadas:
         - Interface responsiva
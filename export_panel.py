@@ -0,0 +1,165 @@
+import os
+from datetime import datetime
+
+import pyarrow as pa
+import streamlit as st
+
+from exports import (ARROW_FORMATS, EXCEL_MIME, arrow_key, csv_key, csv_mime, csv_suffix, excel_key,
+                     excel_sheets, export_arrow, export_csv, export_excel, export_query_csv,
+                     get_export_store, read_arrow)
+from jobs import STATUS_CANCELLED, STATUS_DONE, get_job, submit_job
+
+
+def _download(label, path, file_name, mime, key, ready=False):
+    """Botão de download do arquivo já gravado em disco
+
+    O download_button lê o arquivo inteiro para a memória do servidor em cada execução em
+    que aparece. Por isso ele só é montado logo após a geração (ready) ou quando o usuário
+    pede o download; nos demais reruns fica apenas um botão comum.
+    """
+    if not ready and not st.button(label, key=f"{key}_preparar"):
+        return
+    with open(path, 'rb') as file:
+        st.download_button(label=f"💾 Salvar {file_name}", data=file, file_name=file_name, mime=mime, key=key)
+
+
+def render_csv_export(df, key, file_prefix, db_connection=None, query=None, params=None):
+    """Exportação CSV sob demanda: o arquivo só é gerado ao clicar e é gravado em blocos
+
+    O arquivo fica em disco e é reaproveitado enquanto os dados (pelo token de versão)
+    não mudam, então os reruns não serializam o DataFrame de novo nem o leem do disco. Com db_connection e
+    query, oferece também a exportação direto do cursor do Firebird, sem carregar as
+    linhas em memória (os filtros do painel não se aplicam nesse caso).
+    """
+    compress = st.checkbox("Compactar (gzip)", key=f"{key}_csv_gzip")
+    file_name = f"{file_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{csv_suffix(compress)}"
+
+    path = get_export_store().get(csv_key(df, compress))
+    generated = False
+    if path is None and st.button("📄 Gerar CSV", key=f"{key}_csv_gerar"):
+        with st.spinner(f"Gerando CSV com {len(df):,} registros..."):
+            path = export_csv(df, compress)
+        generated = True
+    if path is not None:
+        _download("📄 Download CSV", path, file_name, csv_mime(compress), f"{key}_csv_download", ready=generated)
+
+    if db_connection is None or not query:
+        return
+
+    state_key = f"{key}_csv_banco"
+    generated = False
+    if st.button("🗄️ Exportar direto do banco", key=f"{key}_csv_banco_gerar",
+                 help="Reexecuta a consulta e grava as linhas do cursor no arquivo, sem carregá-las em memória"):
+        with st.spinner("Exportando do banco..."):
+            path, rows, message = export_query_csv(db_connection, query, params, compress=compress)
+        if path is None:
+            st.error(message)
+            st.session_state.pop(state_key, None)
+        else:
+            st.session_state[state_key] = {'path': path, 'rows': rows, 'compress': compress}
+            generated = True
+
+    exported = st.session_state.get(state_key)
+    if exported is not None and not os.path.exists(exported['path']):
+        # Arquivo descartado pelo ExportStore (limite de arquivos em disco)
+        st.session_state.pop(state_key)
+        exported = None
+    if exported is not None:
+        st.caption(f"🗄️ {exported['rows']:,} linhas exportadas do banco")
+        _download("🗄️ Download CSV do banco", exported['path'],
+                  f"{file_prefix}_banco_{datetime.now().strftime('%Y%m%d_%H%M%S')}{csv_suffix(exported['compress'])}",
+                  csv_mime(exported['compress']), f"{key}_csv_banco_download", ready=generated)
+
+
+@st.fragment(run_every=1)
+def _show_excel_job(key, total_rows):
+    """Acompanha a geração do Excel em segundo plano e recarrega a página quando terminar"""
+    state_key = f"{key}_excel_job"
+    job = get_job(st.session_state[state_key])
+    if job is None:
+        del st.session_state[state_key]
+        st.rerun()
+        return
+
+    if not job.done:
+        st.progress(min(job.rows / total_rows, 1.0) if total_rows else 0.0,
+                    text=f"⏳ Gerando Excel... {job.rows:,} de {total_rows:,} linhas ({job.elapsed():.0f}s)")
+        st.button("⛔ Cancelar", key=f"{key}_excel_cancelar", on_click=job.cancel)
+        return
+
+    del st.session_state[state_key]
+    if job.status == STATUS_DONE:
+        st.session_state[f"{key}_excel_pronto"] = True
+    elif job.status == STATUS_CANCELLED:
+        st.session_state[f"{key}_excel_erro"] = "⛔ Geração do Excel cancelada"
+    else:
+        st.session_state[f"{key}_excel_erro"] = f"Erro ao gerar o Excel: {job.error}"
+    st.rerun()
+
+
+def render_excel_export(df, key, file_prefix):
+    """Exportação Excel sob demanda, gerada em segundo plano com o openpyxl em modo write-only
+
+    O progresso é acompanhado sem bloquear a página; acima do limite de linhas do Excel os
+    dados são divididos em várias planilhas. O arquivo gerado fica em disco e é
+    reaproveitado enquanto os dados (pelo token de versão) não mudam.
+    """
+    path = get_export_store().get(excel_key(df))
+    if path is not None:
+        # Recém-gerado: avisado pelo acompanhamento ou por um job que terminou antes dele
+        ready = (st.session_state.pop(f"{key}_excel_pronto", False)
+                 or st.session_state.pop(f"{key}_excel_job", None) is not None)
+        _download("📊 Download Excel", path,
+                  f"{file_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                  EXCEL_MIME, f"{key}_excel_download", ready=ready)
+        return
+
+    error = st.session_state.pop(f"{key}_excel_erro", None)
+    if error:
+        st.error(error)
+
+    if f"{key}_excel_job" in st.session_state:
+        _show_excel_job(key, len(df))
+        return
+
+    sheets = excel_sheets(len(df))
+    if sheets > 1:
+        st.caption(f"📑 {len(df):,} registros: o arquivo terá {sheets} planilhas (limite do Excel por planilha)")
+    if st.button("📊 Gerar Excel", key=f"{key}_excel_gerar"):
+        job = submit_job(lambda job: export_excel(df, on_progress=job.set_progress,
+                                                  should_cancel=job.cancel_requested), background=True)
+        st.session_state[f"{key}_excel_job"] = job.id
+        st.rerun()
+
+
+def render_arrow_export(df, key, file_prefix):
+    """Exportação Parquet e Feather (Arrow IPC) sob demanda, preservando os tipos das colunas"""
+    for file_format, info in ARROW_FORMATS.items():
+        path = get_export_store().get(arrow_key(df, file_format))
+        generated = False
+        if path is None and st.button(f"🗜️ Gerar {info['label']}", key=f"{key}_{file_format}_gerar"):
+            with st.spinner(f"Gerando {info['label']} com {len(df):,} registros..."):
+                try:
+                    path = export_arrow(df, file_format)
+                    generated = True
+                except (pa.ArrowException, ValueError) as e:
+                    st.error(f"Erro ao gerar {info['label']}: {str(e)}")
+        if path is not None:
+            _download(f"🗜️ Download {info['label']}", path,
+                      f"{file_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{info['suffix']}",
+                      info['mime'], f"{key}_{file_format}_download", ready=generated)
+
+
+def render_arrow_import(key):
+    """Envio de um arquivo Parquet ou Feather; retorna o DataFrame carregado ou None"""
+    uploaded = st.file_uploader("Arquivo Parquet ou Feather", type=['parquet', 'feather', 'arrow'],
+                                key=f"{key}_arquivo")
+    if uploaded is None or not st.button("📥 Carregar Arquivo", key=f"{key}_carregar"):
+        return None
+    with st.spinner(f"Lendo {uploaded.name}..."):
+        df, message = read_arrow(uploaded, uploaded.name)
+    if df is None:
+        st.error(message)
+    else:
+        st.success(f"📊 {message}")
+    return df
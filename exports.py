@@ -0,0 +1,306 @@
+import csv
+import gzip
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+from datasets import dataset_token, stamp
+
+# Linhas convertidas para texto de cada vez (limita a memória da exportação)
+CSV_CHUNK_ROWS = 50_000
+GZIP_LEVEL = 6
+
+# Limite de linhas por planilha do Excel (a primeira é o cabeçalho)
+EXCEL_MAX_ROWS = 1_048_576
+EXCEL_CHUNK_ROWS = 10_000
+EXCEL_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Formatos Arrow: extensão, MIME e compressão (tipos do pandas preservados na leitura)
+ARROW_FORMATS = {
+    'parquet': {'suffix': '.parquet', 'mime': 'application/vnd.apache.parquet', 'label': 'Parquet'},
+    'feather': {'suffix': '.feather', 'mime': 'application/vnd.apache.arrow.file', 'label': 'Feather'},
+}
+ARROW_COMPRESSION = 'zstd'
+
+# Arquivos exportados mantidos em disco (compartilhados pelo processo)
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), 'dashboard_vendas_exports')
+EXPORT_CACHE_SIZE = 8
+
+
+def iter_csv_chunks(df, chunk_rows=CSV_CHUNK_ROWS):
+    """Gera o CSV do DataFrame em blocos de texto de até chunk_rows linhas (cabeçalho primeiro)"""
+    yield df.iloc[:0].to_csv(index=False)
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=False)
+
+
+def iter_cursor_csv_chunks(cursor, batch_size, on_progress=None):
+    """Gera o CSV direto de um cursor já executado, um bloco por fetchmany, sem montar DataFrame"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow([desc[0] for desc in cursor.description])
+    total = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if rows:
+            writer.writerows(rows)
+            total += len(rows)
+            if on_progress:
+                on_progress(total)
+        yield buffer.getvalue()
+        if not rows:
+            return
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def write_text(chunks, path, compress=False):
+    """Grava os blocos de texto em path, compactando em fluxo com compress=True
+
+    Retorna o tamanho do arquivo gravado em bytes.
+    """
+    if compress:
+        file = gzip.open(path, 'wt', compresslevel=GZIP_LEVEL, encoding='utf-8', newline='')
+    else:
+        file = open(path, 'w', encoding='utf-8', newline='')
+    with file:
+        for chunk in chunks:
+            file.write(chunk)
+    return os.path.getsize(path)
+
+
+def csv_suffix(compress):
+    return '.csv.gz' if compress else '.csv'
+
+
+def csv_mime(compress):
+    return 'application/gzip' if compress else 'text/csv'
+
+
+def _excel_values(chunk):
+    """Converte um bloco de linhas para valores aceitos pelo openpyxl (nulos viram None)"""
+    columns = {}
+    for column in chunk.columns:
+        series = chunk[column]
+        if isinstance(series.dtype, pd.PeriodDtype):
+            series = series.astype(str).where(series.notna(), None)
+        elif isinstance(series.dtype, pd.DatetimeTZDtype):
+            series = series.dt.tz_localize(None)
+        columns[column] = series
+    chunk = pd.DataFrame(columns, index=chunk.index).astype(object)
+    return chunk.where(chunk.notna(), None)
+
+
+def write_excel(df, path, sheet_name='Dados', sheet_rows=EXCEL_MAX_ROWS - 1, chunk_rows=EXCEL_CHUNK_ROWS,
+                on_progress=None, should_cancel=None):
+    """Grava o DataFrame em .xlsx com o modo write-only do openpyxl, em blocos de linhas
+
+    Acima de sheet_rows linhas os dados continuam em novas planilhas ("Dados 2", ...).
+    on_progress recebe o total de linhas gravadas; should_cancel interrompe a gravação
+    com RuntimeError. Retorna a quantidade de planilhas.
+    """
+    workbook = Workbook(write_only=True)
+    header = [str(column) for column in df.columns]
+    starts = range(0, len(df), sheet_rows) if len(df) else [0]
+    written = 0
+    for number, sheet_start in enumerate(starts, start=1):
+        sheet = workbook.create_sheet(sheet_name if number == 1 else f"{sheet_name} {number}")
+        sheet.append(header)
+        sheet_stop = min(sheet_start + sheet_rows, len(df))
+        for start in range(sheet_start, sheet_stop, chunk_rows):
+            if should_cancel and should_cancel():
+                raise RuntimeError("Exportação cancelada pelo usuário")
+            chunk = _excel_values(df.iloc[start:min(start + chunk_rows, sheet_stop)])
+            for row in chunk.itertuples(index=False, name=None):
+                sheet.append(row)
+            written += len(chunk)
+            if on_progress:
+                on_progress(written)
+    workbook.save(path)
+    return len(starts)
+
+
+def excel_sheets(rows, sheet_rows=EXCEL_MAX_ROWS - 1):
+    """Quantidade de planilhas necessárias para rows linhas"""
+    return max(1, -(-rows // sheet_rows))
+
+
+class ExportStore:
+    """Arquivos exportados em disco, reaproveitados pela chave (ex.: token dos dados e formato)
+
+    Os arquivos mais antigos são apagados quando o limite max_files é ultrapassado.
+    """
+
+    def __init__(self, directory=EXPORT_DIR, max_files=EXPORT_CACHE_SIZE):
+        self.directory = directory
+        self.max_files = max_files
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Caminho do arquivo exportado para a chave, ou None"""
+        with self._lock:
+            path = self._files.get(key)
+            if path is not None and not os.path.exists(path):
+                del self._files[key]
+                path = None
+            if path is not None:
+                self._files.move_to_end(key)
+            return path
+
+    def create(self, key, suffix, write):
+        """Grava um novo arquivo com write(caminho) e o registra sob a chave
+
+        Se write falhar, o arquivo parcial é apagado e a exceção propagada.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=self.directory)
+        os.close(fd)
+        try:
+            write(path)
+        except BaseException:
+            _remove(path)
+            raise
+        with self._lock:
+            previous = self._files.pop(key, None)
+            self._files[key] = path
+            removed = [previous] if previous else []
+            while len(self._files) > self.max_files:
+                removed.append(self._files.popitem(last=False)[1])
+        for old in removed:
+            _remove(old)
+        return path
+
+    def get_or_create(self, key, suffix, write):
+        path = self.get(key)
+        return path if path is not None else self.create(key, suffix, write)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+_store = ExportStore()
+
+
+def get_export_store():
+    """Retorna o repositório de arquivos exportados compartilhado pelo processo"""
+    return _store
+
+
+def csv_key(df, compress=False):
+    """Chave do CSV exportado do DataFrame no ExportStore"""
+    return (dataset_token(df), 'csv', compress)
+
+
+def export_csv(df, compress=False, store=None, chunk_rows=CSV_CHUNK_ROWS):
+    """Exporta o DataFrame para um arquivo CSV (opcionalmente gzip) e retorna o caminho
+
+    O texto é gerado em blocos de chunk_rows linhas e gravado direto no arquivo; o mesmo
+    conjunto de dados (pelo token de versão) reaproveita o arquivo já gravado.
+    """
+    store = store or _store
+    return store.get_or_create(
+        csv_key(df, compress), csv_suffix(compress),
+        lambda path: write_text(iter_csv_chunks(df, chunk_rows), path, compress)
+    )
+
+
+def excel_key(df):
+    """Chave do Excel exportado do DataFrame no ExportStore"""
+    return (dataset_token(df), 'xlsx')
+
+
+def export_excel(df, store=None, **kwargs):
+    """Exporta o DataFrame para um arquivo .xlsx e retorna o caminho
+
+    O arquivo é reaproveitado para o mesmo conjunto de dados (pelo token de versão). Os
+    demais argumentos nomeados seguem para write_excel (ex.: on_progress, should_cancel).
+    """
+    store = store or _store
+    return store.get_or_create(excel_key(df), '.xlsx', lambda path: write_excel(df, path, **kwargs))
+
+
+def export_query_csv(db_connection, query, params=None, compress=False, store=None, **kwargs):
+    """Exporta o resultado da consulta direto do cursor do Firebird para um arquivo CSV
+
+    Retorna (caminho, linhas, mensagem); caminho é None em caso de erro. Os demais
+    argumentos nomeados seguem para DatabaseConnection.export_csv.
+    """
+    store = store or _store
+    result = {}
+
+    def write(path):
+        rows, message = db_connection.export_csv(query, params, path, compress=compress, **kwargs)
+        if rows is None:
+            raise RuntimeError(message)
+        result.update(rows=rows, message=message)
+
+    try:
+        path = store.create(('firebird', uuid.uuid4().hex), csv_suffix(compress), write)
+    except RuntimeError as e:
+        return None, 0, str(e)
+    return path, result['rows'], result['message']
+
+
+def write_arrow(df, path, file_format='parquet'):
+    """Grava o DataFrame em Parquet ou Feather (Arrow IPC) com compressão zstd
+
+    Decimais, datas, categorias e períodos mantêm o tipo ao serem lidos de volta.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if file_format == 'parquet':
+        pq.write_table(table, path, compression=ARROW_COMPRESSION)
+    else:
+        feather.write_feather(table, path, compression=ARROW_COMPRESSION)
+
+
+def arrow_key(df, file_format):
+    """Chave do arquivo Parquet/Feather exportado do DataFrame no ExportStore"""
+    return (dataset_token(df), file_format)
+
+
+def export_arrow(df, file_format='parquet', store=None):
+    """Exporta o DataFrame para Parquet ou Feather e retorna o caminho (reaproveitado pelo token)"""
+    store = store or _store
+    return store.get_or_create(arrow_key(df, file_format), ARROW_FORMATS[file_format]['suffix'],
+                               lambda path: write_arrow(df, path, file_format))
+
+
+def read_arrow(file, name):
+    """Lê um arquivo Parquet ou Feather enviado pelo usuário
+
+    file é um arquivo binário (ex.: o UploadedFile do Streamlit) e name o nome original,
+    usado para reconhecer o formato. Retorna (df, mensagem), com df None em caso de erro.
+    O token de versão vem do conteúdo: reenviar o mesmo arquivo reaproveita os caches.
+    """
+    file_format = next((fmt for fmt, info in ARROW_FORMATS.items() if name.lower().endswith(info['suffix'])), None)
+    if file_format is None and name.lower().endswith('.arrow'):
+        file_format = 'feather'
+    if file_format is None:
+        return None, f"Formato não reconhecido: {name}"
+
+    digest = hashlib.sha1()
+    for block in iter(lambda: file.read(1024 * 1024), b''):
+        digest.update(block)
+    file.seek(0)
+    try:
+        table = pq.read_table(file) if file_format == 'parquet' else feather.read_table(file)
+        df = table.to_pandas()
+    except (pa.ArrowException, OSError) as e:
+        return None, f"Erro ao ler o arquivo: {str(e)}"
+    stamp(df, 'arquivo', digest.hexdigest())
+    return df, f"{len(df):,} registros carregados de {name} com {len(df.columns)} colunas"
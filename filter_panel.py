@@ -0,0 +1,89 @@
+import pandas as pd
+import streamlit as st
+
+from filters import FilterIndex
+
+# Colunas categóricas com mais valores distintos que isto não entram no multiselect
+MAX_FILTER_VALUES = 1000
+
+
+def get_filter_index(df, key, date_column=None):
+    """Retorna o FilterIndex da sessão para o DataFrame, montando-o quando os dados mudam"""
+    state_key = f"{key}_filter_index"
+    index = st.session_state.get(state_key)
+    if index is None or index.df is not df or index.date_column != date_column:
+        index = FilterIndex(df, dimensions=(), date_column=date_column)
+        st.session_state[state_key] = index
+    return index
+
+
+def filterable_columns(df, date_column=None):
+    """Separa as colunas que podem ser filtradas em (categóricas, numéricas)"""
+    categorical, numeric = [], []
+    for column in df.columns:
+        if column == date_column:
+            continue
+        dtype = df[column].dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            categorical.append(column)
+        elif pd.api.types.is_numeric_dtype(dtype):
+            numeric.append(column)
+        elif isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(dtype) \
+                or pd.api.types.is_string_dtype(dtype):
+            categorical.append(column)
+    return categorical, numeric
+
+
+def render_filter_panel(df, key, date_column=None, default_columns=()):
+    """Painel de filtros: período, seleção múltipla em colunas categóricas e faixas numéricas
+
+    Os filtros são respondidos pelo FilterIndex da sessão (bitmaps por valor montados uma
+    vez por conjunto de dados). Retorna (DataFrame filtrado, filtros), onde o DataFrame é o
+    próprio df quando nenhum filtro está ativo e filtros é um dicionário com date_range,
+    date_bounds, values e ranges (usado, por exemplo, para fatiar o cubo).
+    """
+    if date_column not in df.columns:
+        date_column = None
+    index = get_filter_index(df, key, date_column)
+    categorical, numeric = filterable_columns(df, date_column)
+
+    date_range = None
+    bounds = index.date_bounds()
+    if bounds is not None:
+        min_date, max_date = (d.date() for d in bounds)
+        date_range = st.date_input(
+            "Período:",
+            value=(min_date, max_date),
+            min_value=min_date,
+            max_value=max_date,
+            key=f"{key}_periodo"
+        )
+
+    columns = st.multiselect(
+        "Filtrar por:", categorical + numeric,
+        default=[c for c in default_columns if c in categorical + numeric],
+        key=f"{key}_colunas"
+    )
+
+    values = {}
+    ranges = {}
+    for column in columns:
+        if column in numeric:
+            column_bounds = index.value_bounds(column)
+            if column_bounds is None or column_bounds[0] == column_bounds[1]:
+                continue
+            low, high = st.slider(column, column_bounds[0], column_bounds[1], column_bounds,
+                                  key=f"{key}_faixa_{column}")
+            if (low, high) != column_bounds:
+                ranges[column] = (low, high)
+        else:
+            options = index.values(column)
+            if len(options) > MAX_FILTER_VALUES:
+                st.caption(f"{column}: {len(options):,} valores distintos, acima do limite de {MAX_FILTER_VALUES:,} para filtro")
+                continue
+            selected = st.multiselect(column, options, key=f"{key}_valores_{column}")
+            if selected:
+                values[column] = selected
+
+    filters = {"date_range": date_range, "date_bounds": bounds, "values": values, "ranges": ranges}
+    return index.query(date_range, values, ranges), filters
@@ -0,0 +1,286 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from datasets import derive
+
+# Dimensões filtradas na sidebar do demo
+DEFAULT_DIMENSIONS = ('produto', 'nome_vendedor', 'estado')
+DEFAULT_DATE_COLUMN = 'data_efe'
+
+# Quantidade de combinações de filtros mantidas em memória (números de linha e DataFrames)
+DEFAULT_CACHE_SIZE = 32
+DEFAULT_FRAME_CACHE_SIZE = 4
+
+ALL = 'Todos'
+
+
+def filter_sales_data(df, date_range, produto, vendedor, estado):
+    """Aplica os filtros da sidebar ('Todos' desativa o filtro da dimensão)"""
+    df_filtered = df.copy()
+
+    if len(date_range) == 2:
+        df_filtered = df_filtered[
+            (df_filtered['data_efe'].dt.date >= date_range[0]) &
+            (df_filtered['data_efe'].dt.date <= date_range[1])
+        ]
+
+    if produto != 'Todos':
+        df_filtered = df_filtered[df_filtered['produto'] == produto]
+
+    if vendedor != 'Todos':
+        df_filtered = df_filtered[df_filtered['nome_vendedor'] == vendedor]
+
+    if estado != 'Todos':
+        df_filtered = df_filtered[df_filtered['estado'] == estado]
+
+    return df_filtered
+
+
+class FilterIndex:
+    """Índices pré-calculados sobre o DataFrame base para responder aos filtros
+
+    As linhas são numeradas na ordem da coluna de data, de modo que um período vira um
+    intervalo [início, fim) encontrado por busca binária. Cada valor de uma dimensão
+    guarda a lista ordenada das suas posições e, quando usado em uma seleção múltipla,
+    um bitmap (bits compactados com np.packbits); faixas numéricas usam a coluna
+    ordenada. Os índices de cada coluna são montados no primeiro uso e o DataFrame base
+    nunca é copiado. As últimas combinações de filtros ficam memorizadas.
+    """
+
+    def __init__(self, df, dimensions=DEFAULT_DIMENSIONS, date_column=DEFAULT_DATE_COLUMN,
+                 cache_size=DEFAULT_CACHE_SIZE, frame_cache_size=DEFAULT_FRAME_CACHE_SIZE):
+        self.df = df
+        self.date_column = date_column if date_column in df.columns else None
+        self.cache_size = cache_size
+        self.frame_cache_size = frame_cache_size
+        self._cache = OrderedDict()
+        self._frames = OrderedDict()
+        self._codes = {}
+        self._values = {}
+        self._positions = {}
+        self._bitmaps = {}
+        self._sorted = {}
+
+        self._order = None
+        self._dates = None
+        if self.date_column is not None:
+            dates = pd.to_datetime(df[self.date_column]).to_numpy(dtype='datetime64[ns]')
+            if len(dates) >= 2 and not bool(np.all(dates[1:] >= dates[:-1])):
+                self._order = np.argsort(dates, kind='stable')
+                dates = dates[self._order]
+            self._dates = dates
+
+        for column in dimensions:
+            if column in df.columns:
+                self._dimension(column)
+
+    def __len__(self):
+        return len(self.df)
+
+    def _column(self, column):
+        """Valores da coluna na ordem das posições (ordem das datas)"""
+        values = self.df[column].to_numpy()
+        return values if self._order is None else values[self._order]
+
+    def _dimension(self, column):
+        """Monta (uma vez) os códigos e as posições ordenadas de cada valor da coluna"""
+        if column not in self._codes:
+            codes, values = pd.factorize(self.df[column], sort=True)
+            codes = np.asarray(codes)
+            if self._order is not None:
+                codes = codes[self._order]
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(values) + 1))
+            self._codes[column] = codes
+            self._values[column] = {value: i for i, value in enumerate(values)}
+            self._positions[column] = [order[bounds[i]:bounds[i + 1]] for i in range(len(values))]
+            self._bitmaps[column] = {}
+        return self._codes[column]
+
+    def _bitmap(self, column, code):
+        """Bitmap compactado das posições de um valor (montado no primeiro uso)"""
+        bitmaps = self._bitmaps[column]
+        if code not in bitmaps:
+            bitmaps[code] = self._positions_bitmap(self._positions[column][code])
+        return bitmaps[code]
+
+    def _positions_bitmap(self, positions):
+        mask = np.zeros(len(self.df), dtype=bool)
+        mask[positions] = True
+        return np.packbits(mask)
+
+    @property
+    def dimensions(self):
+        return list(self._codes)
+
+    def values(self, column):
+        """Valores distintos da dimensão, em ordem alfabética"""
+        self._dimension(column)
+        return sorted(self._values[column], key=str)
+
+    def value_bounds(self, column):
+        """Menor e maior valor de uma coluna numérica (ignorando nulos), ou None"""
+        values, _ = self._sorted_column(column)
+        if values.dtype.kind == 'f':
+            values = values[~np.isnan(values)]
+        if not len(values):
+            return None
+        return values[0].item(), values[-1].item()
+
+    def _sorted_column(self, column):
+        """Coluna numérica ordenada e as posições correspondentes (nulos no final)"""
+        if column not in self._sorted:
+            values = self._column(column)
+            order = np.argsort(values, kind='stable')
+            self._sorted[column] = (values[order], order)
+        return self._sorted[column]
+
+    def date_bounds(self):
+        """Menor e maior data do DataFrame base (ou None se estiver vazio ou sem data)"""
+        if self._dates is None:
+            return None
+        valid = self._dates[~np.isnat(self._dates)]
+        if not len(valid):
+            return None
+        return pd.Timestamp(valid[0]), pd.Timestamp(valid[-1])
+
+    def _date_slice(self, date_range):
+        """Intervalo [início, fim) de posições do período (datas inclusivas, como no date_input)"""
+        if self._dates is None or date_range is None or len(date_range) != 2:
+            return 0, len(self.df)
+        start = np.datetime64(pd.Timestamp(date_range[0]).normalize(), 'ns')
+        end = np.datetime64(pd.Timestamp(date_range[1]).normalize() + pd.Timedelta(days=1), 'ns')
+        lo = int(np.searchsorted(self._dates, start, side='left'))
+        hi = int(np.searchsorted(self._dates, end, side='left'))
+        return lo, max(lo, hi)
+
+    def _select_positions(self, lo, hi, selections):
+        """Posições (na ordem das datas) que atendem ao período e a um valor por dimensão
+
+        Retorna um slice quando nenhuma dimensão é filtrada.
+        """
+        if not selections:
+            return slice(lo, hi)
+
+        lists = []
+        for column, value in selections:
+            self._dimension(column)
+            code = self._values[column].get(value)
+            if code is None:
+                return np.array([], dtype=np.intp)
+            lists.append((column, code, self._positions[column][code]))
+
+        # Parte da menor lista de posições e confere as demais dimensões pelos códigos
+        lists.sort(key=lambda item: len(item[2]))
+        _, _, positions = lists[0]
+        start, stop = np.searchsorted(positions, [lo, hi])
+        positions = positions[start:stop]
+        for column, code, _ in lists[1:]:
+            if not len(positions):
+                break
+            positions = positions[self._codes[column][positions] == code]
+        return positions
+
+    def _bitmap_positions(self, lo, hi, values, ranges):
+        """Posições que atendem ao período, às seleções múltiplas e às faixas numéricas
+
+        Os valores de uma mesma coluna são combinados com OR e as colunas/faixas com AND,
+        tudo sobre bitmaps compactados.
+        """
+        combined = None
+        for column, selected in values:
+            self._dimension(column)
+            codes = [self._values[column][v] for v in selected if v in self._values[column]]
+            if not codes:
+                return np.array([], dtype=np.intp)
+            bitmap = self._bitmap(column, codes[0])
+            for code in codes[1:]:
+                bitmap = np.bitwise_or(bitmap, self._bitmap(column, code))
+            combined = bitmap if combined is None else np.bitwise_and(combined, bitmap)
+
+        for column, (low, high) in ranges:
+            sorted_values, order = self._sorted_column(column)
+            start = np.searchsorted(sorted_values, low, side='left')
+            stop = np.searchsorted(sorted_values, high, side='right')
+            bitmap = self._positions_bitmap(order[start:stop])
+            combined = bitmap if combined is None else np.bitwise_and(combined, bitmap)
+
+        if combined is None:
+            return slice(lo, hi)
+        mask = np.unpackbits(combined, count=len(self.df))[lo:hi]
+        return np.flatnonzero(mask) + lo
+
+    @staticmethod
+    def _normalize(values, ranges):
+        """Filtros ativos em forma canônica (tuplas ordenadas), ignorando seleções vazias e 'Todos'"""
+        active = []
+        for column, selected in (values or {}).items():
+            if selected is None or isinstance(selected, str) or not np.iterable(selected):
+                selected = () if selected is None or selected == ALL else (selected,)
+            selected = tuple(sorted(set(selected), key=str))
+            if selected:
+                active.append((column, selected))
+        active_ranges = sorted((column, tuple(bounds)) for column, bounds in (ranges or {}).items())
+        return tuple(sorted(active)), tuple(active_ranges)
+
+    def _key(self, date_range, values, ranges):
+        """Chave de memorização: intervalo de posições do período e filtros ativos"""
+        return self._date_slice(date_range) + self._normalize(values, ranges)
+
+    def _remember(self, cache, key, value, size):
+        cache[key] = value
+        while len(cache) > size:
+            cache.popitem(last=False)
+        return value
+
+    def rows(self, date_range=None, values=None, ranges=None):
+        """Números das linhas (na ordem original) que atendem aos filtros, ou um slice
+
+        values mapeia coluna -> valor ou lista de valores aceitos (None ou 'Todos'
+        desativa o filtro); ranges mapeia coluna numérica -> (mínimo, máximo), inclusivos.
+        """
+        key = self._key(date_range, values, ranges)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        lo, hi, active, active_ranges = key
+        if not active_ranges and all(len(selected) == 1 for _, selected in active):
+            positions = self._select_positions(lo, hi, [(column, selected[0]) for column, selected in active])
+        else:
+            positions = self._bitmap_positions(lo, hi, active, active_ranges)
+
+        full = lo == 0 and hi == len(self.df) and not active and not active_ranges
+        if self._order is not None and not full:
+            positions = np.sort(self._order[positions])
+        return self._remember(self._cache, key, positions, self.cache_size)
+
+    def query(self, date_range=None, values=None, ranges=None):
+        """DataFrame filtrado (o próprio DataFrame base quando nenhum filtro restringe as linhas)
+
+        O resultado recebe um token de versão derivado do DataFrame base e dos filtros.
+        """
+        key = self._key(date_range, values, ranges)
+        if key in self._frames:
+            self._frames.move_to_end(key)
+            return self._frames[key]
+
+        rows = self.rows(date_range, values, ranges)
+        if isinstance(rows, slice):
+            if rows.start == 0 and rows.stop == len(self.df):
+                return self.df
+            frame = self.df.iloc[rows]
+        else:
+            frame = self.df.take(rows)
+        derive(frame, self.df, 'filtro', key)
+        return self._remember(self._frames, key, frame, self.frame_cache_size)
+
+    def select(self, date_range=None, **selections):
+        """Atalho de query com um valor (ou lista de valores) por dimensão nos argumentos nomeados"""
+        return self.query(date_range, values=selections)
+
+    def filter_sales_data(self, date_range, produto, vendedor, estado):
+        """Mesma assinatura de filter_sales_data, respondida pelos índices"""
+        return self.select(date_range, produto=produto, nome_vendedor=vendedor, estado=estado)
@@ -0,0 +1,264 @@
+import datetime
+import time
+
+import fdb
+import numpy as np
+import pandas as pd
+
+from datasets import stamp
+from exports import iter_cursor_csv_chunks, write_text
+from pool import get_pool
+from timings import timed
+
+# Quantidade padrão de linhas buscadas por chamada a fetchmany
+DEFAULT_BATCH_SIZE = 5000
+
+
+class QueryCancelled(Exception):
+    """Sinaliza que a busca de linhas foi cancelada pelo usuário"""
+
+
+def _column_kind(type_code):
+    """Mapeia o type_code do cursor fdb para o tipo de coluna a ser montado"""
+    if type_code is int:
+        return 'int'
+    if type_code is float:
+        return 'float'
+    if type_code in (datetime.datetime, datetime.date):
+        return 'datetime'
+    return 'object'
+
+
+def _to_array(values, kind):
+    """Converte os valores de uma coluna de um lote em um array tipado"""
+    if kind == 'int':
+        if None not in values:
+            return np.array(values, dtype=np.int64)
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    if kind == 'float':
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    if kind == 'datetime':
+        return pd.to_datetime(pd.Series(values, dtype=object)).to_numpy()
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _concat(chunks):
+    """Concatena os pedaços de uma coluna respeitando promoções de tipo (int -> float)"""
+    if not chunks:
+        return np.array([], dtype=object)
+    if len(chunks) == 1:
+        return chunks[0]
+    if any(chunk.dtype == np.float64 for chunk in chunks) and all(chunk.dtype.kind in 'if' for chunk in chunks):
+        return np.concatenate([chunk.astype(np.float64, copy=False) for chunk in chunks])
+    return np.concatenate(chunks)
+
+
+def fetch_dataframe(cursor, batch_size=DEFAULT_BATCH_SIZE, on_progress=None, should_cancel=None, timings=None):
+    """Busca o resultado do cursor em lotes com fetchmany e monta o DataFrame coluna a coluna
+
+    Cada lote é convertido imediatamente em arrays tipados por coluna, de modo que as
+    tuplas do driver são descartadas a cada iteração e o pico de memória fica próximo
+    do tamanho do DataFrame final. Com timings, o tempo em fetchmany (e até o primeiro
+    lote) e o de conversão/montagem são medidos separadamente.
+    """
+    description = cursor.description
+    columns = [desc[0] for desc in description]
+    kinds = [_column_kind(desc[1]) for desc in description]
+    chunks = [[] for _ in columns]
+    total_rows = 0
+
+    while True:
+        if should_cancel and should_cancel():
+            raise QueryCancelled()
+
+        start = time.perf_counter()
+        rows = cursor.fetchmany(batch_size)
+        if timings is not None:
+            elapsed = time.perf_counter() - start
+            timings.add('fetch', elapsed)
+            if not total_rows:
+                timings.add('first_row', elapsed)
+        if not rows:
+            break
+
+        with timed(timings, 'build'):
+            for i, values in enumerate(zip(*rows)):
+                chunks[i].append(_to_array(list(values), kinds[i]))
+        total_rows += len(rows)
+        del rows
+
+        if on_progress:
+            on_progress(total_rows)
+
+    with timed(timings, 'build'):
+        data = {}
+        for i, column in enumerate(columns):
+            data[column] = _concat(chunks[i])
+            chunks[i] = None
+        return pd.DataFrame(data, columns=columns)
+
+
+def statement_plan(statement):
+    """Plano do Firebird para a instrução preparada (None se indisponível)"""
+    try:
+        return getattr(statement, 'plan', None)
+    except Exception:
+        return None
+
+
+class DatabaseConnection:
+    """Acesso ao Firebird de uma sessão, usando o pool compartilhado do processo"""
+
+    def __init__(self):
+        self.pool = None
+
+    def connect(self, host, database, user, password, port=3050):
+        """Conecta ao banco de dados Firebird"""
+        try:
+            pool = get_pool(host, port, database, user, password)
+            if not pool.check_password(password):
+                # Senha diferente da do pool: valida com uma conexão direta antes de trocá-la
+                fdb.connect(dsn=pool.dsn, user=user, password=password, charset='NONE').close()
+                pool.update_password(password)
+            # Reconectar descarta as instruções preparadas (ex.: após alteração do banco)
+            pool.clear_statements()
+            with pool.connection():
+                pass
+            self.pool = pool
+            return True, "Conexão estabelecida com sucesso!"
+        except Exception as e:
+            return False, f"Erro na conexão: {str(e)}"
+
+    def execute_query(self, query, params=None, batch_size=None, on_progress=None, should_cancel=None,
+                      on_connection=None, timings=None):
+        """Executa uma consulta SQL e retorna um DataFrame
+
+        Com batch_size informado, as linhas são buscadas em lotes (modo streaming),
+        reportando o total de linhas lidas em on_progress e verificando should_cancel
+        entre os lotes. Se a conexão do pool tiver caído (ex.: reinício do Firebird),
+        a consulta é repetida uma vez com uma nova conexão. on_connection recebe a conexão
+        do pool que executa a instrução (usado para cancelá-la a partir de outra thread).
+        A instrução preparada fica em cache na conexão: repetir o mesmo SQL com outros
+        parâmetros não passa de novo pelo prepare. timings (QueryTimings) recebe o plano,
+        os tempos de prepare, execute, fetch e montagem, as linhas e os bytes estimados.
+        """
+        if not self.pool:
+            return None, "Não há conexão ativa com o banco de dados"
+
+        for attempt in range(2):
+            try:
+                pooled = self.pool.acquire()
+            except Exception as e:
+                return None, f"Erro na execução da consulta: {str(e)}"
+
+            cursor = None
+            discard = False
+            try:
+                if on_connection:
+                    on_connection(pooled)
+                with timed(timings, 'prepare'):
+                    cursor, statement = pooled.prepare(query)
+                if timings is not None:
+                    timings.add_plan(statement_plan(statement))
+                with timed(timings, 'execute'):
+                    if params:
+                        # Agora params é uma tupla/lista para parâmetros posicionais
+                        cursor.execute(statement, params)
+                    else:
+                        cursor.execute(statement)
+
+                if batch_size:
+                    df = fetch_dataframe(cursor, batch_size, on_progress, should_cancel, timings)
+                else:
+                    # Obter nomes das colunas
+                    columns = [desc[0] for desc in cursor.description]
+
+                    # Obter dados
+                    with timed(timings, 'fetch'):
+                        data = cursor.fetchall()
+
+                    # Criar DataFrame
+                    with timed(timings, 'build'):
+                        df = pd.DataFrame(data, columns=columns)
+                if timings is not None:
+                    timings.add_result(df)
+                return stamp(df, 'firebird'), "Consulta executada com sucesso!"
+            except QueryCancelled:
+                return None, "Consulta cancelada pelo usuário"
+            except Exception as e:
+                discard = not pooled.is_alive()
+                pooled.forget(query)
+                if should_cancel and should_cancel():
+                    return None, "Consulta cancelada pelo usuário"
+                if discard and attempt == 0:
+                    continue
+                return None, f"Erro na execução da consulta: {str(e)}"
+            finally:
+                if on_connection:
+                    on_connection(None)
+                if cursor is not None:
+                    # Fecha só o result set: cursor e instrução preparada seguem no cache da conexão
+                    try:
+                        cursor.close()
+                    except Exception:
+                        pass
+                self.pool.release(pooled, discard=discard)
+
+    def export_csv(self, query, params, path, compress=False, batch_size=DEFAULT_BATCH_SIZE,
+                   on_progress=None, should_cancel=None):
+        """Executa a consulta e grava o resultado em CSV direto do cursor, sem montar DataFrame
+
+        As linhas são buscadas em lotes de batch_size e escritas no arquivo (gzip com
+        compress=True) à medida que chegam. Retorna (linhas, mensagem), com linhas None
+        em caso de erro ou cancelamento.
+        """
+        if not self.pool:
+            return None, "Não há conexão ativa com o banco de dados"
+
+        try:
+            pooled = self.pool.acquire()
+        except Exception as e:
+            return None, f"Erro na exportação: {str(e)}"
+
+        cursor = None
+        discard = False
+        total = [0]
+
+        def progress(rows):
+            total[0] = rows
+            if on_progress:
+                on_progress(rows)
+
+        def chunks():
+            for chunk in iter_cursor_csv_chunks(cursor, batch_size, progress):
+                if should_cancel and should_cancel():
+                    raise QueryCancelled()
+                yield chunk
+
+        try:
+            cursor, statement = pooled.prepare(query)
+            if params:
+                cursor.execute(statement, params)
+            else:
+                cursor.execute(statement)
+            write_text(chunks(), path, compress)
+            return total[0], f"{total[0]:,} linhas exportadas do banco"
+        except QueryCancelled:
+            return None, "Exportação cancelada pelo usuário"
+        except Exception as e:
+            discard = not pooled.is_alive()
+            pooled.forget(query)
+            return None, f"Erro na exportação: {str(e)}"
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+            self.pool.release(pooled, discard=discard)
+
+    def close(self):
+        """Desvincula a sessão do pool (as conexões continuam disponíveis para outras sessões)"""
+        self.pool = None
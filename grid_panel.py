@@ -0,0 +1,77 @@
+import math
+
+import streamlit as st
+
+from paging import FramePager, ServerPager
+from query_cache import execute_with_cache
+
+DEFAULT_PAGE_SIZE = 100
+
+# Valor inicial da configuração "Máximo de linhas para visualização" (linhas por página)
+DEFAULT_MAX_ROWS = 1000
+NO_SORT = "(sem ordenação)"
+
+
+def get_pager(df, key):
+    """Retorna o FramePager da sessão para o DataFrame, montando-o quando os dados mudam"""
+    state_key = f"{key}_pager"
+    pager = st.session_state.get(state_key)
+    if pager is None or pager.df is not df:
+        pager = FramePager(df)
+        st.session_state[state_key] = pager
+    return pager
+
+
+def render_data_grid(pager, key, page_size=DEFAULT_PAGE_SIZE):
+    """Grade paginada: envia ao navegador só a página visível, com ordenação e busca no servidor
+
+    pager é um FramePager (DataFrame em memória) ou um ServerPager (janelas buscadas no
+    Firebird). Retorna a página exibida, ou None se o banco devolver erro.
+    """
+    page_size = int(page_size)
+    try:
+        columns = pager.columns()
+
+        col1, col2, col3, col4 = st.columns([3, 2, 3, 3])
+        with col1:
+            sort = st.selectbox("Ordenar por", [NO_SORT] + columns, key=f"{key}_ordenar")
+        with col2:
+            descending = st.checkbox("Decrescente", key=f"{key}_decrescente")
+        with col3:
+            search_column = st.selectbox("Buscar em", columns, key=f"{key}_buscar_em")
+        with col4:
+            text = st.text_input("Contém", key=f"{key}_contem").strip()
+        sort = None if sort == NO_SORT else sort
+
+        total = pager.count(search_column, text)
+        pages = max(1, math.ceil(total / page_size))
+        page_key = f"{key}_pagina"
+        if st.session_state.get(page_key, 1) > pages:
+            # A busca reduziu o total de páginas: volta para a última existente
+            st.session_state[page_key] = pages
+        number = st.number_input(f"Página (de {pages:,})", min_value=1, max_value=pages, step=1, key=page_key)
+
+        offset = (int(number) - 1) * page_size
+        window = pager.page(offset, page_size, sort, descending, search_column, text)
+    except RuntimeError as e:
+        st.error(str(e))
+        return None
+
+    st.dataframe(window, use_container_width=True)
+    if total:
+        st.caption(f"Linhas {offset + 1:,}–{offset + len(window):,} de {total:,}")
+    else:
+        st.caption("Nenhuma linha encontrada")
+    return window
+
+
+def get_server_pager(db_connection, query, params, key):
+    """Retorna o ServerPager da sessão para a consulta, recriando-o quando SQL ou parâmetros mudam"""
+    state_key = f"{key}_pager"
+    pager = st.session_state.get(state_key)
+    params = list(params) if params else []
+    if not isinstance(pager, ServerPager) or pager.query != query or pager.params != params:
+        pager = ServerPager(lambda sql, sql_params: execute_with_cache(db_connection, sql, sql_params)[:2],
+                            query, params)
+        st.session_state[state_key] = pager
+    return pager
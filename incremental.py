@@ -0,0 +1,151 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+from datasets import derive
+from query_cache import normalize_sql
+
+# Coluna de data usada para recortar os resultados por período
+DATE_COLUMN = 'data_efe'
+
+
+def build_params(empresa, data_inicio, data_fim, produto, cliente):
+    """Monta a tupla de parâmetros posicionais da consulta de vendas
+
+    Para parâmetros opcionais, passamos o valor e o valor novamente para a condição
+    `(? IS NULL OR coluna = ?)`. Se o campo estiver vazio, passamos None para que
+    `? IS NULL` seja verdadeiro.
+    """
+    return (
+        empresa,
+        data_inicio,
+        data_fim,
+        None if not produto else produto,
+        produto,
+        None if not cliente else cliente,
+        cliente
+    )
+
+
+def find_date_column(df, name=DATE_COLUMN):
+    """Localiza a coluna de data ignorando maiúsculas/minúsculas (o Firebird devolve em maiúsculas)"""
+    for column in df.columns:
+        if str(column).lower() == name:
+            return column
+    return None
+
+
+def add_interval(intervals, start, end):
+    """Adiciona [start, end] à lista de intervalos, unindo os sobrepostos ou adjacentes"""
+    merged = []
+    for current_start, current_end in sorted(intervals + [(start, end)]):
+        if merged and current_start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], current_end))
+        else:
+            merged.append((current_start, current_end))
+    return merged
+
+
+def remove_interval(intervals, start, end):
+    """Remove [start, end] da lista de intervalos"""
+    result = []
+    for current_start, current_end in intervals:
+        if current_end < start or current_start > end:
+            result.append((current_start, current_end))
+            continue
+        if current_start < start:
+            result.append((current_start, start - timedelta(days=1)))
+        if current_end > end:
+            result.append((end + timedelta(days=1), current_end))
+    return result
+
+
+def missing_intervals(intervals, start, end):
+    """Retorna os trechos de [start, end] que não estão cobertos pelos intervalos"""
+    missing = []
+    cursor = start
+    for current_start, current_end in sorted(intervals):
+        if current_end < cursor:
+            continue
+        if current_start > end:
+            break
+        if current_start > cursor:
+            missing.append((cursor, current_start - timedelta(days=1)))
+        cursor = max(cursor, current_end + timedelta(days=1))
+        if cursor > end:
+            break
+    if cursor <= end:
+        missing.append((cursor, end))
+    return missing
+
+
+def _date_mask(df, column, start, end):
+    """Máscara das linhas com data dentro de [start, end]"""
+    days = pd.to_datetime(df[column]).dt.normalize()
+    return (days >= pd.Timestamp(start)) & (days <= pd.Timestamp(end))
+
+
+class IncrementalLoader:
+    """Mantém as fatias (empresa, período) já carregadas e consulta apenas os dias faltantes"""
+
+    def __init__(self):
+        self._slices = {}
+
+    def clear(self):
+        """Descarta todas as fatias materializadas"""
+        self._slices = {}
+
+    def coverage(self, query, empresa, produto, cliente, source=None):
+        """Retorna os intervalos já carregados para a combinação informada"""
+        entry = self._slices.get(self._key(query, empresa, produto, cliente, source))
+        return list(entry['intervals']) if entry else []
+
+    @staticmethod
+    def _key(query, empresa, produto, cliente, source=None):
+        return (tuple(source) if source else None, normalize_sql(query), empresa, produto or None, cliente or None)
+
+    def load(self, execute, query, empresa, data_inicio, data_fim, produto="", cliente="",
+             refresh_today=True, source=None):
+        """Carrega o período pedido consultando apenas os intervalos ainda não materializados
+
+        execute é uma função (query, params) -> (df, mensagem), como
+        DatabaseConnection.execute_query. source é a origem dos dados (query_cache.connection_source),
+        para que bancos diferentes não compartilhem fatias. Retorna (df, mensagem, intervalos_consultados).
+        """
+        key = self._key(query, empresa, produto, cliente, source)
+        entry = self._slices.setdefault(key, {'intervals': [], 'data': None})
+
+        # O dia de hoje ainda recebe pedidos, então pode ser consultado de novo
+        today = date.today()
+        if refresh_today and data_inicio <= today <= data_fim:
+            entry['intervals'] = remove_interval(entry['intervals'], today, today)
+            if entry['data'] is not None:
+                column = find_date_column(entry['data'])
+                data = entry['data']
+                entry['data'] = derive(data[~_date_mask(data, column, today, today)], data, 'sem_dia', today)
+
+        fetched = missing_intervals(entry['intervals'], data_inicio, data_fim)
+        for start, end in fetched:
+            df, message = execute(query, build_params(empresa, start, end, produto, cliente))
+            if df is None:
+                return None, message, fetched
+            if find_date_column(df) is None:
+                # Sem a coluna de data não é possível recortar por período: não materializa
+                self._slices.pop(key, None)
+                return df, message, fetched
+            if entry['data'] is not None:
+                df = derive(pd.concat([entry['data'], df], ignore_index=True), (entry['data'], df), 'concatenar')
+            entry['data'] = df
+            entry['intervals'] = add_interval(entry['intervals'], start, end)
+
+        data = entry['data']
+        if data is None:
+            return None, "Nenhum dado carregado", fetched
+        column = find_date_column(data)
+        result = data[_date_mask(data, column, data_inicio, data_fim)].reset_index(drop=True)
+        derive(result, data, 'periodo', (data_inicio, data_fim))
+        if fetched:
+            message = f"Consulta executada com sucesso! {len(fetched)} período(s) consultado(s) no banco."
+        else:
+            message = "Período já carregado, nenhum dado novo consultado."
+        return result, message, fetched
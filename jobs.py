@@ -0,0 +1,123 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Consultas ao Firebird
+MAX_WORKERS = 4
+
+# Trabalhos longos que não consultam o banco (geração do Excel, cubo exato), em um
+# executor separado para não ocupar os workers das consultas
+BACKGROUND_WORKERS = 2
+
+# Tempo que jobs finalizados ficam disponíveis para consulta do status
+FINISHED_JOB_TTL = 3600
+
+STATUS_PENDING = "pendente"
+STATUS_RUNNING = "executando"
+STATUS_DONE = "concluído"
+STATUS_FAILED = "erro"
+STATUS_CANCELLED = "cancelado"
+
+
+class QueryJob:
+    """Execução de uma consulta em segundo plano, consultada por polling a partir da sessão"""
+
+    def __init__(self, func):
+        self.id = uuid.uuid4().hex[:12]
+        self.func = func
+        self.status = STATUS_PENDING
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.rows = 0
+        self.result = None
+        self.error = None
+        self._cancel_event = threading.Event()
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.status in (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+
+    def elapsed(self):
+        """Tempo decorrido desde o início da execução (ou desde a submissão, se ainda na fila)"""
+        start = self.started_at or self.submitted_at
+        return (self.finished_at or time.time()) - start
+
+    def set_progress(self, rows):
+        """Atualiza o total de linhas recebidas (chamado pelo worker)"""
+        self.rows = rows
+
+    def attach_connection(self, pooled):
+        """Registra a conexão que executa a instrução, para permitir o cancelamento no servidor"""
+        with self._lock:
+            self._connection = pooled
+        if pooled is not None and self.cancel_requested():
+            pooled.cancel_operation()
+
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """Solicita o cancelamento e aborta a instrução em execução no Firebird"""
+        self._cancel_event.set()
+        with self._lock:
+            pooled = self._connection
+        if pooled is not None:
+            pooled.cancel_operation()
+
+    def run(self):
+        """Executa a função do job registrando status, resultado e erro"""
+        if self.cancel_requested():
+            self.finished_at = time.time()
+            self.status = STATUS_CANCELLED
+            return
+        self.started_at = time.time()
+        self.status = STATUS_RUNNING
+        try:
+            self.result = self.func(self)
+            status = STATUS_DONE
+        except Exception as e:
+            self.error = str(e)
+            status = STATUS_FAILED
+        finally:
+            self.attach_connection(None)
+        # finished_at antes do status final: um job visto como terminado sempre tem o horário
+        self.finished_at = time.time()
+        self.status = STATUS_CANCELLED if self.cancel_requested() else status
+
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="query-job")
+_background_executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="background-job")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _purge_finished():
+    """Remove jobs finalizados há mais de FINISHED_JOB_TTL (chamar com o lock adquirido)"""
+    now = time.time()
+    for job_id in [j.id for j in _jobs.values()
+                   if j.done and j.finished_at is not None and now - j.finished_at > FINISHED_JOB_TTL]:
+        del _jobs[job_id]
+
+
+def submit_job(func, background=False):
+    """Agenda func(job) no executor do processo e retorna o QueryJob
+
+    Com background=True o job vai para o executor dos trabalhos que não consultam o
+    banco (BACKGROUND_WORKERS), sem disputar os workers das consultas.
+    """
+    job = QueryJob(func)
+    with _jobs_lock:
+        _purge_finished()
+        _jobs[job.id] = job
+    (_background_executor if background else _executor).submit(job.run)
+    return job
+
+
+def get_job(job_id):
+    """Retorna o job pelo id (ou None se desconhecido/expirado)"""
+    with _jobs_lock:
+        return _jobs.get(job_id)
@@ -0,0 +1,129 @@
+from collections import OrderedDict
+
+import pandas as pd
+
+from cube import COUNT
+
+# Medidas somadas que alimentam os KPIs
+SALES = 'valorliquido'
+MARKUP = 'markup_fabrica_x_vendas'
+COST = 'custofabrica'
+
+DEFAULT_CACHE_SIZE = 64
+
+
+def _freeze(slices):
+    """Estado de filtros em forma hashable e independente da ordem"""
+    return tuple(sorted((column, tuple(sorted(values, key=str))) for column, values in slices.items()))
+
+
+def compute_kpis(totals):
+    """Calcula os KPIs a partir das somas (dicionário medida -> soma, com a contagem em COUNT)
+
+    Total de vendas, registros, ticket médio, markup médio (média do markup por linha) e
+    markup ponderado (vendas / custo de fábrica). KPIs sem as colunas necessárias ficam None.
+    """
+    count = int(totals.get(COUNT, 0) or 0)
+    sales = totals.get(SALES)
+    markup = totals.get(MARKUP)
+    cost = totals.get(COST)
+    return {
+        "total_vendas": sales,
+        "registros": count,
+        "ticket_medio": sales / count if sales is not None and count else None,
+        "markup_medio": markup / count if markup is not None and count else None,
+        "markup_ponderado": sales / cost if sales is not None and cost else None,
+    }
+
+
+def kpis_from_frame(df):
+    """KPIs calculados direto das linhas (quando os filtros não cabem no cubo)
+
+    As medidas são convertidas com pd.to_numeric, já que sem a etapa de tipagem o fdb
+    devolve Decimals (object); valores não numéricos são ignorados na soma.
+    """
+    lowered = {str(column).lower(): column for column in df.columns}
+    totals = {COUNT: len(df)}
+    for name in (SALES, MARKUP, COST):
+        if name in lowered:
+            totals[name] = float(pd.to_numeric(df[lowered[name]], errors='coerce').sum())
+    return compute_kpis(totals)
+
+
+class KpiEngine:
+    """KPIs por estado de filtros a partir das somas parciais do cubo
+
+    Para um estado de filtros S, as somas parciais de uma dimensão d são as medidas do cubo
+    agrupadas por d sob os demais filtros de S. Ao marcar/desmarcar valores de d, ou remover
+    o filtro de d, as parciais continuam valendo e os KPIs saem da soma de poucas linhas,
+    sem voltar ao cubo nem às linhas. Resultados e parciais ficam memorizados por estado.
+    """
+
+    def __init__(self, cube, cache_size=DEFAULT_CACHE_SIZE):
+        self.cube = cube
+        self.cache_size = cache_size
+        self._measures = {name: cube.measures[name] for name in (SALES, MARKUP, COST) if name in cube.measures}
+        self._partials = OrderedDict()
+        self._results = OrderedDict()
+        self._last = None
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+
+    def _query_measures(self):
+        return tuple(self._measures.values()) + (COUNT,)
+
+    def _partial(self, dimension, rest):
+        """Somas parciais por valor de dimension sob os filtros rest (memorizadas)"""
+        key = (dimension, _freeze(rest))
+        if key in self._partials:
+            self._partials.move_to_end(key)
+            return self._partials[key]
+        partial = self.cube.query((dimension,), rest, self._query_measures()).set_index(dimension)
+        return self._remember(self._partials, key, partial)
+
+    def _cached_partial(self, slices):
+        """Procura parciais já calculadas que respondam ao estado (filtro alterado ou removido)"""
+        for dimension, rest in self._partials:
+            if _freeze({c: v for c, v in slices.items() if c != dimension}) == rest:
+                return dimension, self._partials[(dimension, rest)]
+        return None
+
+    def _changed_dimension(self, slices):
+        """Dimensão cujo filtro mudou em relação ao último estado (candidata a novas alterações)"""
+        if self._last is not None:
+            last = dict(self._last)
+            for column, values in _freeze(slices):
+                if last.get(column) != values:
+                    return column
+        return next(reversed(list(slices)))
+
+    def kpis(self, slices):
+        """KPIs para as fatias do cubo {dimensão: valores aceitos}"""
+        slices = {column: tuple(values) for column, values in (slices or {}).items()}
+        key = _freeze(slices)
+        if key in self._results:
+            self._results.move_to_end(key)
+            self._last = key
+            return self._results[key]
+
+        found = self._cached_partial(slices)
+        if found is None and slices:
+            dimension = self._changed_dimension(slices)
+            found = dimension, self._partial(dimension, {c: v for c, v in slices.items() if c != dimension})
+
+        if found is None:
+            totals = self.cube.query((), None, self._query_measures()).iloc[0]
+        else:
+            dimension, partial = found
+            if dimension in slices:
+                partial = partial[partial.index.isin(slices[dimension])]
+            totals = partial.sum()
+
+        sums = {name: float(totals[column]) for name, column in self._measures.items()}
+        sums[COUNT] = totals[COUNT]
+        self._last = key
+        return self._remember(self._results, key, compute_kpis(sums))
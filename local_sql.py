@@ -0,0 +1,187 @@
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+try:
+    import duckdb
+except ImportError:  # motor local opcional: sem o pacote, o modo SQL local fica desativado
+    duckdb = None
+
+from column_types import period_to_text
+from datasets import dataset_token, stamp
+
+# Nomes das tabelas registradas no motor local
+DATA_TABLE = 'dados'
+SNAPSHOT_TABLE = 'snapshot'
+
+# Pastas chave=valor dos snapshots (SnapshotStore), lidas como texto
+PARTITION_FIELDS = ('empresa', 'ano_mes')
+
+# Aplicadas a cada conexão antes de qualquer consulta do usuário: sem acesso a arquivos
+# ou rede (read_csv, COPY, ATTACH...), sem instalar/carregar extensões e sem poder
+# desfazer essas opções com SET
+LOCKDOWN_SETTINGS = (
+    "SET enable_external_access = false",
+    "SET autoinstall_known_extensions = false",
+    "SET autoload_known_extensions = false",
+    "SET lock_configuration = true",
+)
+
+
+def available():
+    """Indica se o DuckDB está instalado"""
+    return duckdb is not None
+
+
+def _compatible(df):
+    """Converte colunas que o DuckDB não lê direto do pandas (períodos viram o texto 'AAAA/MM')
+
+    Só as colunas de período são convertidas; as demais continuam apontando para os
+    arrays de df (cópia rasa).
+    """
+    periods = [column for column in df.columns if isinstance(df[column].dtype, pd.PeriodDtype)]
+    if not periods:
+        return df
+    result = df.copy(deep=False)
+    for column in periods:
+        result[column] = period_to_text(df[column])
+    return result
+
+
+def _parquet_dataset(files):
+    """Dataset pyarrow dos arquivos com o esquema unido de todos eles
+
+    As pastas chave=valor (PARTITION_FIELDS) viram colunas de texto, exceto quando os
+    arquivos já trazem a coluna (comparando sem diferenciar maiúsculas, como o DuckDB).
+    """
+    schema = pa.unify_schemas([pq.read_schema(path) for path in files])
+    present = {name.lower() for name in schema.names}
+    fields = [pa.field(name, pa.string()) for name in PARTITION_FIELDS if name not in present]
+    if not fields:
+        return ds.dataset(files, format='parquet', schema=schema)
+    partitioning = ds.partitioning(pa.schema(fields), flavor='hive')
+    return ds.dataset(files, format='parquet', schema=pa.unify_schemas([schema, pa.schema(fields)]),
+                      partitioning=partitioning)
+
+
+def _period_columns(schema):
+    """Colunas gravadas pelo pandas como período mensal (o DuckDB as lê como o ordinal BIGINT)"""
+    return [field.name for field in schema
+            if getattr(field.type, 'extension_name', None) == 'pandas.period' and field.type.freq == 'M']
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+class LocalEngine:
+    """Motor SQL colunar embutido (DuckDB) sobre os dados já carregados
+
+    DataFrames são registrados como tabelas sem cópia (o DuckDB lê os arrays do pandas)
+    e arquivos Parquet como views; as consultas rodam vetorizadas e em várias threads,
+    sem voltar ao Firebird. Um registro só é refeito quando os dados mudam (pelo token
+    de versão ou pela lista de arquivos).
+
+    A conexão não acessa o sistema de arquivos (LOCKDOWN_SETTINGS): o SQL digitado pelo
+    usuário só enxerga as tabelas registradas. Os Parquet do snapshot são lidos pelo
+    pyarrow e entregues ao DuckDB como dataset.
+    """
+
+    def __init__(self, threads=None):
+        self._connection = duckdb.connect(':memory:')
+        if threads:
+            self._connection.execute(f"SET threads TO {int(threads)}")
+        for setting in LOCKDOWN_SETTINGS:
+            self._connection.execute(setting)
+        self._tables = {}
+
+    def register(self, name, df):
+        """Registra o DataFrame como a tabela name (substitui o registro anterior)"""
+        version = ('frame', dataset_token(df))
+        if self._tables.get(name) == version:
+            return
+        self.unregister(name)
+        self._connection.register(name, _compatible(df))
+        self._tables[name] = version
+
+    def register_parquet(self, name, files):
+        """Registra os arquivos Parquet como a tabela name (colunas unidas pelo nome)
+
+        As pastas chave=valor do caminho (empresa, ano_mes) viram colunas quando os arquivos
+        não as trazem, e períodos gravados pelo pandas aparecem como o texto 'AAAA/MM', como
+        na tabela de dados. Retorna None ou a mensagem de erro quando os arquivos não puderam
+        ser lidos.
+        """
+        version = ('parquet', tuple(files), tuple(_mtime(path) for path in files))
+        if self._tables.get(name) == version:
+            return None
+        self.unregister(name)
+        source = f"{name}_parquet"
+        try:
+            dataset = _parquet_dataset(files)
+            self._connection.register(source, dataset)
+            periods = _period_columns(dataset.schema)
+            if periods:
+                replaced = ", ".join(f"strftime(DATE '1970-01-01' + to_months(CAST({_quote(column)} AS INTEGER)), "
+                                     f"'%Y/%m') AS {_quote(column)}" for column in periods)
+                self._connection.execute(f"CREATE VIEW {name} AS SELECT * REPLACE ({replaced}) FROM {source}")
+            else:
+                self._connection.execute(f"CREATE VIEW {name} AS SELECT * FROM {source}")
+        except (pa.ArrowException, OSError, duckdb.Error) as e:
+            self._drop_parquet(name)
+            return f"Erro ao registrar {name}: {str(e)}"
+        self._tables[name] = version
+        return None
+
+    def _drop_parquet(self, name):
+        self._connection.execute(f"DROP VIEW IF EXISTS {name}")
+        try:
+            self._connection.unregister(f"{name}_parquet")
+        except duckdb.Error:
+            pass
+
+    def unregister(self, name):
+        version = self._tables.pop(name, None)
+        if version is None:
+            return
+        if version[0] == 'frame':
+            self._connection.unregister(name)
+        else:
+            self._drop_parquet(name)
+
+    def tables(self):
+        """Nomes das tabelas registradas"""
+        return list(self._tables)
+
+    def columns(self, name):
+        """Colunas e tipos da tabela: lista de (coluna, tipo SQL)"""
+        described = self._connection.execute(f"DESCRIBE {name}").fetchall()
+        return [(row[0], row[1]) for row in described]
+
+    def execute(self, sql, params=None):
+        """Executa o SQL sobre as tabelas registradas e retorna (DataFrame, mensagem)
+
+        Em caso de erro o DataFrame é None e a mensagem traz o erro do DuckDB.
+        """
+        start = time.perf_counter()
+        try:
+            df = self._connection.execute(sql, params or None).df()
+        except duckdb.Error as e:
+            return None, f"Erro na consulta local: {str(e)}"
+        elapsed = time.perf_counter() - start
+        return stamp(df, 'duckdb'), f"Consulta local executada em {elapsed * 1000:,.0f} ms: {len(df):,} registros"
+
+    def close(self):
+        self._connection.close()
+        self._tables = {}
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
@@ -0,0 +1,76 @@
+import streamlit as st
+
+from grid_panel import DEFAULT_PAGE_SIZE, get_pager, render_data_grid
+from local_sql import DATA_TABLE, SNAPSHOT_TABLE, LocalEngine, available
+
+
+def get_local_engine():
+    """Retorna o motor SQL local (DuckDB) da sessão, criando-o na primeira vez"""
+    engine = st.session_state.get('local_engine')
+    if engine is None:
+        engine = LocalEngine()
+        st.session_state.local_engine = engine
+    return engine
+
+
+def render_local_sql(df, key, snapshot_files=None, page_size=DEFAULT_PAGE_SIZE):
+    """Editor de SQL local: consultas ad hoc no DuckDB sobre os dados carregados e o snapshot
+
+    df é registrado como a tabela "dados" e snapshot_files (partições Parquet) como a
+    tabela "snapshot". Retorna o resultado quando o usuário pede para usá-lo como dados
+    atuais, ou None.
+    """
+    if not available():
+        st.info("Instale o pacote duckdb para consultar os dados localmente com SQL")
+        return None
+
+    engine = get_local_engine()
+    if df is not None:
+        engine.register(DATA_TABLE, df)
+    else:
+        engine.unregister(DATA_TABLE)
+    if snapshot_files:
+        error = engine.register_parquet(SNAPSHOT_TABLE, snapshot_files)
+        if error:
+            st.warning(error)
+    else:
+        engine.unregister(SNAPSHOT_TABLE)
+
+    tables = engine.tables()
+    if not tables:
+        st.info("Carregue dados (consulta, snapshot ou arquivo) para consultá-los localmente")
+        return None
+
+    descriptions = {
+        DATA_TABLE: f"dados atuais ({len(df):,} registros)" if df is not None else "",
+        SNAPSHOT_TABLE: f"snapshot desta consulta ({len(snapshot_files or []):,} partição(ões))",
+    }
+    st.caption("Tabelas disponíveis: " + " · ".join(f"`{name}` {descriptions.get(name, '')}" for name in tables))
+    with st.popover("Colunas"):
+        table = st.selectbox("Tabela", tables, key=f"{key}_tabela")
+        st.dataframe([{"coluna": column, "tipo": sql_type} for column, sql_type in engine.columns(table)],
+                     use_container_width=True)
+
+    sql = st.text_area("SQL local (DuckDB):", value=f"SELECT *\nFROM {tables[0]}\nLIMIT 1000", height=150,
+                       key=f"{key}_sql",
+                       help="SQL do DuckDB sobre as tabelas acima; executa na memória, sem acessar o Firebird")
+
+    state_key = f"{key}_resultado"
+    if st.button("🦆 Executar Localmente", key=f"{key}_executar"):
+        result, message = engine.execute(sql)
+        if result is None:
+            st.session_state.pop(state_key, None)
+            st.error(message)
+        else:
+            st.session_state[state_key] = {'df': result, 'message': message}
+
+    last = st.session_state.get(state_key)
+    if last is None:
+        return None
+    st.success(last['message'])
+    render_data_grid(get_pager(last['df'], key=f"{key}_grade"), key=f"{key}_grade", page_size=page_size)
+    if st.button("📌 Usar como dados atuais", key=f"{key}_usar",
+                 help="Substitui os dados das visualizações e exportações pelo resultado local"):
+        st.success(f"📊 {len(last['df']):,} registros definidos como dados atuais")
+        return last['df']
+    return None
@@ -0,0 +1,152 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from aggregation import wrap_count, wrap_page
+
+DEFAULT_CACHE_SIZE = 8
+
+
+class FramePager:
+    """Janelas de linhas de um DataFrame com ordenação e busca por coluna
+
+    Só a janela pedida é enviada ao navegador. A ordem de cada coluna (argsort) e as
+    máscaras das últimas buscas ficam memorizadas, de modo que trocar de página custa
+    apenas o recorte das linhas.
+    """
+
+    def __init__(self, df, cache_size=DEFAULT_CACHE_SIZE):
+        self.df = df
+        self.cache_size = cache_size
+        self._orders = OrderedDict()
+        self._matches = OrderedDict()
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+
+    def columns(self):
+        return list(self.df.columns)
+
+    def _order(self, column, descending):
+        """Posições das linhas ordenadas pela coluna (nulos no final, categorias em ordem alfabética)"""
+        key = (column, descending)
+        if key in self._orders:
+            self._orders.move_to_end(key)
+            return self._orders[key]
+        series = self.df[column].reset_index(drop=True)
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.cat.reorder_categories(sorted(series.cat.categories, key=str))
+        order = series.sort_values(ascending=not descending, kind='stable', na_position='last').index.to_numpy()
+        return self._remember(self._orders, key, order)
+
+    def _match(self, column, text):
+        """Máscara das linhas cuja coluna contém o texto (sem diferenciar maiúsculas)"""
+        key = (column, text.lower())
+        if key in self._matches:
+            self._matches.move_to_end(key)
+            return self._matches[key]
+        series = self.df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Busca nas categorias e expande pelos códigos
+            categories = pd.Series(series.cat.categories.astype(str))
+            found = np.flatnonzero(categories.str.contains(text, case=False, regex=False).to_numpy())
+            mask = np.isin(series.cat.codes.to_numpy(), found)
+        else:
+            mask = series.astype(str).str.contains(text, case=False, regex=False, na=False).to_numpy()
+        return self._remember(self._matches, key, mask)
+
+    def _positions(self, sort, descending, column, text):
+        """Posições das linhas filtradas/ordenadas, ou None quando é a ordem original completa"""
+        positions = self._order(sort, descending) if sort else None
+        if column and text:
+            mask = self._match(column, text)
+            positions = np.flatnonzero(mask) if positions is None else positions[mask[positions]]
+        return positions
+
+    def count(self, column=None, text=None):
+        """Total de linhas que atendem à busca"""
+        if not (column and text):
+            return len(self.df)
+        return int(self._match(column, text).sum())
+
+    def page(self, offset, limit, sort=None, descending=False, column=None, text=None):
+        """Linhas [offset, offset + limit) na ordem e busca pedidas"""
+        positions = self._positions(sort, descending, column, text)
+        if positions is None:
+            return self.df.iloc[offset:offset + limit]
+        return self.df.iloc[positions[offset:offset + limit]]
+
+
+class ServerPager:
+    """Janelas de linhas buscadas direto do Firebird com ROWS m TO n, sem carregar o resultado
+
+    execute é uma função (query, params) -> (df, mensagem), como em ServerAggregator.
+    Ordenação e busca (CONTAINING) são feitas no servidor; as contagens e as páginas
+    já lidas ficam memorizadas. Erros do banco são levantados como RuntimeError.
+    """
+
+    def __init__(self, execute, query, params, cache_size=DEFAULT_CACHE_SIZE):
+        self.execute = execute
+        self.query = query
+        self.params = list(params) if params else []
+        self.cache_size = cache_size
+        self.fetched_rows = 0
+        self._columns = None
+        self._counts = OrderedDict()
+        self._pages = OrderedDict()
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+
+    @property
+    def available(self):
+        """Indica se a consulta pode ser envolvida para paginação"""
+        return wrap_count(self.query) is not None
+
+    def _run(self, sql, params):
+        if sql is None:
+            raise RuntimeError("A consulta não pode ser paginada no servidor (ORDER BY/ROWS ou mais de uma instrução)")
+        df, message = self.execute(sql, params)
+        if df is None:
+            raise RuntimeError(message)
+        return df
+
+    def _search_params(self, column, text):
+        return [text] if column and text else []
+
+    def columns(self):
+        """Colunas do resultado (lidas de uma página com uma linha)"""
+        if self._columns is None:
+            self._columns = [str(column) for column in self.page(0, 1).columns]
+        return self._columns
+
+    def count(self, column=None, text=None):
+        """Total de linhas que atendem à busca (SELECT COUNT(*) em volta da consulta)"""
+        column = column if text else None
+        key = (column, text)
+        if key in self._counts:
+            self._counts.move_to_end(key)
+            return self._counts[key]
+        df = self._run(wrap_count(self.query, column), self.params + self._search_params(column, text))
+        return self._remember(self._counts, key, int(df.iloc[0, 0]))
+
+    def page(self, offset, limit, sort=None, descending=False, column=None, text=None):
+        """Linhas [offset, offset + limit) na ordem e busca pedidas, buscadas no servidor"""
+        column = column if text else None
+        key = (offset, limit, sort, descending, column, text)
+        if key in self._pages:
+            self._pages.move_to_end(key)
+            return self._pages[key]
+        sql = wrap_page(self.query, sort, descending, column)
+        df = self._run(sql, self.params + self._search_params(column, text) + [offset + 1, offset + limit])
+        self.fetched_rows += len(df)
+        # Numera as linhas pela posição no resultado (o df pode estar no cache de resultados)
+        df = df.set_axis(pd.RangeIndex(offset, offset + len(df)))
+        return self._remember(self._pages, key, df)
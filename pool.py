@@ -0,0 +1,305 @@
+import ctypes
+import hmac
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import fdb
+from fdb import ibase
+
+# Consulta leve usada para verificar se a conexão continua válida
+HEALTH_CHECK_SQL = "SELECT 1 FROM RDB$DATABASE"
+
+DEFAULT_MAX_SIZE = 10
+DEFAULT_IDLE_TIMEOUT = 300
+DEFAULT_CHECKOUT_TIMEOUT = 30
+
+# Intervalo máximo (s) entre as passagens do reaper que fecha as conexões ociosas expiradas
+REAPER_INTERVAL = 30
+
+# Instruções preparadas mantidas por conexão (as menos usadas são descartadas)
+DEFAULT_STATEMENT_CACHE_SIZE = 32
+
+
+class PoolTimeout(Exception):
+    """Nenhuma conexão ficou disponível dentro do tempo de espera"""
+
+
+def _reap_idle(pool_ref, stop):
+    """Laço do reaper: fecha as conexões ociosas expiradas mesmo sem novos acquire/release
+
+    Guarda só uma referência fraca ao pool e termina quando ele é coletado ou encerrado.
+    """
+    while True:
+        pool = pool_ref()
+        if pool is None:
+            return
+        interval = min(pool.idle_timeout / 2, REAPER_INTERVAL)
+        del pool
+        if stop.wait(max(interval, 0.01)):
+            return
+        pool = pool_ref()
+        if pool is None:
+            return
+        with pool._lock:
+            pool._evict_idle()
+        del pool
+
+
+class PooledConnection:
+    """Conexão fdb gerenciada pelo pool, com horário do último uso e instruções preparadas"""
+
+    def __init__(self, connection, statement_cache_size=DEFAULT_STATEMENT_CACHE_SIZE, stats=None):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.statement_cache_size = statement_cache_size
+        self._statements = OrderedDict()
+        self._stats = stats if stats is not None else {"hits": 0, "misses": 0}
+
+    def prepare(self, sql):
+        """Retorna (cursor, instrução preparada) para o SQL, reaproveitando o prepare anterior
+
+        Cada instrução fica presa ao cursor que a preparou (cursor.prep) e continua válida
+        após o rollback do reset; reexecutá-la com outros parâmetros pula o parse e o
+        plano no servidor. A conexão é usada por uma thread por vez (checkout do pool).
+        """
+        entry = self._statements.get(sql)
+        if entry is not None:
+            self._statements.move_to_end(sql)
+            self._stats["hits"] += 1
+            return entry
+        cursor = self.connection.cursor()
+        entry = (cursor, cursor.prep(sql))
+        self._statements[sql] = entry
+        self._stats["misses"] += 1
+        while len(self._statements) > self.statement_cache_size:
+            # Sem referências, a instrução é liberada no servidor pelo fdb
+            self._statements.popitem(last=False)
+        return entry
+
+    def forget(self, sql):
+        """Descarta a instrução preparada do SQL (ex.: após erro na execução)"""
+        self._statements.pop(sql, None)
+
+    def clear_statements(self):
+        """Descarta todas as instruções preparadas da conexão"""
+        self._statements.clear()
+
+    @property
+    def statements(self):
+        return len(self._statements)
+
+    def is_alive(self):
+        """Executa o health check na conexão"""
+        try:
+            cursor = self.connection.cursor()
+            try:
+                cursor.execute(HEALTH_CHECK_SQL)
+                cursor.fetchone()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def cancel_operation(self):
+        """Aborta a instrução em execução nesta conexão (fb_cancel_operation, a partir de outra thread)"""
+        try:
+            cancel = fdb.load_api().client_library.fb_cancel_operation
+            cancel.argtypes = [ctypes.POINTER(ibase.ISC_STATUS), ctypes.POINTER(ibase.isc_db_handle),
+                               ctypes.c_ushort]
+            status = ibase.ISC_STATUS_ARRAY()
+            cancel(status, ctypes.byref(self.connection._db_handle), ibase.fb_cancel_raise)
+            return True
+        except Exception:
+            return False
+
+    def reset(self):
+        """Encerra a transação corrente para que o próximo uso veja dados atualizados"""
+        try:
+            self.connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        """Fecha a conexão ignorando erros (ex.: servidor reiniciado)"""
+        self.clear_statements()
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Pool de conexões Firebird thread-safe, compartilhado entre as sessões do Streamlit"""
+
+    def __init__(self, dsn, user, password, max_size=DEFAULT_MAX_SIZE,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, checkout_timeout=DEFAULT_CHECKOUT_TIMEOUT,
+                 statement_cache_size=DEFAULT_STATEMENT_CACHE_SIZE):
+        self.dsn = dsn
+        self.user = user
+        self._password = password
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.statement_cache_size = statement_cache_size
+        self._statement_stats = {"hits": 0, "misses": 0}
+        self._idle = []
+        self._in_use = 0
+        self._lock = threading.Condition()
+        self._stop_reaper = threading.Event()
+        threading.Thread(target=_reap_idle, args=(weakref.ref(self), self._stop_reaper),
+                         name=f"pool-reaper-{dsn}", daemon=True).start()
+
+    def _open(self):
+        """Abre uma nova conexão física com o Firebird"""
+        connection = fdb.connect(
+            dsn=self.dsn,
+            user=self.user,
+            password=self._password,
+            charset='NONE'
+        )
+        return PooledConnection(connection, self.statement_cache_size, self._statement_stats)
+
+    def _evict_idle(self):
+        """Fecha conexões ociosas há mais tempo que idle_timeout (chamar com o lock adquirido)"""
+        now = time.monotonic()
+        expired = [c for c in self._idle if now - c.last_used > self.idle_timeout]
+        self._idle = [c for c in self._idle if now - c.last_used <= self.idle_timeout]
+        for pooled in expired:
+            pooled.close()
+
+    def check_password(self, password):
+        """Verifica se a senha informada confere com a usada pelo pool"""
+        return hmac.compare_digest(str(password), str(self._password))
+
+    def update_password(self, password):
+        """Troca a senha do pool e descarta as conexões ociosas abertas com a anterior"""
+        with self._lock:
+            self._password = password
+            for pooled in self._idle:
+                pooled.close()
+            self._idle = []
+
+    def clear_statements(self):
+        """Descarta as instruções preparadas das conexões ociosas (ex.: ao reconectar)"""
+        with self._lock:
+            for pooled in self._idle:
+                pooled.clear_statements()
+
+    def acquire(self):
+        """Retira uma conexão saudável do pool, reconectando se necessário"""
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._lock:
+            while True:
+                self._evict_idle()
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._in_use < self.max_size:
+                    pooled = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f"Todas as {self.max_size} conexões do pool estão em uso. Tente novamente em instantes."
+                    )
+                self._lock.wait(remaining)
+            self._in_use += 1
+
+        try:
+            # Conexões ociosas podem ter caído (ex.: reinício do Firebird)
+            if pooled is not None and not pooled.is_alive():
+                pooled.close()
+                pooled = None
+            if pooled is None:
+                pooled = self._open()
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+        return pooled
+
+    def release(self, pooled, discard=False):
+        """Devolve a conexão ao pool, ou a fecha se discard=True"""
+        if not discard:
+            discard = not pooled.reset()
+        with self._lock:
+            self._in_use -= 1
+            if discard:
+                pooled.close()
+            else:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            self._evict_idle()
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager que retira e devolve uma conexão do pool"""
+        pooled = self.acquire()
+        discard = False
+        try:
+            yield pooled
+        except Exception:
+            discard = not pooled.is_alive()
+            raise
+        finally:
+            self.release(pooled, discard=discard)
+
+    def close_all(self):
+        """Fecha todas as conexões ociosas"""
+        with self._lock:
+            for pooled in self._idle:
+                pooled.close()
+            self._idle = []
+
+    def shutdown(self):
+        """Encerra o reaper e fecha as conexões ociosas"""
+        self._stop_reaper.set()
+        self.close_all()
+
+    def stats(self):
+        """Retorna o número de conexões em uso e ociosas (descartando antes as expiradas)"""
+        with self._lock:
+            self._evict_idle()
+            return {
+                "em_uso": self._in_use,
+                "ociosas": len(self._idle),
+                "max": self.max_size,
+                "instrucoes_preparadas": sum(pooled.statements for pooled in self._idle),
+                "prepare_hits": self._statement_stats["hits"],
+                "prepare_misses": self._statement_stats["misses"],
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def make_dsn(host, port, database):
+    """DSN do fdb no formato host/porta:caminho"""
+    return f"{host}/{int(port)}:{database}"
+
+
+def get_pool(host, port, database, user, password, max_size=DEFAULT_MAX_SIZE,
+             idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """Retorna o pool do processo para (host, port, database, user), criando-o se necessário"""
+    key = (host, int(port), database, user)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(make_dsn(host, port, database), user, password,
+                                  max_size=max_size, idle_timeout=idle_timeout)
+            _pools[key] = pool
+        else:
+            pool.max_size = max_size
+            pool.idle_timeout = idle_timeout
+        with pool._lock:
+            pool._evict_idle()
+        return pool
@@ -0,0 +1,178 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def dataframe_bytes(df):
+    """Calcula o tamanho em memória do DataFrame (incluindo objetos Python)"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def literal_end(sql, i):
+    """Fim (exclusivo) da string, identificador citado ou comentário que começa em i, ou None"""
+    length = len(sql)
+    ch = sql[i]
+    if sql.startswith('--', i):
+        end = sql.find('\n', i)
+        return length if end < 0 else end + 1
+    if sql.startswith('/*', i):
+        end = sql.find('*/', i + 2)
+        return length if end < 0 else end + 2
+    if ch in ("'", '"'):
+        end = i + 1
+        while end < length:
+            if sql[end] == ch:
+                if end + 1 < length and sql[end + 1] == ch:
+                    end += 2
+                    continue
+                break
+            end += 1
+        return min(end + 1, length)
+    return None
+
+
+def normalize_sql(sql):
+    """SQL com os espaços entre os termos reduzidos a um e em maiúsculas, para comparar consultas
+
+    Strings, identificadores citados e comentários são mantidos como estão: consultas que
+    diferem dentro de um literal continuam diferentes.
+    """
+    parts = []
+    i = 0
+    length = len(sql)
+    while i < length:
+        if sql[i].isspace():
+            end = i
+            while end < length and sql[end].isspace():
+                end += 1
+            if parts:
+                parts.append(' ')
+            i = end
+            continue
+        end = literal_end(sql, i)
+        if end is not None:
+            parts.append(sql[i:end])
+        else:
+            end = i + 1
+            while end < length and not sql[end].isspace() and literal_end(sql, end) is None:
+                end += 1
+            # Palavras-chave e identificadores sem aspas não diferenciam maiúsculas no Firebird
+            parts.append(sql[i:end].upper())
+        i = end
+    if parts and parts[-1] == ' ':
+        parts.pop()
+    return ''.join(parts)
+
+
+def connection_source(db_connection):
+    """Origem dos dados de uma conexão: (dsn, usuário) do pool, ou None sem conexão
+
+    Entra nas chaves de tudo que guarda resultados (cache, snapshots, carga incremental),
+    para que bancos diferentes no mesmo processo não compartilhem resultados.
+    """
+    pool = db_connection.pool if db_connection is not None else None
+    return (pool.dsn, pool.user) if pool else None
+
+
+def make_key(source, query, params):
+    """Gera a chave do cache a partir da origem (banco/usuário), do SQL e dos parâmetros"""
+    raw = repr((source, normalize_sql(query), tuple(params) if params else ()))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Cache LRU de resultados de consultas com TTL, limitado pelo tamanho dos DataFrames
+
+    Os DataFrames armazenados são compartilhados entre as sessões e não devem ser
+    alterados in-place.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remove(self, key):
+        """Remove uma entrada (chamar com o lock adquirido)"""
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry['bytes']
+
+    def get(self, key, ttl=None):
+        """Retorna o DataFrame em cache ou None se ausente/expirado (ttl sobrepõe o padrão)"""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry['stored_at'] > ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry['df']
+
+    def put(self, key, df):
+        """Armazena o DataFrame, removendo os menos usados até caber em max_bytes"""
+        size = dataframe_bytes(df)
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and self._total_bytes + size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+            self._entries[key] = {'df': df, 'bytes': size, 'stored_at': time.monotonic()}
+            self._total_bytes += size
+        return True
+
+    def invalidate(self):
+        """Esvazia o cache"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """Retorna contadores de uso do cache"""
+        with self._lock:
+            return {
+                "entradas": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_cache = ResultCache()
+
+
+def get_result_cache():
+    """Retorna o cache de resultados compartilhado pelo processo"""
+    return _cache
+
+
+def execute_with_cache(db_connection, query, params=None, cache=None, ttl=None, **kwargs):
+    """Executa a consulta passando pelo cache de resultados
+
+    Retorna (df, mensagem, hit), onde hit indica se o resultado veio do cache.
+    """
+    cache = cache or _cache
+    key = make_key(connection_source(db_connection), query, params)
+
+    df = cache.get(key, ttl)
+    if df is not None:
+        return df, "Resultado obtido do cache!", True
+
+    df, message = db_connection.execute_query(query, params, **kwargs)
+    if df is not None:
+        cache.put(key, df)
+    return df, message, False
@@ -0,0 +1,168 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from datasets import stamp
+
+DEFAULT_N_RECORDS = 1000
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+PRODUTOS = ['Produto A', 'Produto B', 'Produto C', 'Produto D', 'Produto E']
+VENDEDORES = ['João Silva', 'Maria Santos', 'Pedro Costa', 'Ana Oliveira', 'Carlos Lima']
+CIDADES = ['São Paulo', 'Rio de Janeiro', 'Belo Horizonte', 'Salvador', 'Brasília',
+           'Fortaleza', 'Recife', 'Porto Alegre', 'Curitiba', 'Goiânia']
+ESTADOS = ['SP', 'RJ', 'MG', 'BA', 'DF', 'CE', 'PE', 'RS', 'PR', 'GO']
+MARCAS = ['Marca Alpha', 'Marca Beta', 'Marca Gamma', 'Marca Delta', 'Marca Epsilon']
+TIPOS = ['Venda', 'Devolução']
+
+
+def _names(base, n, prefix):
+    """Usa os nomes padrão e completa com '<prefixo> <i>' quando a cardinalidade for maior"""
+    if n <= len(base):
+        return list(base[:n])
+    return list(base) + [f'{prefix} {i + 1}' for i in range(len(base), n)]
+
+
+def _categorical(rng, categories, size, p=None):
+    """Sorteia códigos uniformes (ou com probabilidades p) e monta a coluna categórica"""
+    if p is None:
+        codes = rng.integers(0, len(categories), size=size)
+    else:
+        codes = rng.choice(len(categories), size=size, p=p)
+    return pd.Categorical.from_codes(codes, categories=categories), codes
+
+
+def _numbered(prefix, start, size):
+    """Gera identificadores '<prefixo>000001' a partir de start"""
+    return prefix + pd.Series(np.arange(start + 1, start + size + 1)).astype(str).str.zfill(6)
+
+
+def _build_chunk(rng, dates, offset, dims):
+    """Gera um bloco de registros com todas as colunas calculadas de uma vez em arrays NumPy"""
+    size = len(dates)
+
+    produto, produto_codes = _categorical(rng, dims['produtos'], size)
+    vendedor, _ = _categorical(rng, dims['vendedores'], size)
+    cliente, _ = _categorical(rng, dims['clientes'], size)
+    cidade, _ = _categorical(rng, dims['cidades'], size)
+    estado, _ = _categorical(rng, dims['estados'], size)
+    marca, _ = _categorical(rng, dims['marcas'], size)
+
+    # Quantidade vendida e preços baseados no produto
+    quantidade = rng.integers(1, 100, size=size)
+    preco_unitario = dims['precos'][produto_codes] + rng.normal(0, 10, size=size)
+    valor_liquido = quantidade * preco_unitario
+
+    # Custos, frete e despesas
+    custo_fabrica = valor_liquido * rng.uniform(0.4, 0.6, size=size)
+    custo_reposicao = valor_liquido * rng.uniform(0.5, 0.7, size=size)
+    custo_final = valor_liquido * rng.uniform(0.6, 0.8, size=size)
+    frete = valor_liquido * rng.uniform(0.02, 0.08, size=size)
+    despesas = valor_liquido * rng.uniform(0.01, 0.05, size=size)
+    vlr_total = valor_liquido + frete + despesas
+
+    def markup(custo):
+        return np.divide(valor_liquido, custo, out=np.zeros(size), where=custo > 0)
+
+    tipo, _ = _categorical(rng, TIPOS, size, p=[0.95, 0.05])
+
+    months = dates.to_period('M')
+    month_codes, month_values = pd.factorize(months, sort=True)
+    ano_mes = pd.Categorical.from_codes(month_codes, categories=month_values.strftime('%Y/%m'))
+
+    return pd.DataFrame({
+        'data_efe': dates,
+        'ano_mes': ano_mes,
+        'pedido': _numbered('PED', offset, size).to_numpy(),
+        'nfe': _numbered('NFE', offset, size).to_numpy(),
+        'produto': produto,
+        'marca': marca,
+        'vendedor': vendedor,
+        'nome_vendedor': vendedor,
+        'cliente': cliente,
+        'cidade': cidade,
+        'estado': estado,
+        'quantidade': quantidade,
+        'valorliquido': np.round(valor_liquido, 2),
+        'custofabrica': np.round(custo_fabrica, 2),
+        'custoreposicao': np.round(custo_reposicao, 2),
+        'custofinal': np.round(custo_final, 2),
+        'frete': np.round(frete, 2),
+        'despesas': np.round(despesas, 2),
+        'vlr_total': np.round(vlr_total, 2),
+        'markup_fabrica_x_vendas': np.round(markup(custo_fabrica), 2),
+        'markup_custoreposicao_x_vendas': np.round(markup(custo_reposicao), 2),
+        'markup_custofinal_x_vendas': np.round(markup(custo_final), 2),
+        'tipo': tipo,
+    })
+
+
+def _dimensions(n_produtos, n_vendedores, n_clientes, n_cidades, n_estados, n_marcas):
+    """Monta as listas de valores de cada dimensão e o preço base por produto"""
+    produtos = _names(PRODUTOS, n_produtos, 'Produto')
+    return {
+        'produtos': produtos,
+        'precos': 50.0 + 25.0 * np.arange(len(produtos)),
+        'vendedores': _names(VENDEDORES, n_vendedores, 'Vendedor'),
+        'clientes': [f'Cliente {i + 1}' for i in range(n_clientes)],
+        'cidades': _names(CIDADES, n_cidades, 'Cidade'),
+        'estados': _names(ESTADOS, n_estados, 'UF'),
+        'marcas': _names(MARCAS, n_marcas, 'Marca'),
+    }
+
+
+def generate_sample_chunks(n_records=DEFAULT_N_RECORDS, chunk_size=DEFAULT_CHUNK_SIZE, seed=42,
+                           start_date=datetime(2024, 1, 1), end_date=datetime(2024, 12, 31),
+                           n_produtos=5, n_vendedores=5, n_clientes=50, n_cidades=10, n_estados=10,
+                           n_marcas=5):
+    """Gera os dados de demonstração em blocos de até chunk_size registros
+
+    As datas são distribuídas uniformemente entre start_date e end_date sobre o total de
+    registros, e as distribuições de cada coluna são as mesmas da versão original
+    (sorteios uniformes, quantidade 1-99, preço base do produto + N(0, 10), 5% de devoluções).
+    """
+    rng = np.random.default_rng(seed)
+    dims = _dimensions(n_produtos, n_vendedores, n_clientes, n_cidades, n_estados, n_marcas)
+    all_dates = pd.date_range(start_date, end_date, periods=n_records)
+    for offset in range(0, n_records, chunk_size):
+        yield _build_chunk(rng, all_dates[offset:offset + chunk_size], offset, dims)
+
+
+def generate_sample_data(n_records=DEFAULT_N_RECORDS, seed=42, **options):
+    """Gera dados de exemplo para demonstração (vetorizado)
+
+    Aceita as mesmas opções de generate_sample_chunks (datas e cardinalidades). Com
+    n_records=0 retorna um DataFrame vazio com as mesmas colunas e tipos.
+    """
+    df = next(generate_sample_chunks(n_records, max(n_records, 1), seed, **options), None)
+    if df is None:
+        # Nenhum bloco gerado: as colunas e tipos vêm de um bloco de um registro, descartado
+        df = next(generate_sample_chunks(1, 1, seed, **options)).iloc[:0]
+    return stamp(df, 'exemplo', (n_records, seed, tuple(sorted(options.items()))))
+
+
+def write_sample_data(path, n_records, chunk_size=DEFAULT_CHUNK_SIZE, **options):
+    """Gera os dados em blocos gravando direto em disco (Parquet ou CSV, pela extensão do arquivo)
+
+    Apenas um bloco fica em memória por vez, o que permite gerar dezenas de milhões de linhas.
+    """
+    parquet = path.endswith('.parquet')
+    if parquet:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for i, chunk in enumerate(generate_sample_chunks(n_records, chunk_size, **options)):
+            if parquet:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression='zstd')
+                writer.write_table(table.cast(writer.schema))
+            else:
+                chunk.to_csv(path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
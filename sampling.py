@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+
+from cube import COUNT
+from datasets import dataset_token, derive
+from kpis import COST, MARKUP, SALES, compute_kpis
+
+# Estratos da amostra (comparados sem diferenciar maiúsculas): mês e Venda/Devolução
+STRATA = ('ano_mes', 'tipo')
+DEFAULT_FRACTION = 0.05
+
+# Mínimo de linhas sorteadas por estrato (estratos menores entram inteiros)
+MIN_STRATUM_ROWS = 30
+
+# Quantil da normal para intervalos de confiança de 95%
+CONFIDENCE_Z = 1.96
+
+
+def _resolve(df, names):
+    lowered = {str(column).lower(): column for column in df.columns}
+    return [lowered[name] for name in names if name in lowered]
+
+
+class StratifiedSample:
+    """Amostra estratificada das linhas por ano_mes e tipo, com estimadores e intervalos de confiança
+
+    Em cada estrato h com N_h linhas são sorteadas n_h = max(fração * N_h, mínimo) linhas
+    (todas, se o estrato for menor), e cada linha sorteada pesa N_h / n_h. Totais e razões
+    (ticket médio, markup) de qualquer recorte dos filtros são estimados com a variância
+    do estimador estratificado; o sorteio é reprodutível pela semente.
+    """
+
+    def __init__(self, df, fraction=DEFAULT_FRACTION, strata=STRATA, min_rows=MIN_STRATUM_ROWS, seed=0):
+        self.population = df
+        self.fraction = fraction
+        self.strata = _resolve(df, strata)
+
+        if self.strata and len(df):
+            codes = df.groupby(self.strata, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+        else:
+            codes = np.zeros(len(df), dtype=np.int64)
+        sizes = np.bincount(codes) if len(df) else np.zeros(0, dtype=np.int64)
+        sample_sizes = np.minimum(sizes, np.maximum(np.ceil(sizes * fraction).astype(np.int64), min_rows))
+
+        # Sorteio sem reposição dentro de cada estrato: posição aleatória dentro do grupo < n_h
+        order = np.lexsort((np.random.default_rng(seed).random(len(df)), codes))
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        rank = np.empty(len(df), dtype=np.int64)
+        rank[order] = np.arange(len(df)) - starts[codes[order]]
+        self.positions = np.flatnonzero(rank < sample_sizes[codes])
+
+        self.codes = codes[self.positions]
+        self.stratum_sizes = sizes
+        self.sample_sizes = sample_sizes
+        self.weights = (sizes / np.maximum(sample_sizes, 1))[self.codes]
+        self.df = derive(df.iloc[self.positions], df, 'amostra', (tuple(self.strata), fraction, min_rows, seed))
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def strata_count(self):
+        return len(self.stratum_sizes)
+
+    def domain(self, rows):
+        """Máscara das linhas da amostra contidas em rows (posições ordenadas ou slice; None = todas)"""
+        if rows is None:
+            return None
+        if isinstance(rows, slice):
+            start = 0 if rows.start is None else rows.start
+            stop = len(self.population) if rows.stop is None else rows.stop
+            if start == 0 and stop == len(self.population):
+                return None
+            return (self.positions >= start) & (self.positions < stop)
+        rows = np.asarray(rows)
+        if not len(rows):
+            return np.zeros(len(self.positions), dtype=bool)
+        found = np.minimum(np.searchsorted(rows, self.positions), len(rows) - 1)
+        return rows[found] == self.positions
+
+    def subset(self, filtered, rows):
+        """Linhas da amostra no recorte dos filtros: (DataFrame, máscara)
+
+        filtered é o DataFrame filtrado da população e rows as posições correspondentes
+        (FilterIndex.rows). O DataFrame devolvido recebe um token derivado do recorte.
+        """
+        mask = self.domain(rows)
+        if mask is None:
+            return self.df, None
+        frame = self.df.iloc[np.flatnonzero(mask)]
+        return derive(frame, (self.df, filtered), 'amostra_recorte'), mask
+
+    def _column(self, name, mask):
+        """Valores da medida nas linhas da amostra (zero fora do recorte e nos nulos)"""
+        columns = _resolve(self.df, (name,))
+        if not columns or not pd.api.types.is_numeric_dtype(self.df[columns[0]]):
+            return None
+        values = pd.to_numeric(self.df[columns[0]], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        values = np.nan_to_num(values)
+        return values if mask is None else values * mask
+
+    def _total(self, values):
+        """Total estimado e erro padrão (estimador estratificado com correção de população finita)"""
+        n = self.sample_sizes.astype(np.float64)
+        sizes = self.stratum_sizes.astype(np.float64)
+        sums = np.bincount(self.codes, values, minlength=len(n))
+        squares = np.bincount(self.codes, values * values, minlength=len(n))
+        means = np.divide(sums, n, out=np.zeros_like(sums), where=n > 0)
+        variances = np.divide(squares - n * means * means, n - 1, out=np.zeros_like(sums), where=n > 1)
+        variance = np.sum(sizes * sizes * (1 - np.divide(n, sizes, out=np.ones_like(n), where=sizes > 0))
+                          * np.divide(np.maximum(variances, 0), n, out=np.zeros_like(n), where=n > 0))
+        return float(np.sum(sizes * means)), float(np.sqrt(variance))
+
+    def _ratio_error(self, numerator, denominator):
+        """Erro padrão da razão de totais (linearização: resíduos y - R x)"""
+        total_y, _ = self._total(numerator)
+        total_x, _ = self._total(denominator)
+        if not total_x:
+            return None
+        _, error = self._total(numerator - total_y / total_x * denominator)
+        return error / abs(total_x)
+
+    def estimate_kpis(self, mask=None):
+        """KPIs estimados do recorte e margens de erro de 95%: (kpis, margens)
+
+        Os KPIs têm as mesmas chaves de compute_kpis; as margens são a metade da largura
+        do intervalo de confiança (None quando o KPI não se aplica).
+        """
+        count = np.ones(len(self.positions)) if mask is None else mask.astype(np.float64)
+        measures = {name: self._column(name, mask) for name in (SALES, MARKUP, COST)}
+        measures = {name: values for name, values in measures.items() if values is not None}
+
+        totals = {COUNT: self._total(count)[0]}
+        totals.update({name: self._total(values)[0] for name, values in measures.items()})
+        kpis = compute_kpis(totals)
+        kpis['registros'] = int(round(totals[COUNT]))
+
+        margins = {'registros': CONFIDENCE_Z * self._total(count)[1]}
+        if SALES in measures:
+            margins['total_vendas'] = CONFIDENCE_Z * self._total(measures[SALES])[1]
+        for name, numerator, denominator in (('ticket_medio', measures.get(SALES), count),
+                                             ('markup_medio', measures.get(MARKUP), count),
+                                             ('markup_ponderado', measures.get(SALES), measures.get(COST))):
+            if kpis[name] is not None and numerator is not None and denominator is not None:
+                error = self._ratio_error(numerator, denominator)
+                margins[name] = None if error is None else CONFIDENCE_Z * error
+        return kpis, margins
+
+
+class SampleAggregator:
+    """Somas por dimensão estimadas pela amostra (medida x peso), com a mesma interface do ServerAggregator
+
+    frame e mask são o recorte devolvido por StratifiedSample.subset.
+    """
+
+    def __init__(self, sample, frame, mask=None):
+        self.sample = sample
+        self.frame = frame
+        self.weights = sample.weights if mask is None else sample.weights[mask]
+
+    def cache_key(self):
+        """Identifica as agregações deste agregador no cache de figuras"""
+        return ('amostra', dataset_token(self.frame))
+
+    def aggregate(self, dimension, measure, temporal=False, limit=None):
+        """Retorna o DataFrame agregado com as somas expandidas para a população"""
+        values = pd.to_numeric(self.frame[measure], errors='coerce') * self.weights
+        if temporal:
+            dates = self.frame[dimension]
+            if not pd.api.types.is_datetime64_any_dtype(dates):
+                dates = pd.to_datetime(dates)
+            grouped = values.groupby(dates.dt.normalize().rename(dimension)).sum().rename(measure).reset_index()
+        else:
+            grouped = (values.groupby(self.frame[dimension], observed=True).sum().rename(measure)
+                       .sort_values(ascending=False).reset_index())
+        if limit:
+            grouped = grouped.head(limit)
+        return grouped
@@ -0,0 +1,357 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from column_types import period_to_text
+from datasets import stamp
+from incremental import build_params, find_date_column
+from query_cache import normalize_sql
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOTS_DIR = "snapshots"
+METADATA_FILE = "metadata.json"
+
+# Um lock por snapshot: sessões que atualizam o mesmo snapshot gravam uma de cada vez
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _snapshot_lock(sid):
+    with _locks_lock:
+        return _locks.setdefault(sid, threading.Lock())
+
+
+def _partition_value(value):
+    """Valor de partição seguro para o caminho: codificado como URI, como no particionamento hive
+
+    Barras e demais separadores viram %2F etc., então empresa e ano_mes nunca saem da
+    pasta do snapshot.
+    """
+    return quote(str(value), safe='')
+
+
+def _replace_atomically(path, write):
+    """Grava via write(tmp_path) em um temporário exclusivo na mesma pasta e troca pelo destino
+
+    Leitores nunca veem o arquivo pela metade e gravações simultâneas não disputam o mesmo
+    temporário.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _first_value(series):
+    index = series.first_valid_index()
+    return None if index is None else series[index]
+
+
+def _canonical(df):
+    """Partição no mesmo esquema com ou sem a etapa de tipagem (optimize_dtypes)
+
+    Períodos voltam ao texto 'AAAA/MM' da consulta, categorias aos seus valores, datas a
+    datetime64, inteiros a int64 e Decimals (ou inteiros escalados) a float64: partições
+    gravadas com e sem otimização de tipos são lidas juntas.
+    """
+    scales = df.attrs.get('decimal_scales', {})
+    columns = {}
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.PeriodDtype):
+            series = period_to_text(series)
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype(series.cat.categories.dtype)
+        if column in scales:
+            series = series / 10 ** scales[column]
+        elif isinstance(series.dtype, np.dtype) and series.dtype.kind in 'iu':
+            series = series.astype(np.int64)
+        elif series.dtype == object:
+            first = _first_value(series)
+            if isinstance(first, Decimal):
+                series = series.astype(np.float64)
+            elif isinstance(first, date) and not isinstance(first, datetime):
+                series = pd.to_datetime(series)
+        columns[column] = series
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _write_json(data, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def snapshot_id(query, produto="", cliente="", source=None):
+    """Identificador do snapshot: origem (dsn, usuário), SQL normalizado e filtros opcionais
+
+    Empresa e mês são partições dentro do snapshot.
+    """
+    raw = repr((tuple(source) if source else None, normalize_sql(query), produto or None, cliente or None))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def month_bounds(ano_mes):
+    """Primeiro e último dia do mês no formato 'AAAA-MM'"""
+    year, month = (int(part) for part in ano_mes.split('-'))
+    first = date(year, month, 1)
+    last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return first, last
+
+
+def months_between(start, end):
+    """Lista os meses 'AAAA-MM' entre as datas (inclusive)"""
+    months = []
+    current = date(start.year, start.month, 1)
+    while current <= end:
+        months.append(current.strftime('%Y-%m'))
+        current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return months
+
+
+class SnapshotStore:
+    """Armazena resultados de consultas em Parquet particionado por empresa e ano_mes
+
+    source é a origem dos dados (query_cache.connection_source): snapshots de bancos ou
+    usuários diferentes têm ids diferentes.
+    """
+
+    def __init__(self, base_dir=SNAPSHOTS_DIR, source=None):
+        self.base_dir = base_dir
+        self.source = source
+
+    def _dir(self, sid):
+        return os.path.join(self.base_dir, sid)
+
+    def _partition_path(self, sid, empresa, ano_mes):
+        return os.path.join(self._dir(sid), f"empresa={_partition_value(empresa)}",
+                            f"ano_mes={_partition_value(ano_mes)}", "data.parquet")
+
+    def load_metadata(self, sid):
+        """Carrega os metadados do snapshot (ou None se não existir)"""
+        path = os.path.join(self._dir(sid), METADATA_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_metadata(self, sid, metadata):
+        _replace_atomically(os.path.join(self._dir(sid), METADATA_FILE),
+                            lambda tmp_path: _write_json(metadata, tmp_path))
+
+    def write(self, df, query, empresa, data_inicio, data_fim, produto="", cliente=""):
+        """Grava o resultado de [data_inicio, data_fim] substituindo as partições (empresa, mês) afetadas
+
+        Linhas de df fora do período são ignoradas. Retorna o id do snapshot ou None se o
+        resultado não tiver coluna de data. A leitura e a regravação dos metadados e das
+        partições acontecem sob o lock do snapshot.
+        """
+        date_column = find_date_column(df)
+        if date_column is None:
+            return None
+
+        sid = snapshot_id(query, produto, cliente, self.source)
+        with _snapshot_lock(sid):
+            self._write(sid, df, date_column, query, empresa, data_inicio, data_fim, produto, cliente)
+        return sid
+
+    def safe_write(self, df, query, empresa, data_inicio, data_fim, produto="", cliente=""):
+        """Como write, mas uma falha ao gravar é registrada no log em vez de propagada
+
+        Retorna (id do snapshot ou None, mensagem de erro ou None): o snapshot é um
+        complemento e não deve derrubar a consulta que o gerou.
+        """
+        try:
+            return self.write(df, query, empresa, data_inicio, data_fim, produto, cliente), None
+        except Exception as e:
+            logger.exception("Falha ao gravar o snapshot da consulta")
+            return None, f"Snapshot não gravado: {str(e)}"
+
+    def _write(self, sid, df, date_column, query, empresa, data_inicio, data_fim, produto, cliente):
+        os.makedirs(self._dir(sid), exist_ok=True)
+        metadata = self.load_metadata(sid) or {
+            "query": query,
+            "source": list(self.source) if self.source else None,
+            "params": {"produto": produto or None, "cliente": cliente or None},
+            "created_at": datetime.now().isoformat(),
+            "partitions": {},
+        }
+
+        # Só as linhas de [data_inicio, data_fim]: df pode cobrir um período maior que o gravado agora
+        dates = pd.to_datetime(df[date_column])
+        days = dates.dt.normalize()
+        in_range = (days >= pd.Timestamp(data_inicio)) & (days <= pd.Timestamp(data_fim))
+        df = df[in_range]
+        months = dates[in_range].dt.strftime('%Y-%m')
+        fetched_at = datetime.now().isoformat()
+        for ano_mes in months_between(data_inicio, data_fim):
+            first, last = month_bounds(ano_mes)
+            start, end = max(first, data_inicio), min(last, data_fim)
+            key = f"{empresa}/{ano_mes}"
+            previous = metadata["partitions"].get(key)
+            path = self._partition_path(sid, empresa, ano_mes)
+
+            part = _canonical(df[months == ano_mes])
+            previous_start = date.fromisoformat(previous["start"]) if previous else None
+            previous_end = date.fromisoformat(previous["end"]) if previous else None
+            contiguous = (previous is not None
+                          and previous_start <= end + timedelta(days=1)
+                          and previous_end >= start - timedelta(days=1))
+            if contiguous and os.path.exists(path):
+                # Mantém os dias já gravados fora do período consultado agora
+                old = _canonical(pq.read_table(path).to_pandas())
+                old_days = pd.to_datetime(old[date_column]).dt.date
+                old = old[(old_days < start) | (old_days > end)]
+                part = pd.concat([old, part], ignore_index=True)
+                start = min(start, previous_start)
+                end = max(end, previous_end)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            table = pa.Table.from_pandas(part.reset_index(drop=True), preserve_index=False)
+            _replace_atomically(path, lambda tmp_path: pq.write_table(table, tmp_path, compression='zstd'))
+            metadata["partitions"][key] = {
+                "empresa": empresa,
+                "ano_mes": ano_mes,
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "rows": len(part),
+                "fetched_at": fetched_at,
+            }
+
+        metadata["updated_at"] = fetched_at
+        metadata["date_column"] = date_column
+        self._save_metadata(sid, metadata)
+
+    def read(self, sid, empresa, data_inicio, data_fim, columns=None, filters=None):
+        """Lê o snapshot com poda de partições, projeção de colunas e filtros empurrados ao Parquet
+
+        filters segue o formato do pyarrow, ex.: [('ESTADO', '=', 'SP')].
+        """
+        metadata = self.load_metadata(sid)
+        if not metadata:
+            return None
+        wanted = set(months_between(data_inicio, data_fim))
+        files = [
+            self._partition_path(sid, info["empresa"], info["ano_mes"])
+            for info in metadata["partitions"].values()
+            if info["empresa"] == empresa and info["ano_mes"] in wanted
+        ]
+        files = [path for path in files if os.path.exists(path)]
+        if not files:
+            return None
+
+        # Esquema unido de todas as partições (não só o da primeira); partições de versões
+        # antigas com tipos incompatíveis levantam pa.ArrowInvalid
+        schema = pa.unify_schemas([pq.read_schema(path) for path in files])
+        dataset = ds.dataset(files, format="parquet", schema=schema)
+        date_column = metadata["date_column"]
+        if pa.types.is_date(dataset.schema.field(date_column).type):
+            lower, upper = data_inicio, data_fim + timedelta(days=1)
+        else:
+            lower, upper = pd.Timestamp(data_inicio), pd.Timestamp(data_fim + timedelta(days=1))
+        expression = (ds.field(date_column) >= lower) & (ds.field(date_column) < upper)
+        if filters:
+            expression = expression & pq.filters_to_expression(filters)
+
+        # Mesmas partições (pela data de gravação) e mesmos recortes: mesmo token
+        versions = tuple(sorted((info["ano_mes"], info["fetched_at"]) for info in metadata["partitions"].values()
+                                if info["empresa"] == empresa and info["ano_mes"] in wanted))
+        df = dataset.to_table(columns=columns, filter=expression).to_pandas()
+        return stamp(df, 'snapshot', (sid, empresa, data_inicio, data_fim, columns, filters, versions))
+
+    def files(self, sid, empresa=None):
+        """Arquivos Parquet das partições gravadas no snapshot (de uma empresa ou de todas)"""
+        metadata = self.load_metadata(sid)
+        if not metadata:
+            return []
+        files = [
+            self._partition_path(sid, info["empresa"], info["ano_mes"])
+            for info in metadata["partitions"].values()
+            if empresa is None or info["empresa"] == empresa
+        ]
+        return sorted(path for path in files if os.path.exists(path))
+
+    def columns(self, sid):
+        """Lista as colunas gravadas no snapshot"""
+        metadata = self.load_metadata(sid)
+        if not metadata or not metadata["partitions"]:
+            return []
+        info = next(iter(metadata["partitions"].values()))
+        path = self._partition_path(sid, info["empresa"], info["ano_mes"])
+        return pq.read_schema(path).names if os.path.exists(path) else []
+
+    def coverage_complete(self, sid, empresa, data_inicio, data_fim):
+        """Indica se todo o período pedido está coberto pelas partições gravadas"""
+        metadata = self.load_metadata(sid)
+        if not metadata:
+            return False
+        for ano_mes in months_between(data_inicio, data_fim):
+            info = metadata["partitions"].get(f"{empresa}/{ano_mes}")
+            if not info:
+                return False
+            first, last = month_bounds(ano_mes)
+            if (date.fromisoformat(info["start"]) > max(first, data_inicio)
+                    or date.fromisoformat(info["end"]) < min(last, data_fim)):
+                return False
+        return True
+
+    def stale_partitions(self, sid, empresa, data_inicio, data_fim, max_age_hours=24):
+        """Partições do período ausentes, incompletas, velhas demais ou que contêm o dia de hoje"""
+        metadata = self.load_metadata(sid) or {"partitions": {}}
+        now = datetime.now()
+        today = date.today()
+        stale = []
+        for ano_mes in months_between(data_inicio, data_fim):
+            info = metadata["partitions"].get(f"{empresa}/{ano_mes}")
+            first, last = month_bounds(ano_mes)
+            if (info is None
+                    or date.fromisoformat(info["start"]) > max(first, data_inicio)
+                    or date.fromisoformat(info["end"]) < min(last, data_fim)
+                    or now - datetime.fromisoformat(info["fetched_at"]) > timedelta(hours=max_age_hours)
+                    or first <= today <= last):
+                stale.append(ano_mes)
+        return stale
+
+    def refresh(self, execute, query, empresa, data_inicio, data_fim, produto="", cliente="",
+                max_age_hours=24):
+        """Consulta novamente apenas as partições desatualizadas do período
+
+        execute é uma função (query, params) -> (df, mensagem). Retorna (meses_atualizados, erro).
+        """
+        sid = snapshot_id(query, produto, cliente, self.source)
+        refreshed = []
+        for ano_mes in self.stale_partitions(sid, empresa, data_inicio, data_fim, max_age_hours):
+            first, last = month_bounds(ano_mes)
+            start, end = max(first, data_inicio), min(last, data_fim)
+            df, message = execute(query, build_params(empresa, start, end, produto, cliente))
+            if df is None:
+                return refreshed, message
+            written, error = self.safe_write(df, query, empresa, start, end, produto, cliente)
+            if error:
+                return refreshed, error
+            if written is None:
+                return refreshed, "O resultado não possui a coluna de data necessária para o snapshot"
+            refreshed.append(ano_mes)
+        return refreshed, None
+
+    def delete(self, sid):
+        """Remove o snapshot do disco"""
+        shutil.rmtree(self._dir(sid), ignore_errors=True)
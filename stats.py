@@ -0,0 +1,260 @@
+import numpy as np
+import pandas as pd
+
+from datasets import cached_result
+
+# Capacidade de cada nível do sketch de quantis (erro de posto na casa de 0,1% a 0,5%)
+QUANTILE_CAPACITY = 2048
+
+# Registradores do HyperLogLog: 2^12 (erro padrão ~1,6%)
+HLL_PRECISION = 12
+
+# Linhas processadas de cada vez ao montar as estatísticas de um DataFrame
+STATS_CHUNK_ROWS = 250_000
+
+DESCRIBE_QUANTILES = (0.25, 0.5, 0.75)
+
+
+class QuantileSketch:
+    """Sketch de quantis no estilo KLL: níveis de buffers compactados pela metade
+
+    Cada valor do nível h representa 2^h valores originais. Quando um nível passa da
+    capacidade, ele é ordenado e metade dos itens (posições pares ou ímpares, ao acaso)
+    sobe para o nível seguinte. Sketches de partes diferentes se combinam com merge.
+    Enquanto nada foi compactado, os quantis são exatos.
+    """
+
+    def __init__(self, capacity=QUANTILE_CAPACITY, seed=0):
+        self.capacity = capacity
+        self.levels = []
+        self._rng = np.random.default_rng(seed)
+
+    def _add(self, level, values):
+        while len(self.levels) <= level:
+            self.levels.append(np.empty(0, dtype=np.float64))
+        self.levels[level] = np.concatenate([self.levels[level], values])
+
+    def _compact(self):
+        level = 0
+        while level < len(self.levels):
+            buffer = self.levels[level]
+            if len(buffer) > self.capacity:
+                buffer = np.sort(buffer)
+                # Um item sobra no nível quando o tamanho é ímpar
+                keep = buffer[-1:] if len(buffer) % 2 else buffer[:0]
+                pairs = buffer[:len(buffer) - len(keep)]
+                self.levels[level] = keep
+                self._add(level + 1, pairs[int(self._rng.integers(2))::2])
+            level += 1
+
+    def update(self, values):
+        """Acrescenta os valores (array numérico sem nulos)"""
+        if len(values):
+            self._add(0, np.asarray(values, dtype=np.float64))
+            self._compact()
+
+    def merge(self, other):
+        for level, values in enumerate(other.levels):
+            if len(values):
+                self._add(level, values)
+        self._compact()
+        return self
+
+    def quantiles(self, qs):
+        """Quantis aproximados (interpolação linear, como no pandas, quando ainda exato)"""
+        if not any(len(values) for values in self.levels):
+            return [np.nan for _ in qs]
+        if all(not len(values) for values in self.levels[1:]):
+            return [float(q) for q in np.quantile(self.levels[0], qs)]
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(v), 2.0 ** h) for h, v in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        values, weights = values[order], weights[order]
+        # Posto do centro de cada item ponderado, normalizado para [0, 1]
+        ranks = (np.cumsum(weights) - weights / 2) / weights.sum()
+        return [float(np.interp(q, ranks, values)) for q in qs]
+
+
+class HyperLogLog:
+    """Estimador de valores distintos (HyperLogLog com correção de contagem linear)"""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values):
+        if not len(values):
+            return
+        hashes = pd.util.hash_array(np.asarray(values)).astype(np.uint64)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        # 32 bits após o índice: log2 exato em float64 para calcular o posto do primeiro bit 1
+        rest = ((hashes << np.uint64(self.precision)) >> np.uint64(32)).astype(np.float64)
+        rank = np.where(rest > 0, 32 - np.floor(np.log2(np.maximum(rest, 1))), 33).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(2.0 ** -self.registers.astype(np.float64))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * np.log(m / zeros)
+        return float(raw)
+
+
+class ColumnSketch:
+    """Estatísticas de uma coluna numérica que se combinam entre partes
+
+    Contagem, soma, mínimo, máximo, média e variância (momentos de Welford combinados
+    pela fórmula de Chan), quantis por QuantileSketch e distintos por HyperLogLog.
+    """
+
+    def __init__(self, capacity=QUANTILE_CAPACITY, precision=HLL_PRECISION):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.quantile_sketch = QuantileSketch(capacity)
+        self.distinct_sketch = HyperLogLog(precision)
+
+    def _combine(self, count, total, mean, m2, minimum, maximum):
+        if not count:
+            return
+        merged = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / merged
+        self.m2 += m2 + delta * delta * self.count * count / merged
+        self.count = merged
+        self.total += total
+        self.min = min(self.min, minimum)
+        self.max = max(self.max, maximum)
+
+    def update(self, values):
+        """Acrescenta um bloco de valores (nulos são ignorados, como no describe)"""
+        values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        mean = float(values.mean())
+        self._combine(len(values), float(values.sum()), mean, float(((values - mean) ** 2).sum()),
+                      float(values.min()), float(values.max()))
+        self.quantile_sketch.update(values)
+        self.distinct_sketch.update(values)
+        return self
+
+    def merge(self, other):
+        self._combine(other.count, other.total, other.mean, other.m2, other.min, other.max)
+        self.quantile_sketch.merge(other.quantile_sketch)
+        self.distinct_sketch.merge(other.distinct_sketch)
+        return self
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else np.nan
+
+    def summary(self):
+        """Mesmas linhas do describe() do pandas, mais a estimativa de distintos"""
+        empty = not self.count
+        row = {
+            'count': float(self.count),
+            'mean': np.nan if empty else self.mean,
+            'std': self.std,
+            'min': np.nan if empty else self.min,
+        }
+        for q, value in zip(DESCRIBE_QUANTILES, self.quantile_sketch.quantiles(DESCRIBE_QUANTILES)):
+            row[f"{q:.0%}"] = value
+        row['max'] = np.nan if empty else self.max
+        row['distintos'] = round(self.distinct_sketch.estimate()) if not empty else 0
+        return row
+
+
+class FrameStatistics:
+    """Sketches por coluna numérica, montados bloco a bloco e combináveis entre partes
+
+    Podem ser alimentados por um DataFrame inteiro, por blocos vindos de uma leitura em
+    streaming (update a cada lote) ou combinados a partir de partes (merge), por exemplo
+    um sketch por mês somado apenas para os meses filtrados.
+    """
+
+    def __init__(self, columns=None):
+        self.columns = list(columns) if columns is not None else None
+        self.sketches = {}
+
+    def update(self, chunk):
+        """Acrescenta um bloco de linhas"""
+        if self.columns is None:
+            self.columns = list(chunk.select_dtypes(include=['number']).columns)
+        for column in self.columns:
+            if column in chunk.columns:
+                self.sketches.setdefault(column, ColumnSketch()).update(chunk[column].to_numpy())
+        return self
+
+    def merge(self, other):
+        if self.columns is None:
+            self.columns = list(other.columns or [])
+        for column, sketch in other.sketches.items():
+            if column not in self.columns:
+                self.columns.append(column)
+            self.sketches.setdefault(column, ColumnSketch()).merge(sketch)
+        return self
+
+    @classmethod
+    def from_chunks(cls, chunks, columns=None):
+        statistics = cls(columns)
+        for chunk in chunks:
+            statistics.update(chunk)
+        return statistics
+
+    @classmethod
+    def from_frame(cls, df, columns=None, chunk_rows=STATS_CHUNK_ROWS):
+        return cls.from_chunks((df.iloc[start:start + chunk_rows] for start in range(0, len(df), chunk_rows)),
+                               columns if columns is not None else list(df.select_dtypes(include=['number']).columns))
+
+    def describe(self):
+        """Tabela no formato de df.describe() (colunas numéricas), com a linha extra 'distintos'"""
+        columns = [column for column in (self.columns or []) if column in self.sketches]
+        return pd.DataFrame({column: self.sketches[column].summary() for column in columns})
+
+
+def column_statistics(df):
+    """Estatísticas das colunas numéricas do DataFrame, calculadas uma vez por versão dos dados"""
+    return cached_result(df, 'estatisticas', None, lambda: FrameStatistics.from_frame(df))
+
+
+def grouped_statistics(df, column):
+    """Estatísticas por valor de column ({valor: FrameStatistics}), uma vez por versão dos dados"""
+    def build():
+        numeric = list(df.select_dtypes(include=['number']).columns)
+        return {value: FrameStatistics.from_frame(group, numeric)
+                for value, group in df.groupby(column, observed=True, sort=False)}
+    return cached_result(df, 'estatisticas_por', column, build)
+
+
+def merged_statistics(groups, values=None):
+    """Combina as estatísticas dos grupos escolhidos (todos quando values é None)"""
+    statistics = FrameStatistics()
+    for value, group in groups.items():
+        if values is None or value in values:
+            statistics.merge(group)
+    return statistics
+
+
+def sliced_statistics(df, slices):
+    """Estatísticas do recorte descrito por slices ({coluna: valores}), sem refazer o cálculo
+
+    Sem fatias usa as estatísticas do DataFrame inteiro; com uma única coluna fatiada,
+    combina os sketches dos valores escolhidos. Retorna None quando o recorte envolve mais
+    de uma coluna (ou slices é None), para que o chamador calcule sobre os dados filtrados.
+    """
+    if slices is None or len(slices) > 1:
+        return None
+    if not slices:
+        return column_statistics(df)
+    (column, values), = slices.items()
+    return merged_statistics(grouped_statistics(df, column), set(values))
@@ -0,0 +1,38 @@
+from decimal import Decimal
+
+import pandas as pd
+
+from cube import COUNT, SalesCube
+
+
+def _firebird_frame():
+    """Vendas como chegam do fdb sem a etapa de tipagem: medidas em Decimal (object)"""
+    return pd.DataFrame({
+        'ANO_MES': ['2024/01', '2024/01', '2024/02'],
+        'ESTADO': ['SP', 'RJ', 'SP'],
+        'VALORLIQUIDO': pd.Series([Decimal('10.50'), Decimal('4.25'), None], dtype=object),
+        'QUANTIDADE': [1, 2, 3],
+        'FRETE': ['a combinar', None, 'CIF'],
+    })
+
+
+def test_decimal_measures_are_summed():
+    df = _firebird_frame()
+    cube = SalesCube(df)
+
+    assert 'VALORLIQUIDO' in cube.measure_names()
+    by_state = cube.query(('ESTADO',)).set_index('ESTADO')
+    assert by_state.loc['SP', 'VALORLIQUIDO'] == 10.5
+    assert by_state.loc['RJ', 'VALORLIQUIDO'] == 4.25
+    totals = cube.query(()).iloc[0]
+    assert totals['VALORLIQUIDO'] == 14.75
+    assert totals[COUNT] == 3
+
+
+def test_conversion_keeps_the_frame_and_skips_text_columns():
+    df = _firebird_frame()
+    cube = SalesCube(df)
+
+    assert cube.df is df
+    assert df['VALORLIQUIDO'].dtype == object
+    assert 'FRETE' not in cube.measure_names()
@@ -0,0 +1,45 @@
+from datetime import date
+
+import pandas as pd
+
+from incremental import IncrementalLoader
+
+QUERY = "SELECT * FROM VENDAS WHERE EMPRESA = ? AND DATA_EFE BETWEEN ? AND ?"
+
+
+class _Database:
+    """Execução fake que devolve um registro por dia do período pedido"""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = []
+
+    def execute(self, query, params):
+        start, end = params[1], params[2]
+        self.calls.append((start, end))
+        days = pd.date_range(start, end)
+        return pd.DataFrame({'DATA_EFE': days, 'BANCO': [self.name] * len(days)}), "ok"
+
+
+def test_only_missing_days_are_fetched():
+    loader, database = IncrementalLoader(), _Database('producao')
+    loader.load(database.execute, QUERY, '01', date(2024, 1, 1), date(2024, 1, 10), refresh_today=False)
+    df, _, fetched = loader.load(database.execute, QUERY, '01', date(2024, 1, 5), date(2024, 1, 20),
+                                 refresh_today=False)
+
+    assert fetched == [(date(2024, 1, 11), date(2024, 1, 20))]
+    assert len(df) == 16
+
+
+def test_slices_are_separated_by_database():
+    loader = IncrementalLoader()
+    producao, teste = _Database('producao'), _Database('teste')
+    period = ('01', date(2024, 1, 1), date(2024, 1, 10))
+    loader.load(producao.execute, QUERY, *period, refresh_today=False, source=('srv/3050:producao.fdb', 'SYSDBA'))
+    df, _, fetched = loader.load(teste.execute, QUERY, *period, refresh_today=False,
+                                 source=('srv/3050:teste.fdb', 'SYSDBA'))
+
+    assert fetched == [(date(2024, 1, 1), date(2024, 1, 10))]
+    assert set(df['BANCO']) == {'teste'}
+    assert loader.coverage(QUERY, '01', '', '', source=('srv/3050:producao.fdb', 'SYSDBA')) == \
+        [(date(2024, 1, 1), date(2024, 1, 10))]
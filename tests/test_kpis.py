@@ -0,0 +1,38 @@
+from decimal import Decimal
+
+import pandas as pd
+
+from cube import SalesCube
+from kpis import KpiEngine, kpis_from_frame
+
+
+def _firebird_frame():
+    """Vendas como chegam do fdb sem a etapa de tipagem: medidas em Decimal (object)"""
+    return pd.DataFrame({
+        'ANO_MES': ['2024/01', '2024/01', '2024/02', '2024/02'],
+        'ESTADO': ['SP', 'RJ', 'SP', 'MG'],
+        'VALORLIQUIDO': pd.Series([Decimal('100.00'), Decimal('50.00'), Decimal('30.00'), None], dtype=object),
+        'CUSTOFABRICA': pd.Series([Decimal('80.00'), Decimal('40.00'), Decimal('20.00'), None], dtype=object),
+        'MARKUP_FABRICA_X_VENDAS': pd.Series([Decimal('1.25'), Decimal('1.25'), Decimal('1.5'), None],
+                                             dtype=object),
+    })
+
+
+def test_engine_computes_kpis_from_decimal_measures():
+    engine = KpiEngine(SalesCube(_firebird_frame()))
+
+    kpis = engine.kpis({'ESTADO': ('SP',)})
+    assert kpis['total_vendas'] == 130.0
+    assert kpis['registros'] == 2
+    assert kpis['ticket_medio'] == 65.0
+    assert kpis['markup_ponderado'] == 130.0 / 100.0
+
+    assert engine.kpis({})['total_vendas'] == 180.0
+
+
+def test_frame_kpis_match_the_engine():
+    df = _firebird_frame()
+    engine = KpiEngine(SalesCube(df))
+
+    assert kpis_from_frame(df) == engine.kpis({})
+    assert kpis_from_frame(df[df['ESTADO'] == 'SP']) == engine.kpis({'ESTADO': ('SP',)})
@@ -0,0 +1,107 @@
+from datetime import date
+from decimal import Decimal
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+pytest.importorskip('duckdb')
+
+from column_types import optimize_dtypes
+from local_sql import DATA_TABLE, SNAPSHOT_TABLE, LocalEngine
+from snapshots import SnapshotStore
+
+
+@pytest.fixture
+def engine():
+    engine = LocalEngine()
+    engine.register(DATA_TABLE, pd.DataFrame({'VALOR': [1.0, 2.0, 3.0]}))
+    yield engine
+    engine.close()
+
+
+def test_registered_tables_are_queryable(engine):
+    df, message = engine.execute(f"SELECT SUM(VALOR) AS TOTAL FROM {DATA_TABLE}")
+    assert df is not None, message
+    assert df['TOTAL'].iloc[0] == 6.0
+
+
+def _firebird_frame():
+    """Resultado no formato da consulta de vendas, após a etapa de tipagem"""
+    df = pd.DataFrame({
+        'DATA_EFE': pd.to_datetime(['2024-01-10', '2024-01-20', '2024-02-05']),
+        'ANO_MES': ['2024/01', '2024/01', '2024/02'],
+        'EMPRESA': ['01', '01', '01'],
+        'VALORLIQUIDO': [Decimal('10.50'), Decimal('20.00'), Decimal('5.25')],
+    })
+    return optimize_dtypes(df)[0]
+
+
+def test_snapshot_table_types(engine, tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    df = _firebird_frame()
+    assert isinstance(df['ANO_MES'].dtype, pd.PeriodDtype)
+    sid = store.write(df, "SELECT * FROM VENDAS", '01', date(2024, 1, 1), date(2024, 2, 29))
+    assert engine.register_parquet(SNAPSHOT_TABLE, store.files(sid)) is None
+
+    columns = dict(engine.columns(SNAPSHOT_TABLE))
+    assert sorted(name.lower() for name in columns) == ['ano_mes', 'data_efe', 'empresa', 'valorliquido']
+    assert columns['ANO_MES'] == 'VARCHAR'
+    assert columns['EMPRESA'] == 'VARCHAR'
+
+    result, message = engine.execute(f"SELECT ANO_MES, EMPRESA, SUM(VALORLIQUIDO) AS TOTAL FROM {SNAPSHOT_TABLE} "
+                                      "GROUP BY 1, 2 ORDER BY 1")
+    assert result is not None, message
+    assert result.to_dict('records') == [{'ANO_MES': '2024/01', 'EMPRESA': '01', 'TOTAL': 30.5},
+                                         {'ANO_MES': '2024/02', 'EMPRESA': '01', 'TOTAL': 5.25}]
+
+
+def test_snapshot_partition_columns_added_when_missing(engine, tmp_path):
+    partition = tmp_path / "empresa=01" / "ano_mes=2024-01"
+    partition.mkdir(parents=True)
+    pq.write_table(pa.table({'VALOR': [5.0]}), partition / "data.parquet")
+    assert engine.register_parquet(SNAPSHOT_TABLE, [str(partition / "data.parquet")]) is None
+
+    df, message = engine.execute(f"SELECT empresa, ano_mes, VALOR FROM {SNAPSHOT_TABLE}")
+    assert df is not None, message
+    assert df.to_dict('records') == [{'empresa': '01', 'ano_mes': '2024-01', 'VALOR': 5.0}]
+
+
+def test_period_columns_become_query_text(engine):
+    df = pd.DataFrame({'ano_mes': pd.PeriodIndex(['2024-01', None], freq='M'), 'VALOR': [1.0, 2.0]})
+    engine.register(DATA_TABLE, df)
+
+    result, message = engine.execute(f"SELECT ano_mes FROM {DATA_TABLE}")
+    assert result is not None, message
+    assert result['ano_mes'].tolist()[0] == '2024/01'
+    assert pd.isna(result['ano_mes'].tolist()[1])
+    assert isinstance(df['ano_mes'].dtype, pd.PeriodDtype)
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT * FROM read_csv('{path}')",
+    "SELECT * FROM read_text('{path}')",
+    "COPY dados TO '{path}'",
+    "ATTACH '{path}' AS outro",
+])
+def test_files_are_not_accessible(engine, tmp_path, sql):
+    path = tmp_path / "arquivo.csv"
+    path.write_text("a,b\n1,2\n")
+
+    df, message = engine.execute(sql.format(path=path))
+    assert df is None
+    assert message.startswith("Erro na consulta local")
+    assert path.read_text() == "a,b\n1,2\n"
+
+
+@pytest.mark.parametrize('sql', [
+    "SET enable_external_access = true",
+    "RESET lock_configuration",
+    "INSTALL httpfs",
+    "LOAD httpfs",
+])
+def test_lockdown_cannot_be_undone(engine, sql):
+    df, message = engine.execute(sql)
+    assert df is None
+    assert message.startswith("Erro na consulta local")
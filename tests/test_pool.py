@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+import pool as pool_module
+from pool import ConnectionPool
+
+
+class _Cursor:
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+class _Connection:
+    """Conexão fdb fake que registra o fechamento"""
+
+    def __init__(self):
+        self.closed = False
+
+    def cursor(self):
+        return _Cursor()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    opened = []
+
+    def connect(**kwargs):
+        opened.append(_Connection())
+        return opened[-1]
+
+    monkeypatch.setattr(pool_module.fdb, 'connect', connect)
+    return opened
+
+
+def _wait(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_idle_connections_close_without_further_acquire(connections):
+    pool = ConnectionPool('srv/3050:vendas.fdb', 'SYSDBA', 'senha', idle_timeout=0.1)
+    try:
+        with pool.connection():
+            pass
+        assert len(connections) == 1 and not connections[0].closed
+
+        assert _wait(lambda: connections[0].closed)
+        assert pool._idle == []
+    finally:
+        pool.shutdown()
+
+
+def test_stats_discards_expired_connections(connections, monkeypatch):
+    monkeypatch.setattr(pool_module, 'REAPER_INTERVAL', 60)
+    pool = ConnectionPool('srv/3050:vendas.fdb', 'SYSDBA', 'senha', idle_timeout=60)
+    try:
+        with pool.connection():
+            pass
+        assert pool.stats()["ociosas"] == 1
+
+        pool.idle_timeout = 0
+        assert pool.stats()["ociosas"] == 0
+        assert connections[0].closed
+    finally:
+        pool.shutdown()
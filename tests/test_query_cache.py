@@ -0,0 +1,66 @@
+import pandas as pd
+
+from query_cache import ResultCache, connection_source, execute_with_cache, make_key, normalize_sql
+
+
+def test_normalize_sql_folds_whitespace_and_case():
+    assert normalize_sql("  select  a,\n\tb\nfrom vendas  ") == "SELECT A, B FROM VENDAS"
+    assert normalize_sql("select * from t where x = ?") == normalize_sql("SELECT *\nFROM T\nWHERE X = ?")
+
+
+def test_normalize_sql_keeps_literals():
+    assert normalize_sql("WHERE X = 'a  b'") != normalize_sql("WHERE X = 'a b'")
+    assert normalize_sql("WHERE X = 'A'") != normalize_sql("WHERE X = 'a'")
+    assert normalize_sql('SELECT "Nome  Cliente" FROM T') == 'SELECT "Nome  Cliente" FROM T'
+    assert normalize_sql("WHERE X = 'it''s  ok'") == "WHERE X = 'it''s  ok'"
+
+
+def test_normalize_sql_keeps_line_comment_boundary():
+    # O fim de linha encerra o comentário: juntar as linhas mudaria a consulta
+    assert normalize_sql("SELECT 1 -- comentário\nFROM T") == "SELECT 1 -- comentário\nFROM T"
+
+
+def test_make_key_distinguishes_source_and_literals():
+    query = "SELECT * FROM VENDAS WHERE UF = 'SP'"
+    assert make_key(('a.fdb', 'sysdba'), query, None) == make_key(('a.fdb', 'sysdba'), query.lower().replace("'sp'", "'SP'"), None)
+    assert make_key(('a.fdb', 'sysdba'), query, None) != make_key(('b.fdb', 'sysdba'), query, None)
+    assert make_key(None, query, None) != make_key(None, query.replace("'SP'", "'sp'"), None)
+
+
+def test_result_cache_evicts_least_recently_used():
+    df = pd.DataFrame({'x': range(1000)})
+    cache = ResultCache(max_bytes=int(df.memory_usage(index=True, deep=True).sum() * 2.5))
+    cache.put('a', df)
+    cache.put('b', df)
+    assert cache.get('a') is df
+    cache.put('c', df)
+    assert cache.get('b') is None
+    assert cache.get('a') is df and cache.get('c') is df
+
+
+class _Pool:
+    def __init__(self, dsn, user):
+        self.dsn = dsn
+        self.user = user
+
+
+class _Connection:
+    def __init__(self, dsn, user='SYSDBA'):
+        self.pool = _Pool(dsn, user)
+        self.calls = 0
+
+    def execute_query(self, query, params=None, **kwargs):
+        self.calls += 1
+        return pd.DataFrame({'banco': [self.pool.dsn]}), "ok"
+
+
+def test_cached_results_are_separated_by_database():
+    cache = ResultCache()
+    producao, teste = _Connection('srv/3050:producao.fdb'), _Connection('srv/3050:teste.fdb')
+
+    assert connection_source(producao) == ('srv/3050:producao.fdb', 'SYSDBA')
+    execute_with_cache(producao, "SELECT * FROM T", cache=cache)
+    df, _, hit = execute_with_cache(teste, "SELECT * FROM T", cache=cache)
+    assert not hit
+    assert df['banco'].tolist() == ['srv/3050:teste.fdb']
+    assert execute_with_cache(producao, "select * from t", cache=cache)[2]
@@ -0,0 +1,24 @@
+import pandas as pd
+
+from datasets import dataset_token
+from sample_data import generate_sample_data
+
+
+def test_generates_requested_records():
+    df = generate_sample_data(100, seed=1)
+    assert len(df) == 100
+    assert df['data_efe'].is_monotonic_increasing
+
+
+def test_same_seed_same_token():
+    assert dataset_token(generate_sample_data(50, seed=7)) == dataset_token(generate_sample_data(50, seed=7))
+
+
+def test_zero_records_returns_empty_typed_frame():
+    empty = generate_sample_data(0)
+    reference = generate_sample_data(10)
+
+    assert len(empty) == 0
+    assert list(empty.columns) == list(reference.columns)
+    assert empty.dtypes.astype(str).equals(reference.dtypes.astype(str))
+    assert pd.api.types.is_datetime64_any_dtype(empty['data_efe'])
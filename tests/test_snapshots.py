@@ -0,0 +1,111 @@
+import os
+from datetime import date
+from decimal import Decimal
+
+import pandas as pd
+
+from column_types import optimize_dtypes
+from snapshots import SnapshotStore, snapshot_id
+
+QUERY = "SELECT * FROM VENDAS WHERE EMPRESA = ? AND DATA_EFE BETWEEN ? AND ?"
+
+
+def _firebird_frame(days):
+    """Resultado no formato da consulta de vendas, sem a etapa de tipagem"""
+    days = pd.to_datetime(days)
+    return pd.DataFrame({
+        'DATA_EFE': days,
+        'ANO_MES': days.strftime('%Y/%m'),
+        'TIPO': ['Venda'] * len(days),
+        'QUANTIDADE': [1] * len(days),
+        'VALORLIQUIDO': [Decimal('10.50')] * len(days),
+    })
+
+
+def test_partitions_with_and_without_typing_are_read_together(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    typed, _ = optimize_dtypes(_firebird_frame(['2024-01-10', '2024-01-11']))
+    sid = store.write(typed, QUERY, '01', date(2024, 1, 1), date(2024, 1, 31))
+    store.write(_firebird_frame(['2024-03-05']), QUERY, '01', date(2024, 3, 1), date(2024, 3, 31))
+
+    df = store.read(sid, '01', date(2024, 1, 1), date(2024, 3, 31))
+    assert sorted(df['ANO_MES']) == ['2024/01', '2024/01', '2024/03']
+    assert df['VALORLIQUIDO'].tolist() == [10.5, 10.5, 10.5]
+    assert df['QUANTIDADE'].dtype == 'int64'
+
+
+def test_merging_a_typed_refresh_into_an_untyped_partition(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    sid = store.write(_firebird_frame(['2024-01-10']), QUERY, '01', date(2024, 1, 1), date(2024, 1, 15))
+    typed, _ = optimize_dtypes(_firebird_frame(['2024-01-20']))
+    store.write(typed, QUERY, '01', date(2024, 1, 16), date(2024, 1, 31))
+
+    df = store.read(sid, '01', date(2024, 1, 1), date(2024, 1, 31))
+    assert df['ANO_MES'].tolist() == ['2024/01', '2024/01']
+    assert store.coverage_complete(sid, '01', date(2024, 1, 1), date(2024, 1, 31))
+
+
+def test_partition_values_stay_inside_the_snapshot(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    sid = store.write(_firebird_frame(['2024-01-10']), QUERY, '../../fora', date(2024, 1, 1), date(2024, 1, 31))
+
+    files = store.files(sid)
+    assert len(files) == 1
+    assert os.path.realpath(files[0]).startswith(os.path.realpath(tmp_path / "snapshots" / sid) + os.sep)
+    assert len(store.read(sid, '../../fora', date(2024, 1, 1), date(2024, 1, 31))) == 1
+
+
+def test_safe_write_reports_errors(tmp_path, monkeypatch):
+    store = SnapshotStore(str(tmp_path))
+
+    def fail(*args, **kwargs):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(store, '_write', fail)
+    sid, error = store.safe_write(_firebird_frame(['2024-01-10']), QUERY, '01', date(2024, 1, 1), date(2024, 1, 31))
+    assert sid is None
+    assert "disco cheio" in error
+    assert store.files(snapshot_id(QUERY)) == []
+
+
+def test_write_only_touches_the_given_interval(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    january = _firebird_frame(['2024-01-05', '2024-01-25'])
+    sid = store.write(january, QUERY, '01', date(2024, 1, 1), date(2024, 1, 31))
+    before = store.load_metadata(sid)['partitions']['01/2024-01']['fetched_at']
+
+    # Resultado do período inteiro, mas só março veio do banco agora
+    full = _firebird_frame(['2024-01-05', '2024-01-25', '2024-03-10'])
+    full.loc[0, 'QUANTIDADE'] = 99
+    store.write(full, QUERY, '01', date(2024, 3, 1), date(2024, 3, 31))
+
+    partitions = store.load_metadata(sid)['partitions']
+    assert sorted(partitions) == ['01/2024-01', '01/2024-03']
+    assert partitions['01/2024-01']['fetched_at'] == before
+    assert partitions['01/2024-03']['rows'] == 1
+    df = store.read(sid, '01', date(2024, 1, 1), date(2024, 3, 31))
+    assert df['QUANTIDADE'].tolist() == [1, 1, 1]
+
+
+def test_write_of_a_sub_interval_keeps_the_rest_of_the_month(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    sid = store.write(_firebird_frame(['2024-01-05', '2024-01-25']), QUERY, '01', date(2024, 1, 1), date(2024, 1, 31))
+    # Só o dia 25 foi consultado de novo; df traz o mês inteiro
+    store.write(_firebird_frame(['2024-01-05', '2024-01-25', '2024-01-25']), QUERY, '01',
+                date(2024, 1, 25), date(2024, 1, 25))
+
+    df = store.read(sid, '01', date(2024, 1, 1), date(2024, 1, 31))
+    assert df['DATA_EFE'].dt.day.tolist() == [5, 25, 25]
+
+
+def test_snapshots_of_different_databases_are_separate(tmp_path):
+    producao = SnapshotStore(str(tmp_path), source=('srv/3050:producao.fdb', 'SYSDBA'))
+    teste = SnapshotStore(str(tmp_path), source=('srv/3050:teste.fdb', 'SYSDBA'))
+    sid = producao.write(_firebird_frame(['2024-01-10']), QUERY, '01', date(2024, 1, 1), date(2024, 1, 31))
+
+    assert sid == snapshot_id(QUERY, source=producao.source)
+    assert sid != snapshot_id(QUERY, source=teste.source)
+    assert teste.stale_partitions(snapshot_id(QUERY, source=teste.source), '01',
+                                  date(2024, 1, 1), date(2024, 1, 31)) == ['2024-01']
+    assert teste.refresh(lambda query, params: (None, "sem conexão"), QUERY, '01',
+                         date(2024, 1, 1), date(2024, 1, 31)) == ([], "sem conexão")
@@ -0,0 +1,129 @@
+import hashlib
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from query_cache import normalize_sql
+
+
+# Fases medidas em cada execução, na ordem exibida: (chave, rótulo)
+PHASES = (
+    ('prepare', 'Prepare'),
+    ('execute', 'Execute'),
+    ('first_row', 'Primeira linha'),
+    ('fetch', 'Fetch'),
+    ('build', 'DataFrame'),
+    ('typing', 'Tipagem'),
+    ('charts', 'Gráficos'),
+)
+
+# Execuções mantidas no histórico da sessão
+HISTORY_SIZE = 20
+
+# Valores amostrados por coluna de texto para estimar os bytes transferidos
+BYTES_SAMPLE = 1000
+
+
+def estimate_bytes(df):
+    """Estimativa do volume de dados recebido: bytes das colunas numéricas e tamanho médio dos textos
+
+    Colunas de objetos (textos, Decimal) são estimadas por uma amostra de até
+    BYTES_SAMPLE valores, para não percorrer o resultado inteiro.
+    """
+    total = 0
+    for column in df.columns:
+        values = df[column].to_numpy()
+        if values.dtype != object:
+            total += values.nbytes
+            continue
+        if not len(values):
+            continue
+        sample = values[np.linspace(0, len(values) - 1, min(len(values), BYTES_SAMPLE)).astype(np.int64)]
+        total += int(np.mean([0 if value is None else len(str(value)) for value in sample]) * len(values))
+    return total
+
+
+def query_digest(query):
+    """Identificador curto do SQL (espaços normalizados), para comparar edições da consulta"""
+    return hashlib.sha1(normalize_sql(query).encode('utf-8')).hexdigest()[:8]
+
+
+class QueryTimings:
+    """Tempos por fase, plano e volume de uma execução de consulta
+
+    As fases são acumuladas (consultas incrementais somam os tempos de cada período).
+    'first_row' é o tempo até o primeiro lote e já está contido em 'fetch'. Preenchido
+    pela thread da consulta e, depois, pela página (tempo dos gráficos).
+    """
+
+    def __init__(self, query=None, params=None, options=None):
+        self.started_at = datetime.now()
+        self.query = query
+        self.params = params
+        self.options = options or {}
+        self.phases = {}
+        self.plans = []
+        self.rows = 0
+        self.bytes = 0
+        self.statements = 0
+        self.result_rows = None
+        self.token = None
+        self.status = None
+        self.elapsed = None
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add_plan(self, plan):
+        if plan and plan not in self.plans:
+            self.plans.append(plan)
+
+    def add_result(self, df):
+        """Contabiliza as linhas e a estimativa de bytes de um resultado vindo do Firebird"""
+        self.statements += 1
+        self.rows += len(df)
+        self.bytes += estimate_bytes(df)
+
+    def rows_per_second(self):
+        fetch = self.phases.get('fetch', 0.0) + self.phases.get('build', 0.0)
+        return self.rows / fetch if fetch and self.rows else None
+
+    def summary(self):
+        """Linha do histórico: parâmetros, tempos por fase (s), vazão e volume"""
+        row = {
+            'início': self.started_at.strftime('%H:%M:%S'),
+            'sql': query_digest(self.query) if self.query else None,
+            'parâmetros': ", ".join("—" if value is None else str(value) for value in self.params or ()),
+            'opções': ", ".join(f"{name}={value}" for name, value in self.options.items()),
+            'status': self.status,
+            'total (s)': self.elapsed,
+        }
+        for phase, label in PHASES:
+            row[f"{label} (s)"] = self.phases.get(phase)
+        rate = self.rows_per_second()
+        row['linhas'] = self.rows
+        row['linhas/s'] = None if rate is None else round(rate)
+        row['MB recebidos'] = round(self.bytes / 1024 ** 2, 2)
+        row['instruções'] = self.statements
+        return row
+
+
+def timed(timings, phase):
+    """Mede a fase em timings (nada acontece quando timings é None)"""
+    return timings.phase(phase) if timings is not None else nullcontext()
+
+
+def history_frame(history):
+    """Histórico de execuções (mais recente primeiro) como DataFrame"""
+    return pd.DataFrame([timings.summary() for timings in reversed(list(history))])
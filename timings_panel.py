@@ -0,0 +1,80 @@
+from collections import deque
+
+import plotly.express as px
+import streamlit as st
+
+from datasets import dataset_token
+from timings import HISTORY_SIZE, PHASES, history_frame
+
+
+def get_history():
+    """Histórico de execuções da sessão (QueryTimings, mais antiga primeiro)"""
+    history = st.session_state.get('query_timings')
+    if history is None:
+        history = deque(maxlen=HISTORY_SIZE)
+        st.session_state.query_timings = history
+    return history
+
+
+def record_run(timings, df, status, elapsed):
+    """Guarda no histórico os tempos de uma execução terminada"""
+    if timings is None:
+        return
+    timings.status = status
+    timings.elapsed = elapsed
+    if df is not None:
+        timings.result_rows = len(df)
+        timings.token = dataset_token(df)
+    get_history().append(timings)
+
+
+def record_charts(df, seconds):
+    """Atribui o tempo dos gráficos à execução que gerou df (só a primeira montagem, sem cache)"""
+    history = st.session_state.get('query_timings')
+    if not history:
+        return
+    timings = history[-1]
+    if timings.token is not None and 'charts' not in timings.phases and timings.token == dataset_token(df):
+        timings.add('charts', seconds)
+
+
+def render_timings_panel(key):
+    """Plano do Firebird, tempos por fase da última execução e histórico das últimas execuções"""
+    history = get_history()
+    if not history:
+        st.info("Execute uma consulta para ver o plano e os tempos por fase")
+        return
+
+    last = history[-1]
+    labels = dict(PHASES)
+    rate = last.rows_per_second()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("⏱️ Tempo total", "—" if last.elapsed is None else f"{last.elapsed:.2f}s")
+    with col2:
+        st.metric("📋 Linhas recebidas", f"{last.rows:,}")
+    with col3:
+        st.metric("🚀 Linhas/s", "—" if rate is None else f"{rate:,.0f}")
+    with col4:
+        st.metric("📦 Recebido (estimado)", f"{last.bytes / 1024 ** 2:,.2f} MB")
+
+    phases = [(labels[name], last.phases[name]) for name, _ in PHASES if name in last.phases]
+    if phases:
+        fig = px.bar(x=[seconds for _, seconds in phases], y=[label for label, _ in phases], orientation='h',
+                     labels={'x': 'segundos', 'y': 'fase'}, title="Tempo por fase (última execução)")
+        fig.update_layout(yaxis={'categoryorder': 'array', 'categoryarray': [label for label, _ in phases][::-1]})
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption("Primeira linha já está contida em Fetch; Gráficos é medido na primeira exibição do resultado.")
+
+    if last.plans:
+        st.markdown("**Plano do Firebird**")
+        for plan in last.plans:
+            st.code(plan.strip(), language=None)
+    else:
+        st.caption("Sem plano: resultado vindo do cache ou do carregamento incremental já em memória")
+
+    st.markdown(f"**Histórico (últimas {HISTORY_SIZE} execuções)**")
+    st.dataframe(history_frame(history), use_container_width=True, hide_index=True)
+    if st.button("🗑️ Limpar Histórico", key=f"{key}_limpar"):
+        history.clear()
+        st.rerun()